@@ -8,6 +8,7 @@ updrs tap scores
 
 # import public functions
 import numpy as np
+from itertools import compress
 
 
 def find_dev_holdout_split(
@@ -21,6 +22,8 @@ def find_dev_holdout_split(
     subs_excl=[],
     traces_excl=[],
     EXCL_4s = False,
+    optimise: bool = False,
+    n_candidates: int = 300,
 ):
     """
     Main script to run to get balanced data splitting
@@ -29,6 +32,11 @@ def find_dev_holdout_split(
     Input:
         - choose_random_split: predefine which datasplit
             is used to reproduce data split and results
+        - optimise: if True, all n_candidates random states
+            are scored and the split with the smallest
+            deviation from the original score distribution
+            is chosen, instead of the first accepted split
+        - n_candidates: number of random states tested
     """
     excl_states = [111,]
 
@@ -50,67 +58,191 @@ def find_dev_holdout_split(
 
     print(f'Original score distribution: {og_score_distr}')
     print(f'Original score %: {og_score_perc}')
-    
-    # loop over random seeds to test different splitting samples
-    for rand_state in np.arange(300):
-        # if exact random_split is defined, skip all others
-        if choose_random_split:
-            if rand_state != choose_random_split: continue
-        if rand_state in excl_states: continue
-
-        # get random split of subs per center and their scores
-        if EXCL_4s:
-            subset_subs, subset_updrs, excl_fours = get_random_split_and_scores(
-                feats=feats, subs_dict=subs_dict,
-                n_dev=n_dev, rand_state=rand_state,
-                EXCL_4s=EXCL_4s,
-            )
-        else:
-            subset_subs, subset_updrs = get_random_split_and_scores(
-                feats=feats, subs_dict=subs_dict,
-                n_dev=n_dev, rand_state=rand_state,
-                EXCL_4s=EXCL_4s,
-            )
-
-        # determine score-distribution of applied splitting
-        split_scores = get_split_score_distr(subset_updrs)
-
-        # test whether distribution is within accepted range
-        accept_split = test_split_distr(
-            split_scores, og_score_perc, accept_perc_range
+
+    # random states to test different splitting samples
+    rand_states = np.arange(n_candidates)
+    rand_states = rand_states[~np.isin(rand_states, excl_states)]
+    # if exact random_split is defined, skip all others
+    if choose_random_split:
+        rand_states = rand_states[rand_states == choose_random_split]
+
+    # score counts per sub, all candidate splits scored at once
+    all_subs = [s for c in subs_dict.keys() for s in subs_dict[c]]
+    trace_subs, trace_scores = get_trace_subs_and_scores(feats)
+    sub_counts = get_sub_score_counts(
+        trace_subs, trace_scores, all_subs, EXCL_4s=EXCL_4s,
+    )
+    dev_masks = get_candidate_dev_masks(
+        subs_dict, all_subs, n_dev, rand_states,
+    )
+    split_counts, max_deviation = score_candidate_splits(
+        dev_masks, sub_counts, og_score_perc,
+    )
+    hout_large_enough = split_counts['hout'].sum(axis=1) >= 73
+
+    if optimise:
+        if not hout_large_enough.any():
+            print('no accepted split found')
+            return None
+        # split with smallest max deviation of score percentages
+        i_split = np.where(
+            hout_large_enough,
+            max_deviation,
+            np.inf
+        ).argmin()
+        print(f'Optimised Split: random state {rand_states[i_split]}'
+              f' (max deviation: {round(max_deviation[i_split], 2)} %, '
+              f'{len(rand_states)} splits tested)')
+
+    else:
+        accepted = np.where(
+            hout_large_enough & (max_deviation <= accept_perc_range)
+        )[0]
+        if len(accepted) == 0:
+            print('no accepted split found')
+            return None
+        # first accepted random state
+        i_split = accepted[0]
+        print(f'Accepted Split: random state {rand_states[i_split]}')
+
+    # recreate selected split, ordered as in random selection
+    subset_subs = get_split_subs(subs_dict, n_dev, rand_states[i_split])
+
+    # show resulting scores distribution
+    print(f'\nResulting distributions in splitted data sets:')
+    print()
+    data_splits = {}
+    for split in ['dev', 'hout']:
+        data_splits[split] = []  # empty list to store the subs per split
+        for cen in subset_subs.keys():
+            data_splits[split].extend(subset_subs[cen][split])  # add subs to final dict
+        # print results as feedback
+        n_split = split_counts[split][i_split].sum()
+        print(f'\t{split} data set (n = {n_split}):')
+
+        for s, c in enumerate(split_counts[split][i_split]):
+            print(f'score {s}: # {c} ({round(c / n_split * 100)} %)')
+
+    if EXCL_4s:
+        # traces with score 4 of included subs, ordered per center and split
+        excl_fours = []
+        for cen in subset_subs.keys():
+            for split in ['dev', 'hout']:
+                sel = (np.isin(trace_subs, subset_subs[cen][split])
+                       & (trace_scores == 4))
+                excl_fours.extend(compress(feats.incl_traces, sel))
+
+        print(f'\tTraces excl as FOURS: {excl_fours}')
+        return data_splits, excl_fours
+
+    else: return data_splits
+
+
+def get_trace_subs_and_scores(feats):
+    """
+    Returns arrays with sub and tap-score for
+    every trace in feats.incl_traces
+    """
+    trace_subs = np.array([getattr(feats, t).sub for t in feats.incl_traces])
+    trace_scores = np.array([getattr(feats, t).tap_score
+                             for t in feats.incl_traces], dtype=float)
+
+    return trace_subs, trace_scores
+
+
+def get_sub_score_counts(
+    trace_subs, trace_scores, subs, EXCL_4s=False, n_scores=5,
+):
+    """
+    Counts number of traces per sub and tap-score
+
+    Returns:
+        - sub_counts: 2d-array (n_subs x n_scores),
+            rows ordered as subs
+    """
+    sub_idx = {s: i for i, s in enumerate(subs)}
+    sel = np.isin(trace_subs, subs) & ~np.isnan(trace_scores)
+    if EXCL_4s: sel = sel & (trace_scores != 4)
+
+    rows = np.array([sub_idx[s] for s in trace_subs[sel]], dtype=int)
+    cols = trace_scores[sel].astype(int)
+
+    sub_counts = np.bincount(
+        rows * n_scores + cols, minlength=len(subs) * n_scores
+    ).reshape(len(subs), n_scores)
+
+    return sub_counts
+
+
+def get_split_subs(subs_dict, n_dev, rand_state):
+    """
+    Random split of subs in dev and hold-out per center,
+    equal to the legacy np.random.seed / choice order
+    """
+    rng = np.random.RandomState(rand_state)
+    subset_subs = {}
+
+    for cen in subs_dict.keys():
+        subset_subs[cen] = {}
+        subset_subs[cen]['dev'] = rng.choice(
+            sorted(subs_dict[cen]), n_dev, replace=False
         )
+        subset_subs[cen]['hout'] = [
+            s for s in subs_dict[cen]
+            if s not in subset_subs[cen]['dev']
+        ]
 
-        # if all distribution counts of split are within accepted ranges 
-        if accept_split:
-            print(f'Accepted Split: random state {rand_state}')
-            # show resulting scores distribution
-            print(f'\nResulting distributions in splitted data sets:')
-            print()
-            data_splits = {}
-            for split in split_scores.keys():
-                data_splits[split] = []  # empty list to store the subs per split
-                for cen in subset_subs.keys():
-                    data_splits[split].extend(subset_subs[cen][split])  # add subs to final dict
-                # print results as feedback
-                n_split = sum(split_scores[split].values())
-                print(f'\t{split} data set (n = {n_split}):')
-                scores = split_scores[split].keys()
-
-                for s in scores:
-                    c = split_scores[split][s]
-                    print(f'score {s}: # {c} ({round(c / n_split * 100)} %)')
-            
-            if EXCL_4s: 
-                print(f'\tTraces excl as FOURS: {excl_fours}')
-                return data_splits, excl_fours
-            else: return data_splits
-        
-        else:
-            continue
-    
-    print('no accepted split found')
+    return subset_subs
+
+
+def get_candidate_dev_masks(subs_dict, subs, n_dev, rand_states):
+    """
+    Returns boolean 2d-array (n_rand_states x n_subs),
+    True for subs in development set
+    """
+    sub_idx = {s: i for i, s in enumerate(subs)}
+    dev_masks = np.zeros((len(rand_states), len(subs)), dtype=bool)
+
+    for i_state, rand_state in enumerate(rand_states):
+        rng = np.random.RandomState(rand_state)
+        for cen in subs_dict.keys():
+            dev_subs = rng.choice(sorted(subs_dict[cen]), n_dev, replace=False)
+            dev_masks[i_state, [sub_idx[s] for s in dev_subs]] = True
+
+    return dev_masks
+
+
+def score_candidate_splits(dev_masks, sub_counts, og_score_perc):
+    """
+    Scores all candidate splits as matrix products
+
+    Input:
+        - dev_masks: boolean 2d-array (n_splits x n_subs)
+        - sub_counts: 2d-array (n_subs x n_scores)
+        - og_score_perc: dict with score percentages in
+            full data set
+
+    Returns:
+        - split_counts: dict with 'dev' and 'hout' count
+            arrays (n_splits x n_scores)
+        - max_deviation: largest absolute deviation of the
+            scores 0 - 3 from the original percentages, over
+            both splits (n_splits)
+    """
+    dev_counts = dev_masks.astype(int) @ sub_counts
+    hout_counts = sub_counts.sum(axis=0)[None, :] - dev_counts
+    og_perc = np.array([og_score_perc.get(s, 0) for s in range(4)])
+
+    max_deviation = np.zeros(len(dev_masks))
+    for counts in [dev_counts, hout_counts]:
+        n_split = counts.sum(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            perc = counts[:, :4] / n_split * 100
+        max_deviation = np.fmax(
+            max_deviation, np.abs(perc - og_perc[None, :]).max(axis=1)
+        )
 
-    return None
+    return {'dev': dev_counts, 'hout': hout_counts}, max_deviation
 
 
 def get_population_distribution(
@@ -40,7 +40,7 @@ import tkinter as tk
 from tkinter import filedialog
 
 class Poly5Reader: 
-    def __init__(self, filename=None, readAll = True):
+    def __init__(self, filename=None, readAll = True, dtype = np.float64):
         if filename==None:
             root = tk.Tk()
 
@@ -49,6 +49,7 @@ class Poly5Reader:
             
         self.filename = filename
         self.readAll = readAll
+        self.dtype = dtype  # samples are stored as float32 in file
         print('Reading file ', filename)
         self._readFile(filename)
         
@@ -110,7 +111,8 @@ class Poly5Reader:
                 self._buffer_size = self.num_channels*self.num_samples_per_block
                 
                 if self.readAll:
-                    sample_buffer = np.zeros(self.num_channels * self.num_samples)
+                    sample_buffer = np.zeros(self.num_channels * self.num_samples,
+                                             dtype=self.dtype)
      
                     for i in range(self.num_data_blocks):
                         print('\rProgress: % 0.1f %%' %(100*i/self.num_data_blocks), end="\r")
@@ -159,7 +161,8 @@ class Poly5Reader:
         if n_blocks==None:
             n_blocks = self.num_data_blocks
             
-        sample_buffer = np.zeros(self.num_channels*n_blocks*self.num_samples_per_block)
+        sample_buffer = np.zeros(self.num_channels*n_blocks*self.num_samples_per_block,
+                                 dtype=self.dtype)
      
         for i in range(n_blocks):
             data_block = self._readSignalBlock(self.file_obj, self._buffer_size, self._myfmt)
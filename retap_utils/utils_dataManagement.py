@@ -5,29 +5,125 @@ ReTap-Toolbox
 
 # import public packages and functions
 import os
-from pandas import read_excel
+import json
+from functools import lru_cache
+from pandas import read_excel, read_csv, isna
 import numpy as np
 from dataclasses import dataclass
+from typing import Any
 from array import array
 import pickle
 
 
+# environment variables overrule Cfg_paths.json, which overrules searching
+PATHS_CFG_ENV = 'RETAP_PATHS_CFG'
+PROJ_DIR_ENV = 'RETAP_PROJ_DIR'
+ONEDRIVE_DIR_ENV = 'RETAP_ONEDRIVE_DIR'
+PATHS_CFG_DEFAULT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'Cfg_paths.json'
+)
+ONEDRIVE_FOLDERS = [
+    'onedrive', 'retapdata', 'dus', 'ber','uncut',
+    'figures', 'results', 'data', 'models',
+]
+
+
+@lru_cache(maxsize=None)
+def get_paths_config():
+    """
+    Returns dict with configured paths (proj_dir,
+    onedrive_dir, and optional folders with a path
+    per folder of find_onedrive_path()), read once
+    from the json given in env variable RETAP_PATHS_CFG,
+    or Cfg_paths.json in the repo folder.
+    Paths in environment variables RETAP_PROJ_DIR and
+    RETAP_ONEDRIVE_DIR overrule the json.
+    """
+    cfg = {'proj_dir': None, 'onedrive_dir': None, 'folders': {}}
+
+    cfg_path = os.environ.get(PATHS_CFG_ENV, PATHS_CFG_DEFAULT)
+    if os.path.exists(cfg_path):
+        with open(cfg_path, 'r') as f:
+            cfg.update({k: v for k, v in json.load(f).items() if v})
+
+    if os.environ.get(PROJ_DIR_ENV):
+        cfg['proj_dir'] = os.environ[PROJ_DIR_ENV]
+    if os.environ.get(ONEDRIVE_DIR_ENV):
+        cfg['onedrive_dir'] = os.environ[ONEDRIVE_DIR_ENV]
+
+    cfg['folders'] = {k.lower(): v for k, v in cfg['folders'].items()}
+
+    return cfg
+
+
+def clear_path_cache():
+    """
+    Clears resolved paths, e.g. after changing
+    environment variables or Cfg_paths.json
+    """
+    get_paths_config.cache_clear()
+    _search_proj_dir.cache_clear()
+    _search_onedrive_dir.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def _search_proj_dir(start_dir):
+
+    dir = start_dir
+
+    while dir[-4:] != 'code':
+        # stop at file system root
+        if os.path.dirname(dir) == dir:
+            raise FileNotFoundError(
+                f'no parent folder "code" found from {start_dir}, set '
+                f'{PROJ_DIR_ENV} or proj_dir in {PATHS_CFG_DEFAULT}'
+            )
+        dir = os.path.dirname(dir)
+
+    return os.path.dirname(dir)
+
+
 def get_local_proj_dir():
     """
     Device and OS independent function to find
     the main-project folder, where this repo is
     stored. Project folder should contain subfolders:
     code (containinng this repo), data, figures
+
+    Configured path (see get_paths_config()) is used if
+    given, otherwise the folder is searched once per
+    working directory.
     """
-    dir = os.getcwd()
+    proj_dir = get_paths_config()['proj_dir']
+    if proj_dir: return proj_dir
 
-    while dir[-4:] != 'code':
+    return _search_proj_dir(os.getcwd())
 
-        dir = os.path.dirname(dir)
 
-    proj_dir = os.path.dirname(dir)
+@lru_cache(maxsize=None)
+def _search_onedrive_dir(start_dir):
+
+    path = start_dir
+    while os.path.dirname(path)[-5:] != 'Users':
+        # stop at file system root
+        if os.path.dirname(path) == path:
+            raise FileNotFoundError(
+                f'no Users-folder found from {start_dir}, set '
+                f'{ONEDRIVE_DIR_ENV} or onedrive_dir in {PATHS_CFG_DEFAULT}'
+            )
+        path = os.path.dirname(path)
+    # path is now Users/username
+    onedrive_f = [
+        f for f in os.listdir(path) if np.logical_and(
+            'onedrive' in f.lower(),
+            'charit' in f.lower()
+        ) 
+    ]
+    if len(onedrive_f) == 0:
+        raise FileNotFoundError(f'no OneDrive (Charite) folder in {path}')
 
-    return proj_dir
+    return os.path.join(path, onedrive_f[0])
 
 
 def find_onedrive_path(
@@ -36,27 +132,20 @@ def find_onedrive_path(
     """
     Device and OS independent function to find
     the synced-OneDrive folder where data is stored
+
+    Configured paths (see get_paths_config()) are used
+    if given, otherwise the OneDrive folder is searched
+    once per working directory.
     """
-    folder_options = [
-        'onedrive', 'retapdata', 'dus', 'ber','uncut',
-        'figures', 'results', 'data', 'models',
-    ]
-    if folder.lower() not in folder_options:
+    if folder.lower() not in ONEDRIVE_FOLDERS:
         raise ValueError(
             f'given folder: {folder} is incorrect, '
-            f'should be {folder_options}')
-        
-    path = os.getcwd()
-    while os.path.dirname(path)[-5:] != 'Users':
-        path = os.path.dirname(path)
-    # path is now Users/username
-    onedrive_f = [
-        f for f in os.listdir(path) if np.logical_and(
-            'onedrive' in f.lower(),
-            'charit' in f.lower()
-        ) 
-    ]
-    onedrive = os.path.join(path, onedrive_f[0])
+            f'should be {ONEDRIVE_FOLDERS}')
+
+    cfg = get_paths_config()
+    if folder.lower() in cfg['folders']: return cfg['folders'][folder.lower()]
+
+    onedrive = cfg['onedrive_dir'] or _search_onedrive_dir(os.getcwd())
     if folder.lower() == 'onedrive': return onedrive
 
     retapdata = os.path.join(onedrive, 'ReTap', 'data')
@@ -78,9 +167,19 @@ def find_onedrive_path(
         return os.path.join(onedrive, 'Retap', 'results', folder)
 
 
-def get_unique_subs(path):
+def list_dir_files(path, file_index=None):
+    """
+    Returns filenames in path, taken from the
+    fileIndex if given (no repeated listdir's)
+    """
+    if file_index is not None: return file_index.get_fnames(path)
+
+    return os.listdir(path)
+
 
-    files = os.listdir(path)
+def get_unique_subs(path, file_index=None):
+
+    files = list_dir_files(path, file_index)
     subs = [
         f.split('_')[0][-3:] for f in files
         if f[:3].lower() == 'sub'
@@ -92,11 +191,12 @@ def get_unique_subs(path):
 
 def get_file_selection(
     path, sub, state,
-    joker_string = None
+    joker_string = None,
+    file_index = None,
 ):
     sel_files = []
         
-    for f in os.listdir(path):
+    for f in list_dir_files(path, file_index):
 
         if not np.array([
             f'sub{sub}' in f.lower() or
@@ -117,6 +217,31 @@ def get_file_selection(
     return sel_files
 
 
+def load_acc_csv(filepath, dtype=np.float64):
+    """
+    Loads tri-axial acc-signal from block-csv (X, Y, Z
+    columns). Index columns without heading (Unnamed: 0)
+    are skipped while parsing, the csv-file itself is
+    never changed.
+
+    Input:
+        - filepath: path to csv-file
+        - dtype: dtype of returned array
+
+    Returns:
+        - dat: array (3 x n-samples)
+    """
+    dat = read_csv(
+        filepath,
+        index_col=False,
+        usecols=lambda col: not col.startswith('Unnamed'),
+        dtype=dtype,
+        engine='c',
+    )
+
+    return dat.values.T
+
+
 def get_arr_key_indices(ch_names, hand_code):
     """
     creates dict with acc-keynames and indices
@@ -212,17 +337,134 @@ def get_participantLog(center = ['DUS', 'BER']):
         - log: dict containing the BER and DUS
             sheet, each in one DataFRame in dict
     """
-    p = find_onedrive_path('retapdata')
-    xl_fname = 'ReTap_participantLog.xlsx'
-
     log = read_excel(
-        os.path.join(p, xl_fname),
+        get_participantLog_path(),
         sheet_name=center
     )
 
     return log
 
 
+def get_participantLog_path():
+
+    p = find_onedrive_path('retapdata')
+    xl_fname = 'ReTap_participantLog.xlsx'
+
+    return os.path.join(p, xl_fname)
+
+
+@dataclass(init=True, repr=True)
+class participantLogLookup:
+    """
+    Indexed UPDRS tap-scores from participant log of
+    one center, parsed once from the Excel file.
+
+    Input:
+        - center: DUS or BER, sheet of the participant log
+        - cache_dir: optional directory to store a binary
+            copy of the lookup, the copy is used as long as
+            the Excel file is not modified
+        - log: optional DataFrame with log, used instead
+            of reading the Excel file (no caching)
+
+    Scores are stored per (sub, med, stim, side, repetition),
+    with sub in upper case, med and stim as 0 or 1, side
+    as L or R. Use get_score() to get a score.
+    """
+    center: str
+    cache_dir: Any = None
+    log: Any = None
+
+    def __post_init__(self,):
+
+        if self.log is not None:
+            self.build_lookup(self.log)
+            self.log = None  # dataframe not needed anymore
+            return
+
+        xl_path = get_participantLog_path()
+        xl_mtime = os.path.getmtime(xl_path)
+
+        if self.cache_dir:
+            pickle_path = os.path.join(
+                self.cache_dir, f'participantLog_{self.center}.P'
+            )
+            if os.path.exists(pickle_path):
+                cached = load_class_pickle(pickle_path)
+                # only use copy based on current Excel file
+                if cached['xl_mtime'] == xl_mtime:
+                    self.scores = cached['scores']
+                    self.combis = cached['combis']
+                    self.duplicates = cached['duplicates']
+                    return
+
+        self.build_lookup(get_participantLog(self.center))
+
+        if self.cache_dir:
+            if not os.path.exists(self.cache_dir): os.makedirs(self.cache_dir)
+            with open(pickle_path, 'wb') as f:
+                pickle.dump({
+                    'xl_mtime': xl_mtime,
+                    'scores': self.scores,
+                    'combis': self.combis,
+                    'duplicates': self.duplicates,
+                }, f)
+
+    def build_lookup(self, log):
+        """
+        Parse all log rows once into dict with scores
+        """
+        self.scores = {}
+        self.combis = set()  # (sub, med, stim, side) with log rows
+        self.duplicates = set()
+
+        for sub, med, stim, sides, rep, score in zip(
+            log['subID'], log['medStatus'], log['stimStatus'],
+            log['side'], log['repetition'], log['updrsFt'],
+        ):
+            if isna(med) or isna(stim): continue
+            # side-string (e.g. left, right) includes side-letter
+            for side in ['L', 'R']:
+                if side.lower() not in str(sides): continue
+
+                combi = (str(sub).upper(), int(med), int(stim), side)
+                self.combis.add(combi)
+
+                if isna(rep): continue
+                key = combi + (int(rep),)
+
+                if key in self.scores: self.duplicates.add(key)
+                self.scores[key] = score
+
+    def has_scores(self, sub: str, state: str, side: str):
+        """
+        Returns whether log contains rows for sub, state
+        (e.g. M0S1), and side (L or R)
+        """
+        return (
+            sub.upper(), int(state[1]), int(state[3]), side[0].upper()
+        ) in self.combis
+
+    def get_score(self, sub: str, state: str, side: str, rep: int):
+        """
+        Returns:
+            - tap_score: integer score, None if not available
+            - skip_reason: None if score is available,
+                'missing-score', or 'NaN-score'
+        """
+        key = (sub.upper(), int(state[1]), int(state[3]),
+               side[0].upper(), int(rep))
+
+        if key in self.duplicates:
+            raise ValueError(f'multiple scores in participant log for {key}')
+
+        if key not in self.scores: return None, 'missing-score'
+
+        if isna(self.scores[key]): return None, 'NaN-score'
+
+        return int(self.scores[key]), None
+
+
 def save_class_pickle(
     class_to_save,
     path,
@@ -0,0 +1,164 @@
+"""
+File index for ReTap data directories, as part
+of (updrsTapping-repo) ReTap-Toolbox
+
+Every data directory is scanned once, all file-
+names are parsed into records with center, sub,
+state, side, block, and sample freq. File selection
+is done on the index instead of repeated listdir's.
+The index can be stored as json, and is only re-
+scanned when the directory changed.
+"""
+
+# import public packages and functions
+import os
+import re
+import json
+from dataclasses import dataclass, field
+from typing import Any
+
+
+def parse_tap_filename(fname: str):
+    """
+    Parses ReTap filename into record, e.g.
+    BER026_M0S0_L_block1_250Hz.csv, or uncut
+    files as sub026_M0S0_...poly5
+
+    Input:
+        - fname: filename without directory
+
+    Returns:
+        - record (dict): with fname, center, sub,
+            state, side, block, fs. Parts which are
+            not present in the filename are None
+    """
+    record = {
+        'fname': fname, 'center': None, 'sub': None,
+        'state': None, 'side': None, 'block': None, 'fs': None,
+    }
+    parts = os.path.splitext(fname)[0].split('_')
+
+    if fname[:3].upper() in ['BER', 'DUS']:
+        record['center'] = fname[:3].upper()
+        record['sub'] = parts[0]
+    # uncut files are coded as sub026, sub-026, or sub26
+    elif fname[:3].lower() == 'sub':
+        sub_match = re.match(r'sub-?(\d+)', fname.lower())
+        if sub_match: record['sub'] = sub_match.group(1).zfill(3)
+
+    state_match = re.search(r'M[01]S[01]', fname)
+    if state_match: record['state'] = state_match.group(0)
+
+    for side in ['L', 'R']:
+        if f'_{side}_' in fname: record['side'] = side
+
+    for part in parts:
+        if part.lower().startswith('block') and part[5:].isdigit():
+            record['block'] = int(part[5:])
+
+    fs = parts[-1].lower().split('hz')[0]
+    if parts[-1].lower().endswith('hz') and fs.isdigit():
+        record['fs'] = int(fs)
+
+    return record
+
+
+@dataclass(init=True, repr=True,)
+class fileIndex:
+    """
+    Index of files in one or more data directories.
+
+    Input:
+        - dirs: list of directories to index
+        - index_file: optional json-file to store
+            the index in, a stored index is re-used if
+            the modification time of the directory did
+            not change
+        - verbose: print scanned directories
+    """
+    dirs: list = field(default_factory=list)
+    index_file: Any = None
+    verbose: bool = False
+
+    def __post_init__(self,):
+
+        self.records = {}  # list of records per directory
+        self.mtimes = {}  # modification times of scanned dirs
+
+        if self.index_file and os.path.exists(self.index_file):
+            with open(self.index_file, 'r') as f:
+                stored = json.load(f)
+            for path, dir_index in stored.items():
+                # only re-use stored index of unchanged directories
+                if (os.path.exists(path) and
+                    os.stat(path).st_mtime == dir_index['mtime']):
+                    self.records[path] = dir_index['records']
+                    self.mtimes[path] = dir_index['mtime']
+
+        n_scanned = 0
+        for path in self.dirs:
+            if os.path.abspath(path) not in self.records:
+                self.scan(path)
+                n_scanned += 1
+
+        if self.index_file and n_scanned > 0: self.save()
+
+    def scan(self, path):
+        """
+        Lists directory once, and parses all filenames
+        """
+        path = os.path.abspath(path)
+        if self.verbose: print(f'indexing files in {path}')
+
+        self.mtimes[path] = os.stat(path).st_mtime
+        self.records[path] = [
+            parse_tap_filename(f) for f in sorted(os.listdir(path))
+        ]
+
+    def save(self,):
+
+        with open(self.index_file, 'w') as f:
+            json.dump({
+                path: {'mtime': self.mtimes[path],
+                       'records': self.records[path]}
+                for path in self.records
+            }, f)
+
+    def get_records(self, path, **criteria):
+        """
+        Returns records of files in path matching all
+        given criteria, e.g. get_records(path, sub='BER026',
+        state='M0S0', side='L'). Strings are compared case-
+        insensitive. Records are sorted on filename.
+        """
+        path = os.path.abspath(path)
+        # directories not indexed at init are scanned once
+        if path not in self.records: self.scan(path)
+
+        sel_records = []
+        for rec in self.records[path]:
+            match = True
+            for key, value in criteria.items():
+                if isinstance(value, str) and isinstance(rec[key], str):
+                    if rec[key].upper() != value.upper(): match = False
+                elif rec[key] != value: match = False
+                if not match: break
+
+            if match: sel_records.append(rec)
+
+        return sel_records
+
+    def get_fnames(self, path, **criteria):
+        """
+        Returns filenames, see get_records()
+        """
+        return [r['fname'] for r in self.get_records(path, **criteria)]
+
+    def get_subs(self, path, **criteria):
+        """
+        Returns sorted unique sub-codes, see get_records()
+        """
+        return sorted(set([
+            r['sub'] for r in self.get_records(path, **criteria)
+            if r['sub'] is not None
+        ]))
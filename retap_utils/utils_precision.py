@@ -0,0 +1,83 @@
+"""
+Precision policy of the acc-signal path in
+ReTap-Toolbox (loading, resampling, filtering,
+tap detection, feature extraction)
+
+Default is float64 (original behaviour). With float32
+all signal arrays are kept in float32: the recorded
+acc-data is float32 at source (Poly5), memory use of
+signals is halved, and vectorised steps (resampling,
+filtering, impact finding) run faster. Sample-wise
+python loops (updrsTapDetector, velocity_raising) do
+not gain speed. Tap indices are equal, feature values
+differ within FLOAT32_TOLERANCES (measured on the
+synthetic corpus with tap_benchmarks.bench_precision,
+run it on the full data set before switching).
+
+Select per run with set_signal_precision('float32'),
+the context manager signal_precision('float32'),
+FeatureSet(precision='float32'), or the environment
+variable RETAP_PRECISION=float32.
+"""
+
+# import public packages and functions
+import os
+from contextlib import contextmanager
+import numpy as np
+
+
+PRECISIONS = {'float64': np.float64, 'float32': np.float32}
+_POLICY = {'precision': os.environ.get('RETAP_PRECISION', 'float64')}
+if _POLICY['precision'] not in PRECISIONS:
+    raise ValueError(f'RETAP_PRECISION should be one of {list(PRECISIONS)}')
+
+# (rtol, atol) per feature of float32 vs float64 signal path, largest
+# measured relative difference times ~10, features not listed use
+# 'default' (largest measured: 6e-7). Entropy features are calculated
+# on rounded signals, and differ more
+FLOAT32_TOLERANCES = {
+    'default': (1e-5, 1e-7),
+    'tap_entropy': (1e-3, 1e-5),
+    'coefVar_tap_entropy': (1e-3, 1e-5),
+    'slope_tap_entropy': (1e-2, 1e-6),
+}
+
+
+def set_signal_precision(precision: str = 'float64'):
+
+    if precision not in PRECISIONS:
+        raise ValueError(f'precision should be one of {list(PRECISIONS)}')
+
+    _POLICY['precision'] = precision
+
+
+def get_signal_precision():
+
+    return _POLICY['precision']
+
+
+def get_signal_dtype():
+
+    return PRECISIONS[_POLICY['precision']]
+
+
+def as_signal_dtype(arr):
+    """
+    Returns array in the dtype of the current policy,
+    without copying if the dtype is already correct
+    """
+    return np.asarray(arr, dtype=get_signal_dtype())
+
+
+@contextmanager
+def signal_precision(precision=None):
+    """
+    Sets precision within the context, None keeps
+    the current policy
+    """
+    previous = _POLICY['precision']
+    if precision is not None: set_signal_precision(precision)
+    try:
+        yield
+    finally:
+        _POLICY['precision'] = previous
@@ -9,6 +9,10 @@ from array import array
 import numpy as np
 from scipy.signal import resample_poly
 
+from retap_utils.utils_profiling import profiled
+from retap_utils.utils_precision import as_signal_dtype
+
+@profiled()
 def resample(
     data: array,
     Fs_orig: int,
@@ -38,5 +42,6 @@ def resample(
     newdata = resample_poly(
         data, up=1, down=down, axis=-1
     )
+    newdata = as_signal_dtype(newdata)
 
     return newdata
\ No newline at end of file
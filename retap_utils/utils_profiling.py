@@ -0,0 +1,264 @@
+"""
+Opt-in profiling of pipeline stages in ReTap-Toolbox
+
+Stages (loading, resampling, preprocessing steps, block
+finding, tap detection, features, CV fit and predict) are
+marked with profile_stage() or @profiled. When profiling
+is disabled (default) both only check one flag. When
+enabled, wall time, CPU time and peak memory (tracemalloc)
+are recorded per call, nested stages are recorded with
+their parent stage.
+
+Enable with enable_profiling(), or by setting the
+environment variable RETAP_PROFILE=1 before starting
+python. Records are kept per process: profile with
+n_jobs=1 to include extraction and CV-fold stages.
+
+Example:
+    from retap_utils import utils_profiling as prof
+    prof.enable_profiling()
+    ... run pipeline ...
+    prof.print_hot_spots()
+    prof.export_profile(path, 'profile_ftExtraction')
+"""
+
+# import public packages and functions
+import os
+from os.path import join, exists
+import json
+import functools
+import tracemalloc
+from time import perf_counter, process_time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+
+from pandas import DataFrame
+
+
+@dataclass(init=True, repr=True,)
+class stageProfiler:
+    """
+    Collects one record per stage call
+
+    Input:
+        - enabled: record stages
+        - track_memory: record peak memory per stage,
+            tracemalloc slows down python code ~2 times,
+            timings are more exact without
+    """
+    enabled: bool = False
+    track_memory: bool = True
+    records: list = field(default_factory=list)
+
+    def __post_init__(self,):
+
+        self.stack = []  # open stages, innermost last
+
+    def start(self, track_memory=None):
+
+        if track_memory is not None: self.track_memory = track_memory
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.enabled = True
+
+    def stop(self,):
+
+        self.enabled = False
+        if tracemalloc.is_tracing(): tracemalloc.stop()
+
+    def reset(self,):
+
+        self.records = []
+        self.stack = []
+
+
+PROFILER = stageProfiler()
+if os.environ.get('RETAP_PROFILE', '0') not in ['0', '', 'false', 'False']:
+    PROFILER.start()
+
+
+class _stageTimer:
+    """
+    Context manager recording one call of a stage
+    """
+    __slots__ = ('name', 'parent', 'depth', 'wall0', 'cpu0',
+                 'mem0', 'peak_seen')
+
+    def __init__(self, name):
+
+        self.name = name
+
+    def __enter__(self,):
+
+        stack = PROFILER.stack
+        self.parent = stack[-1].name if stack else None
+        self.depth = len(stack)
+        self.mem0, self.peak_seen = None, 0
+
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            # keep peak of parent stage before resetting
+            if stack: stack[-1].peak_seen = max(stack[-1].peak_seen, peak)
+            tracemalloc.reset_peak()
+            self.mem0 = current
+
+        stack.append(self)
+        self.cpu0 = process_time()
+        self.wall0 = perf_counter()
+
+        return self
+
+    def __exit__(self, *exc):
+
+        wall = perf_counter() - self.wall0
+        cpu = process_time() - self.cpu0
+        PROFILER.stack.pop()
+
+        peak_mb = None
+        if self.mem0 is not None and tracemalloc.is_tracing():
+            peak = max(self.peak_seen, tracemalloc.get_traced_memory()[1])
+            peak_mb = (peak - self.mem0) / 1e6
+            # parent stage peak includes this stage
+            if PROFILER.stack:
+                PROFILER.stack[-1].peak_seen = max(
+                    PROFILER.stack[-1].peak_seen, peak
+                )
+
+        PROFILER.records.append({
+            'stage': self.name, 'parent': self.parent, 'depth': self.depth,
+            'wall_s': wall, 'cpu_s': cpu, 'peak_mb': peak_mb,
+            'failed': exc[0] is not None,
+        })
+
+        return False
+
+
+_NULL_STAGE = nullcontext()
+
+
+def profile_stage(name: str):
+    """
+    Context manager marking a stage, e.g.
+    with profile_stage('read_poly5'): ...
+    """
+    if not PROFILER.enabled: return _NULL_STAGE
+
+    return _stageTimer(name)
+
+
+def profiled(name=None):
+    """
+    Decorator marking a function as stage, name
+    defaults to module.function
+    """
+    def decorator(func):
+        stage_name = name or (
+            f'{func.__module__.split(".")[-1]}.{func.__qualname__}'
+        )
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled: return func(*args, **kwargs)
+            with _stageTimer(stage_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def enable_profiling(track_memory: bool = True, reset: bool = True):
+
+    if reset: PROFILER.reset()
+    PROFILER.start(track_memory=track_memory)
+
+
+def disable_profiling():
+
+    PROFILER.stop()
+
+
+def get_profile_records():
+    """
+    Returns DataFrame with one row per stage call
+    """
+    return DataFrame(
+        PROFILER.records,
+        columns=['stage', 'parent', 'depth', 'wall_s',
+                 'cpu_s', 'peak_mb', 'failed'],
+    )
+
+
+def get_profile_summary():
+    """
+    Summarises records per stage
+
+    Returns:
+        - summary: DataFrame per stage with n_calls,
+            total, mean and max wall time, total CPU time,
+            max peak memory, and percentage of the total
+            wall time of all top-level stages, sorted on
+            total wall time
+    """
+    records = get_profile_records()
+    total_wall = records.loc[records['depth'] == 0, 'wall_s'].sum()
+
+    summary = records.groupby('stage').agg(
+        n_calls=('wall_s', 'size'),
+        wall_total_s=('wall_s', 'sum'),
+        wall_mean_s=('wall_s', 'mean'),
+        wall_max_s=('wall_s', 'max'),
+        cpu_total_s=('cpu_s', 'sum'),
+        peak_max_mb=('peak_mb', 'max'),
+    )
+    summary['wall_perc'] = (
+        summary['wall_total_s'] / total_wall * 100 if total_wall > 0 else 0.
+    )
+
+    return summary.sort_values('wall_total_s', ascending=False)
+
+
+def print_hot_spots(top_n: int = 10):
+    """
+    Prints stages with the largest total wall time
+    """
+    summary = get_profile_summary()
+    if len(summary) == 0:
+        print('no profiled stages recorded')
+        return summary
+
+    print(f'\nPROFILED HOT SPOTS (top {min(top_n, len(summary))} '
+          f'of {len(summary)} stages)')
+    for stage, row in summary.head(top_n).iterrows():
+        peak = ('' if row['peak_max_mb'] != row['peak_max_mb']
+                else f', peak {round(row["peak_max_mb"], 1)} MB')
+        print(f'\t{stage}: {round(row["wall_total_s"], 3)} s '
+              f'({round(row["wall_perc"], 1)} %, {int(row["n_calls"])} calls,'
+              f' cpu {round(row["cpu_total_s"], 3)} s{peak})')
+
+    return summary
+
+
+def export_profile(path: str, fname: str, run_info: dict = {}):
+    """
+    Stores records and summary of current run as
+    fname.json (incl run_info), fname_records.csv,
+    and fname_summary.csv in path
+    """
+    if not exists(path): os.makedirs(path)
+
+    records = get_profile_records()
+    summary = get_profile_summary()
+
+    records.to_csv(join(path, f'{fname}_records.csv'), index=False)
+    summary.to_csv(join(path, f'{fname}_summary.csv'))
+
+    with open(join(path, f'{fname}.json'), 'w') as f:
+        json.dump({
+            'run_info': run_info,
+            'track_memory': PROFILER.track_memory,
+            'summary': summary.reset_index().to_dict(orient='records'),
+            'records': records.to_dict(orient='records'),
+        }, f, indent=1, default=str)
+
+    print(f'profile saved as {join(path, fname)}.json/_records.csv/_summary.csv')
@@ -17,6 +17,9 @@ from typing import Any
 
 # import own functions
 from retap_utils import utils_dataManagement, tmsi_poly5reader, utils_preprocessing
+from retap_utils import utils_fileIndex
+from retap_utils.utils_profiling import profile_stage
+from retap_utils.utils_precision import get_signal_dtype
 import tap_load_data.tapping_find_blocks as find_blocks
 import tap_load_data.tapping_preprocess as preproc
 
@@ -45,6 +48,9 @@ class rawAccData:
             
         ]
     )
+    file_index: Any = None  # optional fileIndex, prevents repeated listdir
+    chunk_s: Any = None  # seconds per segment for chunked detrending and block finding (long recordings)
+    n_jobs: int = 1  # segments processed in parallel (with chunk_s)
     STORE_CSV=True  # NOT SAVING AT THE MOMENT
     
 
@@ -53,7 +59,8 @@ class rawAccData:
         sel_files = utils_dataManagement.get_file_selection(
             path=self.uncut_path,
             sub=self.sub, state=self.state,
-            joker_string=self.joker_string
+            joker_string=self.joker_string,
+            file_index=self.file_index,
         )
         print(f'files selected: {sel_files}')
         
@@ -65,9 +72,11 @@ class rawAccData:
 
         for f in sel_files:
             # LOAD FILE
-            self.raw = tmsi_poly5reader.Poly5Reader(
-                os.path.join(self.uncut_path, f)
-            )
+            with profile_stage('read_poly5'):
+                self.raw = tmsi_poly5reader.Poly5Reader(
+                    os.path.join(self.uncut_path, f),
+                    dtype=get_signal_dtype(),
+                )
             hand_code = 'bilat'
             # check if file contains unilateral data
             for code in self.unilateral_coding_list:
@@ -131,6 +140,8 @@ class rawAccData:
                         to_check_magnOrder=True,
                         to_check_polarity=True,
                         to_remove_outlier=True,
+                        chunk_s=self.chunk_s,
+                        n_jobs=self.n_jobs,
                     )
                     # replace arr in class with processed data
                     setattr(
@@ -149,6 +160,8 @@ class rawAccData:
                     temp_acc, temp_ind = find_blocks.find_active_blocks(
                         acc_arr=getattr(file_data_class, acc_side),
                         fs=self.goal_fs,
+                        chunk_s=self.chunk_s,
+                        n_jobs=self.n_jobs,
                         verbose=True,
                         to_plot=True,
                         plot_orig_fname=f,
@@ -181,6 +194,8 @@ if __name__ == '__main__':
     """
     
     uncut_path = utils_dataManagement.find_onedrive_path('uncut')
+    # list uncut directory only once for all subs and states
+    uncut_index = utils_fileIndex.fileIndex(dirs=[uncut_path])
 
     # check for given Cfg-file
     if len(sys.argv) == 2: json_filename = sys.argv[1]
@@ -193,7 +208,8 @@ if __name__ == '__main__':
     # find subs to include
     if cfg['subs_states'] == 'ALL':
         # get unique sub numbers in UNCUT
-        subs = utils_dataManagement.get_unique_subs(uncut_path)
+        subs = utils_dataManagement.get_unique_subs(
+            uncut_path, file_index=uncut_index)
     else:
         # get defined subs
         subs = cfg['subs_states']  # subs given as list instead of dict .keys()
@@ -209,6 +225,9 @@ if __name__ == '__main__':
                     state=state,
                     uncut_path=uncut_path,
                     switched_sides=cfg['side_switch'],
+                    file_index=uncut_index,
+                    chunk_s=cfg.get('chunk_s', None),
+                    n_jobs=cfg.get('n_jobs', 1),
                 )
             except FileNotFoundError:
                 print(f'\t{state} not present for sub{sub}')
@@ -0,0 +1,3 @@
+"""
+init file for importing functions
+"""
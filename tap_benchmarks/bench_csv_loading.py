@@ -0,0 +1,102 @@
+"""
+Benchmark of the csv-parsing cost per trace
+during feature extraction.
+
+Compares the previous read path (full read_csv,
+deleting the index column, and rewriting the csv)
+with load_acc_csv(), which skips the index column
+while parsing and never writes.
+
+run from main repo path as:
+
+    python -m tap_benchmarks.bench_csv_loading (csv_dir)
+
+without csv_dir, temporary 10-second csv-files
+(with index column) are generated and used.
+"""
+
+# import public packages and functions
+import os
+import sys
+import shutil
+import tempfile
+from time import perf_counter
+import numpy as np
+from pandas import read_csv, DataFrame
+
+# import own functions
+from retap_utils.utils_dataManagement import load_acc_csv
+
+
+def old_read_path(filepath):
+    """previous read path in singleTrace, incl rewriting"""
+    dat = read_csv(filepath, index_col=False)
+    if 'Unnamed: 0' in dat.keys():
+        del(dat['Unnamed: 0'])
+        dat.to_csv(filepath, index=False)
+
+    return dat.values.T
+
+
+def create_temp_csvs(temp_dir, n_files=20, n_samples=2500):
+    """
+    Creates csv-files with index column (as written
+    by DataFrame.to_csv() without index=False)
+    """
+    for i in range(n_files):
+        dat = np.random.randn(n_samples, 3)
+        DataFrame(dat, columns=['X', 'Y', 'Z']).to_csv(
+            os.path.join(temp_dir, f'BER{i:03d}_M0S0_L_block1_250Hz.csv')
+        )
+
+
+def time_per_trace(load_func, filepaths, n_repeats=5):
+    """
+    Returns median loading time per trace in ms,
+    files are copied before every repeat to also
+    measure rewriting of files by load_func
+    """
+    times = []
+    for _ in range(n_repeats):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            copies = [shutil.copy(f, temp_dir) for f in filepaths]
+            t0 = perf_counter()
+            for f in copies: load_func(f)
+            times.append((perf_counter() - t0) / len(copies))
+
+    return np.median(times) * 1e3
+
+
+def run_csv_benchmark(csv_dir=None, n_repeats=5):
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if not csv_dir:
+            create_temp_csvs(temp_dir)
+            csv_dir = temp_dir
+
+        filepaths = [
+            os.path.join(csv_dir, f) for f in sorted(os.listdir(csv_dir))
+            if f.endswith('.csv')
+        ]
+        print(f'csv parse cost per trace ({len(filepaths)} files, '
+              f'median of {n_repeats} repeats):')
+
+        results = {
+            'read_csv + rewrite (old)': time_per_trace(
+                old_read_path, filepaths, n_repeats),
+            'load_acc_csv float64': time_per_trace(
+                load_acc_csv, filepaths, n_repeats),
+            'load_acc_csv float32': time_per_trace(
+                lambda f: load_acc_csv(f, dtype=np.float32),
+                filepaths, n_repeats),
+        }
+        for name, ms in results.items():
+            print(f'\t{name}: {round(ms, 3)} ms')
+
+    return results
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) == 2: run_csv_benchmark(csv_dir=sys.argv[1])
+    else: run_csv_benchmark()
@@ -0,0 +1,185 @@
+"""
+Benchmark of the ReTap pipeline stages on
+synthetic tapping recordings, no patient data
+needed.
+
+Stages: run_preproc_acc and find_active_blocks on
+the full recording, updrsTapDetector and tapFeatures
+per 10-second tapping block, create_X_y_vectors and
+cross-validation on a cohort of the extracted traces.
+Recordings of 10 seconds, 10 minutes, and 2 hours are
+generated (synthetic_tapping.py), median times per
+stage are printed (and stored as csv).
+
+run from main repo path as:
+
+    python -m tap_benchmarks.bench_pipeline (scales) (--csv=path)
+
+e.g. python -m tap_benchmarks.bench_pipeline 10s 10min
+without scales, all scales are run.
+"""
+
+# import public packages and functions
+import sys
+import io
+import contextlib
+from time import perf_counter
+from types import SimpleNamespace
+import numpy as np
+from pandas import DataFrame
+
+# import own functions
+from tap_benchmarks.synthetic_tapping import generate_tapping_signal
+from tap_load_data.tapping_preprocess import run_preproc_acc, find_main_axis
+from tap_load_data.tapping_find_blocks import find_active_blocks
+from tap_load_data.tapping_time_detect import updrsTapDetector
+from tap_extract_fts.tapping_extract_features import tapFeatures
+from tap_predict.tap_pred_prepare import create_X_y_vectors
+from tap_predict.retap_cv_models import get_cvFold_predictions_dicts
+
+
+SCALES = {
+    '10s': {'duration_s': 10, 'block_s': None, 'n_repeats': 5},
+    '10min': {'duration_s': 600, 'block_s': 10, 'rest_s': 10, 'n_repeats': 3},
+    '2h': {'duration_s': 7200, 'block_s': 10, 'rest_s': 20, 'n_repeats': 1},
+}
+
+BENCH_FEATS = [
+    'trace_RMSn', 'trace_entropy', 'jerkiness_trace',
+    'coefVar_intraTapInt', 'slope_intraTapInt',
+    'mean_tapRMS', 'coefVar_tapRMS', 'slope_tapRMS',
+    'mean_raise_velocity', 'coefVar_raise_velocity',
+    'coefVar_tap_entropy', 'slope_tap_entropy',
+]
+
+
+def time_stage(func, n_repeats, *args, **kwargs):
+    """
+    Returns median duration (s) and result of last repeat,
+    printed output of pipeline functions is suppressed
+    """
+    times = []
+    for _ in range(n_repeats):
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = perf_counter()
+            result = func(*args, **kwargs)
+            times.append(perf_counter() - t0)
+
+    return np.median(times), result
+
+
+def detect_blocks(acc_arr, fs, block_starts, block_ends, main_ax_i):
+
+    return [
+        updrsTapDetector(acc_arr[:, i0:i1], main_ax_i=main_ax_i, fs=fs)
+        for i0, i1 in zip(block_starts, block_ends)
+    ]
+
+
+def extract_blocks(acc_arr, fs, block_starts, block_ends, detected):
+
+    return [
+        tapFeatures(triax_arr=acc_arr[:, i0:i1].copy(), fs=fs,
+                    impacts=impacts, tap_lists=taps, updrsSubScore=0.)
+        for i0, i1, (taps, impacts, _) in zip(block_starts, block_ends, detected)
+    ]
+
+
+def create_cohort(block_fts, min_n_traces=40, seed=27):
+    """
+    FeatureSet-like class with one trace per block, repeated
+    up to min_n_traces (features varied by 10 %), with
+    random tap scores (0 - 3)
+    """
+    rng = np.random.default_rng(seed)
+    n_traces = max(len(block_fts), min_n_traces)
+    cohort = SimpleNamespace(incl_traces=[])
+
+    for i in range(n_traces):
+        trace_id = f'SYN{i:03d}_M0S0_L_1'
+        fts = block_fts[i % len(block_fts)]
+        setattr(cohort, trace_id, SimpleNamespace(
+            fts=SimpleNamespace(**{
+                ft: getattr(fts, ft) * (1 + .1 * rng.standard_normal())
+                for ft in BENCH_FEATS
+            }),
+            tap_score=rng.integers(0, 4), sub=trace_id[:6],
+        ))
+        cohort.incl_traces.append(trace_id)
+
+    return cohort
+
+
+def run_scale_benchmark(scale: str, fs: int = 250, clf: str = 'logreg'):
+    """
+    Times all pipeline stages on one synthetic recording
+
+    Returns:
+        - results: dict with median seconds per stage
+    """
+    settings = SCALES[scale].copy()
+    n_repeats = settings.pop('n_repeats')
+    acc_arr, info = generate_tapping_signal(fs=fs, **settings)
+    starts, ends = info['block_starts'], info['block_ends']
+    print(f'\n{scale}: {acc_arr.shape[1]} samples, {len(starts)} tapping '
+          f'blocks, {len(info["impacts"])} taps ({n_repeats} repeats)')
+
+    results = {}
+    results['run_preproc_acc'], (preproc_arr, main_ax_i) = time_stage(
+        lambda: run_preproc_acc(acc_arr.copy(), fs, verbose=False), n_repeats,
+    )
+    results['find_active_blocks'], _ = time_stage(
+        find_active_blocks, n_repeats, acc_arr, fs,
+        to_plot=False, verbose=False,
+    )
+    main_ax_i = find_main_axis(preproc_arr)
+    results['updrsTapDetector'], detected = time_stage(
+        detect_blocks, n_repeats, preproc_arr, fs, starts, ends, main_ax_i,
+    )
+    results['tapFeatures'], block_fts = time_stage(
+        extract_blocks, n_repeats, preproc_arr, fs, starts, ends, detected,
+    )
+    n_detected = sum([len(d[1]) for d in detected])
+    print(f'\t{n_detected} impacts detected')
+
+    cohort = create_cohort(block_fts)
+    results['create_X_y_vectors'], (X, y) = time_stage(
+        create_X_y_vectors, n_repeats, cohort,
+        incl_feats=BENCH_FEATS, incl_traces=cohort.incl_traces,
+        to_zscore=True,
+    )
+    results[f'cv_{clf}'], _ = time_stage(
+        get_cvFold_predictions_dicts, n_repeats, X, y.astype(int),
+        clf=clf, verbose=False,
+    )
+    for stage, t in results.items():
+        print(f'\t{stage}: {round(t * 1e3, 2)} ms')
+
+    return results
+
+
+def run_pipeline_benchmark(scales=None, fs=250, csv_path=None):
+
+    if not scales: scales = list(SCALES.keys())
+
+    results = DataFrame({
+        f'{scale}_s': run_scale_benchmark(scale, fs=fs) for scale in scales
+    })
+    print(f'\nmedian seconds per stage:\n{results.round(4)}')
+
+    if csv_path:
+        results.to_csv(csv_path)
+        print(f'benchmark saved as {csv_path}')
+
+    return results
+
+
+if __name__ == '__main__':
+
+    csv_path = None
+    scales = []
+    for arg in sys.argv[1:]:
+        if arg.startswith('--csv='): csv_path = arg.split('=', 1)[1]
+        else: scales.append(arg)
+
+    run_pipeline_benchmark(scales=scales, csv_path=csv_path)
@@ -0,0 +1,132 @@
+"""
+Benchmark and validation of the float32 signal
+path (see retap_utils.utils_precision).
+
+Runs preprocessing, tap detection and feature
+extraction on every corpus trace with float64 and
+with float32 signals. Reports signal memory, run
+time, differences in tap indices, and the largest
+relative difference per feature, which are the base
+for FLOAT32_TOLERANCES.
+
+run from main repo path as:
+
+    python -m tap_benchmarks.bench_precision (--corpus_dir=path)
+
+corpus_dir can contain block csv-files (full data set),
+without corpus_dir synthetic traces are used.
+"""
+
+# import public packages and functions
+import sys
+from time import perf_counter
+import numpy as np
+from pandas import DataFrame
+
+# import own functions
+from retap_utils.utils_precision import (
+    signal_precision, as_signal_dtype, FLOAT32_TOLERANCES,
+)
+from tap_benchmarks.golden_outputs import (
+    get_synthetic_corpus, get_stored_corpus, prepare_trace,
+    ref_updrsTapDetector, ref_tapFeatures, compare_outputs,
+)
+
+
+def run_precision(raw_trace, precision):
+    """
+    Returns detected taps, features, signal bytes (raw
+    and preprocessed) and duration of the signal path
+    """
+    with signal_precision(precision):
+        t0 = perf_counter()
+        raw = {'acc': as_signal_dtype(raw_trace['acc']), 'fs': raw_trace['fs']}
+        trace = prepare_trace(raw)
+        detected = ref_updrsTapDetector(trace)
+        features = ref_tapFeatures(trace)
+        duration = perf_counter() - t0
+
+    nbytes = raw['acc'].nbytes + trace['acc'].nbytes
+
+    return detected, features, nbytes, duration
+
+
+def run_precision_benchmark(corpus=None, n_repeats=3):
+    """
+    Returns:
+        - traces: DataFrame per trace with bytes and
+            times of both precisions, and tap differences
+        - features: DataFrame per feature with largest
+            relative and absolute difference, and whether
+            it is within FLOAT32_TOLERANCES
+    """
+    if corpus is None: corpus = get_synthetic_corpus()
+    trace_rows, max_rel, max_abs = [], {}, {}
+
+    for trace_id, raw_trace in corpus.items():
+        results = {}
+        for precision in ['float64', 'float32']:
+            runs = [run_precision(raw_trace, precision) for _ in range(n_repeats)]
+            results[precision] = runs[-1][:3] + (
+                np.median([r[3] for r in runs]),
+            )
+        det64, fts64, bytes64, t64 = results['float64']
+        det32, fts32, bytes32, t32 = results['float32']
+
+        tap_diffs = compare_outputs(det64, det32)
+        trace_rows.append({
+            'trace': trace_id, 'n_taps': len(det64['taps']),
+            'tap_index_diffs': len(tap_diffs),
+            'mb_float64': bytes64 / 1e6, 'mb_float32': bytes32 / 1e6,
+            'time_float64_s': t64, 'time_float32_s': t32,
+        })
+        if tap_diffs: continue  # features based on different taps
+
+        for ft in fts64:
+            r, a = np.ravel(fts64[ft]), np.ravel(fts32[ft]).astype(float)
+            if r.shape != a.shape: continue
+            with np.errstate(divide='ignore', invalid='ignore'):
+                abs_diff = np.abs(a - r)
+                rel_diff = abs_diff / np.abs(r)
+            max_abs[ft] = max(max_abs.get(ft, 0), np.nanmax(abs_diff, initial=0))
+            rel_diff = rel_diff[np.isfinite(rel_diff)]
+            max_rel[ft] = max(max_rel.get(ft, 0), np.max(rel_diff, initial=0))
+
+    traces = DataFrame(trace_rows)
+    features = DataFrame({'max_rel_diff': max_rel, 'max_abs_diff': max_abs})
+    features['rtol'] = [FLOAT32_TOLERANCES.get(ft, FLOAT32_TOLERANCES['default'])[0]
+                        for ft in features.index]
+    features['atol'] = [FLOAT32_TOLERANCES.get(ft, FLOAT32_TOLERANCES['default'])[1]
+                        for ft in features.index]
+    features['within_tol'] = (
+        (features['max_rel_diff'] <= features['rtol'])
+        | (features['max_abs_diff'] <= features['atol'])
+    )
+
+    mem_gain = traces['mb_float64'].sum() / traces['mb_float32'].sum()
+    speed_gain = traces['time_float64_s'].sum() / traces['time_float32_s'].sum()
+    print(f'\n{len(traces)} traces, tap index differences in '
+          f'{(traces["tap_index_diffs"] > 0).sum()} traces')
+    print(f'signal memory: {round(traces["mb_float64"].sum(), 2)} MB (float64)'
+          f' vs {round(traces["mb_float32"].sum(), 2)} MB (float32), '
+          f'{round(mem_gain, 2)}x')
+    print(f'signal path time: {round(traces["time_float64_s"].sum(), 3)} s '
+          f'(float64) vs {round(traces["time_float32_s"].sum(), 3)} s '
+          f'(float32), {round(speed_gain, 2)}x')
+    print(f'\nlargest feature differences:\n'
+          f'{features.sort_values("max_rel_diff", ascending=False).head(15)}')
+    if not features['within_tol'].all():
+        print(f'\nOUTSIDE TOLERANCE: '
+              f'{list(features.index[~features["within_tol"]])}')
+
+    return traces, features
+
+
+if __name__ == '__main__':
+
+    corpus = None
+    for arg in sys.argv[1:]:
+        if arg.startswith('--corpus_dir='):
+            corpus = get_stored_corpus(arg.split('=', 1)[1])
+
+    run_precision_benchmark(corpus=corpus)
@@ -0,0 +1,357 @@
+"""
+Golden-output regression harness for the tap
+detection and feature extraction stages.
+
+Reference implementations (find_impacts,
+updrsTapDetector, find_active_blocks, tapFeatures)
+are run over a corpus of synthetic (or stored)
+traces. Alternative (accelerated) engines registered
+with register_engine() are run on the same inputs,
+tap indices and feature values are compared within
+tolerances, and speedups are reported. Reference
+outputs can be stored as golden outputs, and later
+runs are compared with the stored outputs.
+
+run from main repo path as:
+
+    python -m tap_benchmarks.golden_outputs (--store) (--golden_dir=path)
+        (--corpus_dir=path)
+
+--store saves reference outputs in golden_dir, without
+--store current outputs are compared with golden_dir.
+corpus_dir can contain csv-files (load_acc_csv) with
+sample frequency in the filename (e.g. _250Hz.csv),
+without corpus_dir synthetic traces are used.
+"""
+
+# import public packages and functions
+import os
+import sys
+import io
+import contextlib
+from os.path import join, exists
+from time import perf_counter
+import numpy as np
+from pandas import DataFrame
+
+# import own functions
+from tap_benchmarks.synthetic_tapping import generate_tapping_signal
+from tap_load_data.tapping_preprocess import run_preproc_acc, find_main_axis
+from tap_load_data.tapping_impact_finder import find_impacts
+from tap_load_data.tapping_find_blocks import find_active_blocks
+from tap_load_data.tapping_time_detect import updrsTapDetector
+from tap_extract_fts.tapping_extract_features import tapFeatures
+from tap_extract_fts.tapping_featureset import signalvectormagn
+from retap_utils.utils_dataManagement import load_acc_csv
+
+
+# keys containing sample indices, compared with index tolerance
+INDEX_KEYS = ['impacts', 'taps', 'start', 'end']
+# (rtol, atol) per feature, default is used for all other keys
+FEATURE_TOLERANCES = {
+    'default': (1e-9, 1e-12),
+}
+# tapFeatures attributes which are inputs, not features
+NON_FEATURE_ATTRS = ['triax_arr', 'fs', 'impacts', 'tap_lists',
+                     'max_n_taps_incl', 'updrsSubScore']
+
+
+def ref_find_impacts(trace):
+
+    return {'impacts': find_impacts(signalvectormagn(trace['acc']),
+                                    trace['fs'])}
+
+
+def ref_updrsTapDetector(trace):
+
+    taps, impacts, _ = updrsTapDetector(
+        trace['acc'], main_ax_i=trace['main_ax_i'], fs=trace['fs'],
+    )
+    return {'taps': np.array(taps).reshape(len(taps), 7),
+            'impacts': np.asarray(impacts)}
+
+
+def ref_find_active_blocks(trace):
+
+    _, block_indices = find_active_blocks(
+        trace['acc'], trace['fs'], to_plot=False, verbose=False,
+    )
+    return {'start': np.asarray(block_indices['start']),
+            'end': np.asarray(block_indices['end'])}
+
+
+def ref_tapFeatures(trace):
+
+    fts = tapFeatures(
+        triax_arr=trace['acc'].copy(), fs=trace['fs'],
+        impacts=trace['ref_impacts'], tap_lists=trace['ref_taps'],
+        updrsSubScore=0.,
+    )
+    return get_feature_outputs(fts)
+
+
+def get_feature_outputs(fts):
+    """
+    Returns dict with all numeric features of
+    a tapFeatures class (scalars and per-tap arrays)
+    """
+    outputs = {}
+    for attr, value in vars(fts).items():
+        if attr in NON_FEATURE_ATTRS: continue
+        value = np.asarray(value)
+        if value.dtype.kind not in 'fiub': continue
+        outputs[attr] = value.astype(float)
+
+    return outputs
+
+
+# engines per stage, 'reference' is compared with all others
+ENGINES = {
+    'find_impacts': {'reference': ref_find_impacts},
+    'updrsTapDetector': {'reference': ref_updrsTapDetector},
+    'find_active_blocks': {'reference': ref_find_active_blocks},
+    'tapFeatures': {'reference': ref_tapFeatures},
+}
+
+
+def register_engine(stage: str, name: str, func):
+    """
+    Adds alternative engine for a stage. func gets a trace
+    dict (acc, fs, main_ax_i, ref_taps, ref_impacts) and
+    returns a dict with outputs as the reference engine
+    """
+    if stage not in ENGINES:
+        raise ValueError(f'unknown stage {stage}, choose from {list(ENGINES)}')
+
+    ENGINES[stage][name] = func
+
+
+def get_synthetic_corpus(fs: int = 250):
+    """
+    Returns dict with raw synthetic traces per
+    trace-id, covering the preprocessing corrections
+    and a longer recording with several blocks
+    """
+    variants = {
+        'default': {},
+        'fast': {'tap_rate': 5., 'amp_decrement': .1},
+        'slow_decrement': {'tap_rate': 1.5, 'amp_decrement': .7},
+        'jitter_noise': {'jitter': .2, 'noise_sd': .15},
+        'outliers': {'n_outliers': 3},
+        'polarity': {'flip_polarity': True},
+        'magnitude': {'magnitude_order': 1e-6},
+        'blocks_2min': {'duration_s': 120, 'block_s': 10, 'rest_s': 10},
+    }
+    corpus = {}
+    for i, (name, kwargs) in enumerate(variants.items()):
+        acc, _ = generate_tapping_signal(fs=fs, seed=i, **kwargs)
+        corpus[f'SYN_{name}'] = {'acc': acc, 'fs': fs}
+
+    return corpus
+
+
+def get_stored_corpus(corpus_dir: str):
+
+    corpus = {}
+    for f in sorted(os.listdir(corpus_dir)):
+        if not f.endswith('.csv'): continue
+        fs = int(f.split('_')[-1].lower().split('hz')[0])
+        corpus[f[:-4]] = {'acc': load_acc_csv(join(corpus_dir, f)), 'fs': fs}
+
+    return corpus
+
+
+def prepare_trace(raw_trace):
+    """
+    Preprocesses raw trace and adds reference tap detection,
+    used as input for all engines
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        acc, main_ax_i = run_preproc_acc(raw_trace['acc'].copy(),
+                                         raw_trace['fs'], verbose=False)
+    # tap detection removes nan-samples (outliers)
+    acc = acc[:, ~np.isnan(acc).any(axis=0)]
+    trace = {'acc': acc, 'fs': raw_trace['fs'],
+             'main_ax_i': find_main_axis(acc)}
+    ref_detect = ref_updrsTapDetector(trace)
+    trace['ref_taps'] = list(ref_detect['taps'])
+    trace['ref_impacts'] = ref_detect['impacts']
+
+    return trace
+
+
+def run_engine(func, trace, n_repeats=3):
+    """
+    Returns outputs and median duration (s) of engine
+    """
+    times = []
+    for _ in range(n_repeats):
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = perf_counter()
+            outputs = func(trace)
+            times.append(perf_counter() - t0)
+
+    return outputs, np.median(times)
+
+
+def compare_outputs(ref, alt, idx_tol: int = 0, tolerances: dict = None):
+    """
+    Compares output dicts of one stage
+
+    Input:
+        - ref, alt: dicts with arrays per key
+        - idx_tol: allowed difference of sample indices
+        - tolerances: (rtol, atol) per key, see
+            FEATURE_TOLERANCES
+
+    Returns:
+        - diffs: list with dict per differing key (key,
+            reason, n_differing, max_abs_diff)
+    """
+    if tolerances is None: tolerances = FEATURE_TOLERANCES
+    diffs = []
+
+    for key in sorted(set(ref) | set(alt)):
+        if key not in ref or key not in alt:
+            diffs.append({'key': key, 'reason': 'missing key',
+                          'n_differing': None, 'max_abs_diff': None})
+            continue
+
+        r, a = np.asarray(ref[key], float), np.asarray(alt[key], float)
+        if r.shape != a.shape:
+            diffs.append({'key': key, 'reason': f'shape {r.shape} vs {a.shape}',
+                          'n_differing': None, 'max_abs_diff': None})
+            continue
+
+        if key in INDEX_KEYS: rtol, atol = 0, idx_tol
+        else: rtol, atol = tolerances.get(key, tolerances['default'])
+        close = np.isclose(a, r, rtol=rtol, atol=atol, equal_nan=True)
+
+        if not close.all():
+            abs_diff = np.abs(a - r)
+            diffs.append({
+                'key': key, 'reason': 'values',
+                'n_differing': int((~close).sum()),
+                'max_abs_diff': float(np.nanmax(abs_diff)) if np.isfinite(
+                    abs_diff).any() else np.nan,
+            })
+
+    return diffs
+
+
+def run_regression(
+    corpus=None, golden_dir=None, n_repeats: int = 3,
+    idx_tol: int = 0, tolerances: dict = None, verbose: bool = True,
+):
+    """
+    Runs all engines over the corpus and compares them
+    with the reference engine, and with the stored golden
+    outputs (if golden_dir is given and exists)
+
+    Returns:
+        - report: DataFrame with one row per trace, stage and
+            engine (n_differing_keys, time_s, speedup)
+        - all_equal: True if no differences are found
+    """
+    if corpus is None: corpus = get_synthetic_corpus()
+    rows, all_diffs = [], []
+
+    for trace_id, raw_trace in corpus.items():
+        trace = prepare_trace(raw_trace)
+        golden = load_golden_outputs(golden_dir, trace_id)
+
+        for stage, engines in ENGINES.items():
+            ref_out, ref_time = run_engine(engines['reference'], trace,
+                                           n_repeats)
+            to_compare = {name: run_engine(func, trace, n_repeats)
+                          for name, func in engines.items()
+                          if name != 'reference'}
+            if golden is not None:
+                stage_golden = {k.split('__', 1)[1]: v for k, v in golden.items()
+                                if k.startswith(f'{stage}__')}
+                # current reference is compared with golden reference
+                to_compare['reference_vs_golden'] = (ref_out, ref_time)
+                ref_out = stage_golden
+
+            for name, (alt_out, alt_time) in to_compare.items():
+                diffs = compare_outputs(ref_out, alt_out, idx_tol, tolerances)
+                for d in diffs: d.update({'trace': trace_id, 'stage': stage,
+                                          'engine': name})
+                all_diffs.extend(diffs)
+                rows.append({
+                    'trace': trace_id, 'stage': stage, 'engine': name,
+                    'n_differing_keys': len(diffs), 'ref_time_s': ref_time,
+                    'time_s': alt_time, 'speedup': ref_time / alt_time,
+                })
+
+    report = DataFrame(rows, columns=[
+        'trace', 'stage', 'engine', 'n_differing_keys',
+        'ref_time_s', 'time_s', 'speedup',
+    ])
+    all_equal = len(all_diffs) == 0
+
+    if verbose:
+        if len(report) == 0:
+            print('no alternative engines registered and no golden outputs '
+                  'found, nothing compared')
+        else:
+            summary = report.groupby(['stage', 'engine']).agg(
+                n_traces=('trace', 'size'),
+                n_differing=('n_differing_keys', lambda x: (x > 0).sum()),
+                ref_time_s=('ref_time_s', 'sum'),
+                time_s=('time_s', 'sum'),
+            )
+            summary['speedup'] = summary['ref_time_s'] / summary['time_s']
+            print(summary.round(4))
+        for d in all_diffs:
+            print(f'\tDIFF {d["trace"]} {d["stage"]} ({d["engine"]}): '
+                  f'{d["key"]} {d["reason"]}, n={d["n_differing"]}, '
+                  f'max abs diff={d["max_abs_diff"]}')
+        print('ALL OUTPUTS EQUAL' if all_equal else
+              f'{len(all_diffs)} DIFFERENCES FOUND')
+
+    return report, all_equal
+
+
+def store_golden_outputs(golden_dir: str, corpus=None):
+    """
+    Stores reference outputs per trace as npz
+    (keys: stage__output)
+    """
+    if corpus is None: corpus = get_synthetic_corpus()
+    if not exists(golden_dir): os.makedirs(golden_dir)
+
+    for trace_id, raw_trace in corpus.items():
+        trace = prepare_trace(raw_trace)
+        outputs = {}
+        for stage, engines in ENGINES.items():
+            stage_out, _ = run_engine(engines['reference'], trace, n_repeats=1)
+            outputs.update({f'{stage}__{k}': v for k, v in stage_out.items()})
+        np.savez(join(golden_dir, f'{trace_id}.npz'), **outputs)
+
+    print(f'golden outputs of {len(corpus)} traces stored in {golden_dir}')
+
+
+def load_golden_outputs(golden_dir, trace_id):
+
+    if not golden_dir: return None
+    fpath = join(golden_dir, f'{trace_id}.npz')
+    if not exists(fpath): return None
+
+    with np.load(fpath) as f:
+        return {key: f[key] for key in f.files}
+
+
+if __name__ == '__main__':
+
+    args = {a.split('=')[0]: (a.split('=', 1)[1] if '=' in a else True)
+            for a in sys.argv[1:]}
+    golden_dir = args.get('--golden_dir', join('results', 'golden_outputs'))
+    corpus = (get_stored_corpus(args['--corpus_dir'])
+              if '--corpus_dir' in args else None)
+
+    if args.get('--store', False):
+        store_golden_outputs(golden_dir, corpus=corpus)
+    else:
+        _, all_equal = run_regression(corpus=corpus, golden_dir=golden_dir)
+        sys.exit(0 if all_equal else 1)
@@ -0,0 +1,179 @@
+"""
+Synthetic tri-axial finger-tapping signals, to
+run and benchmark the ReTap pipeline without
+patient data.
+
+Every tap consists of a finger-raise (upwards
+acceleration and deceleration), a short pause, a
+downwards acceleration, and a sharp impact peak at
+finger closing, followed by a short rest. Tap rate,
+amplitude decrement, jitter, noise, outliers,
+polarity flips and errors in order of magnitude
+can be set. Long recordings consist of tapping
+blocks separated by rest.
+"""
+
+# import public packages and functions
+import numpy as np
+
+
+def generate_tap(
+    n_samples: int, fs: int, amplitude: float, impact_gain: float = 3.,
+):
+    """
+    Acceleration of one tap on the tapping axis
+
+    Input:
+        - n_samples: length of tap (tap period)
+        - fs: sample frequency
+        - amplitude: peak acceleration of raising
+        - impact_gain: impact peak relative to amplitude
+
+    Returns:
+        - tap: 1d-array (n_samples)
+        - i_impact: index of impact peak in tap
+    """
+    n_up = int(n_samples * .35)
+    n_pause = int(n_samples * .1)
+    n_down = int(n_samples * .3)
+    n_imp = max(int(fs * .03), 3)  # impact lasts ~30 ms
+
+    up = amplitude * np.sin(2 * np.pi * np.arange(n_up) / n_up)
+    down = -amplitude * .8 * np.sin(np.pi * np.arange(n_down) / n_down)
+    # fast damped oscillation at finger closing
+    t_imp = np.arange(n_imp) / n_imp
+    impact = (amplitude * impact_gain * np.exp(-5 * t_imp)
+              * np.cos(2 * np.pi * t_imp))
+
+    tap = np.zeros(n_samples)
+    tap[:n_up] = up
+    i_down = n_up + n_pause
+    tap[i_down:i_down + n_down] = down
+    i_impact = i_down + n_down
+    tap[i_impact:i_impact + n_imp] = impact[:n_samples - i_impact]
+
+    return tap, i_impact
+
+
+def generate_tap_block(
+    n_samples: int, fs: int, tap_rate: float = 3.,
+    amplitude: float = 2., amp_decrement: float = 0.,
+    jitter: float = 0., rng=None,
+):
+    """
+    Tapping axis of one continuous tapping block
+
+    Input:
+        - n_samples: block length
+        - fs: sample frequency
+        - tap_rate: taps per second
+        - amplitude: amplitude of first tap
+        - amp_decrement: relative amplitude loss from
+            first to last tap (e.g. .5 halves amplitude)
+        - jitter: sd of tap periods, relative to period
+        - rng: numpy Generator
+
+    Returns:
+        - sig: 1d-array (n_samples)
+        - impacts: sample indices of impacts in block
+    """
+    if rng is None: rng = np.random.default_rng()
+    period = fs / tap_rate
+    n_taps = int(n_samples / period)
+
+    periods = period * (1 + jitter * rng.standard_normal(n_taps))
+    periods = np.clip(periods, period * .5, period * 2).astype(int)
+    amps = amplitude * (1 - amp_decrement * np.linspace(0, 1, n_taps))
+
+    sig = np.zeros(n_samples)
+    impacts = []
+    i_start = int(fs * .2)  # rest before first tap
+    for tap_period, amp in zip(periods, amps):
+        if i_start + tap_period > n_samples: break
+        tap, i_impact = generate_tap(tap_period, fs, amp)
+        sig[i_start:i_start + tap_period] = tap
+        impacts.append(i_start + i_impact)
+        i_start += tap_period
+
+    return sig, np.array(impacts, dtype=int)
+
+
+def generate_tapping_signal(
+    duration_s: float = 10., fs: int = 250, tap_rate: float = 3.,
+    amplitude: float = 2., amp_decrement: float = .3,
+    jitter: float = .05, noise_sd: float = .05,
+    n_outliers: int = 0, flip_polarity: bool = False,
+    magnitude_order: float = 1., main_axis: int = 0,
+    block_s: float = None, rest_s: float = 10., seed: int = 27,
+):
+    """
+    Creates tri-axial acc-signal of finger-tapping
+
+    Input:
+        - duration_s: total duration in seconds
+        - fs: sample frequency in Hz
+        - tap_rate, amplitude, amp_decrement, jitter: see
+            generate_tap_block()
+        - noise_sd: sd of gaussian noise on all axes
+        - n_outliers: number of large artefact peaks
+            (removed by remove_outlier())
+        - flip_polarity: invert signal (corrected by
+            check_polarity())
+        - magnitude_order: scaling of the signal, e.g.
+            1e-6 or 1e6 (corrected by check_order_magnitude())
+        - main_axis: axis index recording the tapping
+        - block_s: duration of tapping blocks, separated by
+            rest_s seconds of rest; None for continuous tapping
+        - seed: random seed
+
+    Returns:
+        - acc_arr: 2d-array (3 x n_samples)
+        - info: dict with true impacts (sample indices),
+            block_starts and block_ends (sample indices), fs,
+            and main_axis
+    """
+    rng = np.random.default_rng(seed)
+    n_samples = int(duration_s * fs)
+
+    if block_s is None:
+        block_bounds = [(0, n_samples)]
+    else:
+        block_len, rest_len = int(block_s * fs), int(rest_s * fs)
+        starts = np.arange(rest_len, n_samples - block_len, block_len + rest_len)
+        block_bounds = [(s, s + block_len) for s in starts]
+
+    main_sig = np.zeros(n_samples)
+    impacts = []
+    for i_start, i_end in block_bounds:
+        block_sig, block_impacts = generate_tap_block(
+            i_end - i_start, fs, tap_rate=tap_rate, amplitude=amplitude,
+            amp_decrement=amp_decrement, jitter=jitter, rng=rng,
+        )
+        main_sig[i_start:i_end] = block_sig
+        impacts.append(block_impacts + i_start)
+
+    # secondary axes record scaled parts of the movement
+    acc_arr = np.zeros((3, n_samples))
+    other_axes = [i for i in range(3) if i != main_axis]
+    acc_arr[main_axis] = main_sig
+    acc_arr[other_axes[0]] = .3 * main_sig
+    acc_arr[other_axes[1]] = -.15 * main_sig
+    acc_arr += noise_sd * rng.standard_normal(acc_arr.shape)
+
+    if n_outliers > 0:
+        i_outl = rng.choice(np.arange(fs, n_samples - fs), n_outliers,
+                            replace=False)
+        acc_arr[:, i_outl] += 50 * amplitude * rng.choice([-1, 1], (3, n_outliers))
+
+    if flip_polarity: acc_arr *= -1
+    acc_arr *= magnitude_order
+
+    info = {
+        'impacts': np.concatenate(impacts) if impacts else np.array([], int),
+        'block_starts': np.array([b[0] for b in block_bounds], dtype=int),
+        'block_ends': np.array([b[1] for b in block_bounds], dtype=int),
+        'fs': fs,
+        'main_axis': main_axis,
+    }
+
+    return acc_arr, info
@@ -10,12 +10,18 @@ import os
 from dataclasses import dataclass, field
 from typing import Any
 from itertools import product
-from pandas import read_csv
-from numpy import logical_and, isnan, loadtxt
+from concurrent.futures import ProcessPoolExecutor
+from numpy import loadtxt
 
 import tap_extract_fts.tapping_extract_features as ftExtr
 import tapping_run as tap_finder
 import retap_utils.utils_dataManagement as utils_dataMangm
+import retap_utils.utils_fileIndex as utils_fileIndex
+from tap_extract_fts.tapping_trace_cache import traceCache
+from retap_utils.utils_profiling import profile_stage
+from retap_utils.utils_precision import (
+    signal_precision, get_signal_dtype, get_signal_precision,
+)
 
 
 
@@ -46,27 +52,49 @@ class FeatureSet:
     skipped_no_meta: list = field(default_factory=list)
     incl_traces: list = field(default_factory=list)
     max_n_taps_incl: int = 0  # leads to inclusion of all detected taps
+    goal_Fs: int = 250
+    n_jobs: int = 1  # number of processes for extraction, -1 uses all cores
+    chunksize: int = 4  # traces submitted per process at once
+    cache_dir: Any = None  # if given, unchanged traces are loaded from cache
+    cache_max_size_mb: float = 2000
+    file_index_path: Any = None  # json to store file index, skips scans in next runs
+    precision: Any = None  # 'float32' or 'float64', None uses utils_precision policy
     verbose: bool = False
 
     def __post_init__(self,):
 
+        trace_tasks = []  # collect all traces, before extracting
+
+        # scan all data directories once
+        datapaths = {
+            cen: utils_dataMangm.find_onedrive_path(cen)
+            for cen in self.centers_incl
+        }
+        file_index = utils_fileIndex.fileIndex(
+            dirs=list(datapaths.values()),
+            index_file=self.file_index_path,
+            verbose=self.verbose,
+        )
+
         for cen in self.centers_incl:
 
             if self.verbose: print(f'start with {cen}')
             
-            datapath = utils_dataMangm.find_onedrive_path(cen)
+            datapath = datapaths[cen]
 
             if self.subs_incl == 'ALL':
-                subs = list(set(
-                    [f.split('_')[0] for f in
-                     os.listdir(datapath) if f[:3] == cen]
-                ))  # finds unique sub-names
+                # finds unique sub-names
+                subs = file_index.get_subs(datapath, center=cen)
             else:
                 subs = self.subs_incl
             
-            # import participant log data
+            # import participant log data, indexed per sub-state-side-rep
             if self.incl_meta_data:
-                log = utils_dataMangm.get_participantLog(cen)
+                log = utils_dataMangm.participantLogLookup(
+                    center=cen,
+                    cache_dir=(os.path.join(self.cache_dir, 'participantLog')
+                               if self.cache_dir else None),
+                )
                 meta = True
             else: meta = False
             
@@ -76,124 +104,104 @@ class FeatureSet:
                     f'{round((n_sub + 1) / len(subs) * 100)} % of {cen})'
                 )
 
-                if meta: sublog = log[[
-                    str(s).upper() == sub.upper() for s in log["subID"]
-                ]]
-
-                subfiles = list(set(
-                    [f for f in os.listdir(datapath)
-                     if f[:6].upper() == sub.upper()]
-                ))
+                subfiles = file_index.get_records(datapath, sub=sub)
 
                 for state, side in product(
                     self.states, self.sides
                 ):  # loop over all combis of states and sides
                     
-                    # get FILES for state
-                    combo_files = list(set(
-                        [f for f in subfiles if state in f]
-                    ))
-                    # select on side (DUS is renamed incl side)
-                    combo_files = list(set(
-                        [f for f in combo_files if f'_{side}_' in f]
-                    ))
-
-                    # get META for correct med and stim state
-                    if meta:
-                        combolog = sublog[logical_and(
-                            sublog['medStatus'] == int(state[1]),
-                            sublog['stimStatus'] == int(state[3])
-                        )].reset_index(drop=True)
-
-                    # get meta for correct side (DUS renamed)
-                    if meta:
-                        combolog = combolog[
-                            [side[0].lower() in s for s in combolog['side']]
-                        ].reset_index(drop=True)
+                    # get FILES for state and side (DUS is renamed incl side)
+                    combo_files = [
+                        r for r in subfiles
+                        if r['state'] == state and r['side'] == side
+                    ]
                     
                     # no files for given sub-state-side combo
                     if len(combo_files) == 0:
                         if self.verbose: print(f'no FILES found for {state, side}')
                         continue
-                    elif len(combolog) == 0:
+                    # no META for sub, med and stim state, and side
+                    elif meta and not log.has_scores(sub, state, side):
                         if self.verbose: print(f'no SCORES found for {state, side}')
                         continue
                         
                     # LOOP AND INCLUDE ALL REPETITIONS PER COMBI
-                    for n, f in enumerate(combo_files):
+                    for n, f_record in enumerate(combo_files):
+                        f = f_record['fname']
                         # find repetition of sub-state-side
-                        if f.split('_')[-2][:5] == 'block':
-                            rep = int(f.split('_')[-2][-1])
+                        if f_record['block'] is not None:
+                            rep = f_record['block']
                         else:
                             rep = n + 1
 
                         # extract updrs tap-score from log-excel
                         if meta:
-                            try:
-                                tap_score = int(combolog[
-                                    combolog['repetition'] == rep
-                                ]['updrsFt'])
-                            
-                            except ValueError:
-                                if isnan(
-                                    combolog[combolog['repetition'] == rep]['updrsFt']
-                                 ).item():
-                                    print(
-                                        '\tskip extraction - NaN-score '
-                                        f'{sub}_{state}_{side}_{rep}'
-                                    )
-                                    self.skipped_no_meta.append(
-                                        f'{sub}_{state}_{side}_{rep}'
-                                    )
-                                    continue
-
-                            except KeyError:
+                            tap_score, skip_reason = log.get_score(
+                                sub, state, side, rep
+                            )
+                            if skip_reason:
                                 print(
-                                        '\tskip extraction - missing-score '
-                                        f'{sub}_{state}_{side}_{rep}'
-                                    )
+                                    f'\tskip extraction - {skip_reason} '
+                                    f'{sub}_{state}_{side}_{rep}'
+                                )
                                 self.skipped_no_meta.append(
                                     f'{sub}_{state}_{side}_{rep}'
                                 )
                                 continue
                         
-                            except TypeError:
-                                if combolog.shape[0] == 0:
-                                    print(
-                                        '\tskip extraction - missing-score '
-                                        f'{sub}_{state}_{side}_{rep}'
-                                    )
-                                    self.skipped_no_meta.append(
-                                        f'{sub}_{state}_{side}_{rep}'
-                                    )
-                                    continue
-                                else:
-                                    print(f'REP is {rep}, {sub, state, side}')
-                                    print(combolog)
-                                    raise TypeError('typeError not because of empty combolog DF')
-                        
                         # if meta data is not wanted
                         else:
                             tap_score = None
                         
-                        ### Actual extraction of features per Acc-Trace
-                        setattr(
-                            self,
-                            f'{sub}_{state}_{side}_{rep}',
-                            singleTrace(
-                                sub=sub,
-                                state=state,
-                                side=side,
-                                rep=rep,
-                                center=cen,
-                                filepath=os.path.join(datapath, f),
-                                tap_score=tap_score,
-                                to_extract_feats=True,
-                                max_n_taps_incl=self.max_n_taps_incl,
-                            )
-                        )
-
-                        self.incl_traces.append(f'{sub}_{state}_{side}_{rep}')
+                        # store trace to extract, extraction is done
+                        # after all traces are collected
+                        trace_tasks.append({
+                            'trace_id': f'{sub}_{state}_{side}_{rep}',
+                            'trace_kwargs': {
+                                'sub': sub,
+                                'state': state,
+                                'side': side,
+                                'rep': rep,
+                                'center': cen,
+                                'filepath': os.path.join(datapath, f),
+                                'tap_score': tap_score,
+                                'goal_Fs': self.goal_Fs,
+                                'to_extract_feats': True,
+                                'max_n_taps_incl': self.max_n_taps_incl,
+                                'precision': self.precision,
+                            }
+                        })
+
+        # only extract new or changed traces if cache is given
+        if self.cache_dir:
+            trace_cache = traceCache(
+                cache_dir=self.cache_dir,
+                max_size_mb=self.cache_max_size_mb,
+                verbose=self.verbose,
+            )
+        else:
+            trace_cache = None
+
+        ### Actual extraction of features per Acc-Trace
+        extracted_traces = extract_trace_tasks(
+            trace_tasks=trace_tasks,
+            n_jobs=self.n_jobs,
+            chunksize=self.chunksize,
+            trace_cache=trace_cache,
+        )
+        if trace_cache: self.cache_report = trace_cache.report()
+        # results are returned in order of trace_tasks
+        for task, (trace, skip_reason) in zip(
+            trace_tasks, extracted_traces
+        ):
+            if skip_reason:
+                print(f'\tskip extraction - {skip_reason} '
+                      f'{task["trace_id"]}')
+                self.skipped_no_meta.append(task['trace_id'])
+                continue
+
+            setattr(self, task['trace_id'], trace)
+            self.incl_traces.append(task['trace_id'])
 
 
 @dataclass(repr=True, init=True,)
@@ -212,23 +220,28 @@ class singleTrace:
     goal_Fs: int = 250
     to_extract_feats: bool = True
     max_n_taps_incl: int = 0  # leads to inclusion of all detected taps
+    precision: Any = None  # 'float32' or 'float64', None uses utils_precision policy
 
     def __post_init__(self,):
-        # load and store tri-axial ACC-signal
-        if self.center == 'BER':
-            dat = read_csv(self.filepath, index_col=False)
-            # delete index col without heading if present
-            if 'Unnamed: 0' in dat.keys():
-                del(dat['Unnamed: 0'])
-                dat.to_csv(self.filepath, index=False)
+        # signal arrays are kept in the chosen precision
+        with signal_precision(self.precision):
+            self.load_and_extract()
 
-            dat = dat.values.T  # only np-array as acc-signal
-            preproc_bool=True
+    def load_and_extract(self,):
+        # load and store tri-axial ACC-signal
+        with profile_stage('load_trace_file'):
+            if self.center == 'BER':
+                # only np-array as acc-signal, index col is skipped
+                dat = utils_dataMangm.load_acc_csv(
+                    self.filepath, dtype=get_signal_dtype()
+                )
+                preproc_bool=True
 
-        elif self.center == 'DUS':  
-            # matlab-saved CSV-files
-            dat = loadtxt(self.filepath, delimiter='\t')
-            preproc_bool=False
+            elif self.center == 'DUS':  
+                # matlab-saved CSV-files
+                dat = loadtxt(self.filepath, delimiter='\t',
+                              dtype=get_signal_dtype())
+                preproc_bool=False
 
         # set data to attribute (3 rows, n-samples columns)
         setattr(self, 'acc_sig', dat)
@@ -271,6 +284,114 @@ class singleTrace:
             )
 
 
+def _extract_single_trace(trace_task):
+    """
+    Worker function, extracts one singleTrace.
+    Defined on module level to be picklable for
+    multiprocessing.
+
+    Input:
+        - trace_task: dict with trace_id and
+            trace_kwargs for singleTrace()
+    
+    Returns:
+        - trace: singleTrace, or None if skipped
+        - skip_reason: str, or None if extracted
+    """
+    trace_kwargs = trace_task['trace_kwargs']
+
+    if not os.path.exists(trace_kwargs['filepath']):
+        return None, 'missing-file'
+
+    trace = singleTrace(**trace_kwargs)
+
+    return trace, None
+
+
+def extract_trace_tasks(
+    trace_tasks: list, n_jobs: int = 1, chunksize: int = 4,
+    trace_cache=None,
+):
+    """
+    Extracts features for all given traces, sequential
+    or parallel over processes. All traces are
+    independent from each other.
+
+    Input:
+        - trace_tasks: list with dicts per trace (trace_id,
+            and trace_kwargs for singleTrace())
+        - n_jobs: number of processes, 1 runs sequential,
+            -1 uses all available cores
+        - chunksize: number of traces submitted per process
+            at once, reduces overhead for short traces
+        - trace_cache: optional traceCache, cached traces
+            are loaded, only missing traces are extracted
+    
+    Returns:
+        - results: list with (singleTrace, skip_reason) tuples,
+            in the same (deterministic) order as trace_tasks
+    """
+    results = [None] * len(trace_tasks)
+    cache_keys = {}
+
+    # load unchanged traces from cache
+    if trace_cache:
+        for i, task in enumerate(trace_tasks):
+            kwargs = task['trace_kwargs']
+            if not os.path.exists(kwargs['filepath']): continue
+
+            extract_params = {
+                k: kwargs[k] for k in [
+                    'center', 'goal_Fs', 'to_extract_feats',
+                    'max_n_taps_incl',
+                ]
+            }
+            # float64 keeps the keys of existing caches
+            precision = kwargs.get('precision') or get_signal_precision()
+            if precision != 'float64':
+                extract_params['precision'] = precision
+            cache_keys[i] = trace_cache.get_key(
+                filepath=kwargs['filepath'],
+                extract_params=extract_params,
+            )
+            trace = trace_cache.load(cache_keys[i], task['trace_id'])
+            if trace is None: continue
+            # meta data is not part of the key, update from current log
+            for attr in ['sub', 'state', 'side', 'rep', 'filepath']:
+                setattr(trace, attr, kwargs[attr])
+            trace.tap_score = kwargs['tap_score']
+            if hasattr(trace, 'fts') and kwargs['tap_score'] is not None:
+                trace.fts.updrsSubScore = float(kwargs['tap_score'])
+            results[i] = (trace, None)
+
+    to_extract = [i for i, r in enumerate(results) if r is None]
+
+    if n_jobs == -1: n_jobs = os.cpu_count()
+    n_jobs = max(1, min(n_jobs, len(to_extract)))
+
+    if n_jobs == 1:
+        extracted = [_extract_single_trace(trace_tasks[i]) for i in to_extract]
+
+    else:
+        print(f'extracting {len(to_extract)} traces on {n_jobs} processes')
+        # executor.map() returns results in order of submission
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            extracted = list(executor.map(
+                _extract_single_trace,
+                [trace_tasks[i] for i in to_extract],
+                chunksize=chunksize,
+            ))
+
+    for i, (trace, skip_reason) in zip(to_extract, extracted):
+        results[i] = (trace, skip_reason)
+        # store newly extracted traces
+        if trace_cache and i in cache_keys and not skip_reason:
+            trace_cache.store(cache_keys[i], trace)
+
+    return results
+
+
+
 # ### PUT IN SEPERATE PY FILE  
 # import datetime as dt
 # # import os
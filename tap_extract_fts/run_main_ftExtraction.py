@@ -17,17 +17,19 @@ if __name__ == '__main__':
     print('...running run_main_ftExtraction.py')
     max_n_taps_incl = 0  # 0 leads to inclusion of all taps 
 
+    deriv_path = os.path.join(
+        utils_dataMangm.get_local_proj_dir(),
+        'data',
+        'derivatives'
+    )
+
     data = FeatureSet(
         subs_incl = ['BER026', 'BER056'],
         centers_incl = ['BER', 'DUS'],   # 'DUS'
         verbose=False,
         max_n_taps_incl=max_n_taps_incl,
-    )
-
-    deriv_path = os.path.join(
-        utils_dataMangm.get_local_proj_dir(),
-        'data',
-        'derivatives'
+        n_jobs=-1,  # extract traces parallel on all cores
+        cache_dir=os.path.join(deriv_path, 'trace_cache'),  # only extract new/changed traces
     )
     dd = str(dt.date.today().day).zfill(2)
     mm = str(dt.date.today().month).zfill(2)
@@ -17,6 +17,8 @@ from dataclasses import dataclass, field
 import tap_extract_fts.tapping_featureset as tap_feats
 import tap_extract_fts.tapping_postFeatExtr_calc as postExtrCalc
 from tap_load_data.tapping_preprocess import find_main_axis, remove_acc_nans
+from retap_utils.utils_profiling import profiled
+from tap_load_data.tapping_tap_table import as_tap_table
 
 
 @dataclass(init=True, repr=True, )
@@ -29,10 +31,10 @@ class tapFeatures:
         - fs (int): sample freq in Hz
         - impacts (array): array containing indices of
             impact (closing finger) moments
-        - tap_lists: list of taps, every tap has an own array
-            with 7 timestamps (in n samples) representing the
-            moments during a tap (resulting from continuous
-            tapping detect function)
+        - tap_lists: tapTable (or list of taps, every tap has
+            an own array) with 7 timestamps (in n samples)
+            representing the moments during a tap (resulting
+            from continuous tapping detect function)
         - max_n_taps_incl: integer defining the number of taps
             consider during ft extraction, defaults to zero,
             and is not considered when being zero.
@@ -46,11 +48,14 @@ class tapFeatures:
     max_n_taps_incl: int = 0
     updrsSubScore: Any = False
     
+    @profiled('tapFeatures')
     def __post_init__(self,):
 
         if len(self.tap_lists) == 0:  # no taps detected
             return
 
+        self.tap_lists = as_tap_table(self.tap_lists)
+
         if np.isnan(self.triax_arr).any():
             setattr(self, 'triax_arr', remove_acc_nans(self.triax_arr))
 
@@ -160,64 +165,16 @@ class tapFeatures:
             'tap_entropy'
         ]
 
-        for ft in fts_to_postExtr_calc:
-            # get mean
-            setattr(
-                self,
-                f'mean_{ft}',
-                postExtrCalc.aggregate_arr_fts(
-                    ft_array=getattr(self, ft),
-                    method='mean',
-                )
-            )
-            # get coef of variation
-            setattr(
-                self,
-                f'coefVar_{ft}',
-                postExtrCalc.aggregate_arr_fts(
-                    ft_array=getattr(self, ft),
-                    method='coefVar',
-                )
-            )
-            # get interquartile range
-            setattr(
-                self,
-                f'IQR_{ft}',
-                postExtrCalc.aggregate_arr_fts(
-                    ft_array=getattr(self, ft),
-                    method='IQR',
-                )
-            )
-            # get decrement over start-mean and end-mean
-            setattr(
-                self,
-                f'decr_{ft}',
-                postExtrCalc.ft_decrement(
-                    ft_array=getattr(self, ft),
-                    method='diff_in_mean',
-                    n_taps_mean=3,
-                )
-            )
-            # get slope (absolute slope for entropy and intraTap)
-            if ft == 'tap_entropy' or ft == 'intraTapInt':
-                # give absolute slope values for entropy
-                setattr(
-                    self,
-                    f'slope_{ft}',
-                    abs(postExtrCalc.ft_decrement(
-                        ft_array=getattr(self, ft),
-                        method='regr_slope',
-                    ))
-                )
-            else:
-                setattr(
-                    self,
-                    f'slope_{ft}',
-                    postExtrCalc.ft_decrement(
-                        ft_array=getattr(self, ft),
-                        method='regr_slope',
-                    )
-                )
+        # mean, coefVar, IQR, decrement, and slope in one batched call
+        summary = postExtrCalc.summarize_ft_arrays(
+            {ft: getattr(self, ft) for ft in fts_to_postExtr_calc},
+            n_taps_mean=3,
+        )
+        # give absolute slope values for entropy and intraTap
+        for ft in ['tap_entropy', 'intraTapInt']:
+            summary[f'slope_{ft}'] = abs(summary[f'slope_{ft}'])
+
+        for ft_name, value in summary.items(): setattr(self, ft_name, value)
 
         # clear up space
         self.triax_arr = 'cleaned up'
@@ -6,6 +6,8 @@ import numpy as np
 from scipy.ndimage import uniform_filter1d
 
 # Import own functions
+from retap_utils.utils_profiling import profiled
+from tap_load_data.tapping_tap_table import as_tap_table
 # from tap_load_data import tapping_preprocess
 
 def nan_ft_array_base(
@@ -52,6 +54,7 @@ def signalvectormagn(acc_arr):
     return svm
 
 
+@profiled()
 def intraTapInterval(
     tap_indices: list,
     fs: int,
@@ -61,8 +64,8 @@ def intraTapInterval(
     Calculates intratap interval.
 
     Input:
-        - tap_indices: list with arrays of tap-moment
-            indices, representing respectively:
+        - tap_indices: tapTable or list with arrays of
+            tap-moment indices, representing respectively:
             [startUP, fastestUp, stopUP, startDown,
             fastestDown, impact, stopDown]
             (result of updrsTapDetector())
@@ -82,13 +85,10 @@ def intraTapInterval(
     elif moment.lower() == 'impact': idx = -2
     elif moment.lower() == 'end': idx = -1
     
-    iti = nan_ft_array_base(tap_indices, length_minus_one=True)
+    tap_indices = as_tap_table(tap_indices)
 
-    for n in np.arange(len(tap_indices) - 1):
-        # take distance between two impact-indices
-        distance = tap_indices[n + 1][idx] - tap_indices[n][idx]
-    
-        iti[n] = distance / fs  # from samples to seconds
+    # take distance between two impact-indices, from samples to seconds
+    iti = np.diff(tap_indices.float_col(idx)) / fs
     
     return iti
 
@@ -105,6 +105,7 @@ def calc_RMS(acc_signal):
     return RMS
 
 
+@profiled()
 def RMS_extraction(
     tap_indices: list,
     triax_arr,
@@ -163,24 +164,18 @@ def RMS_extraction(
         return RMS
     
     else:
+        tap_indices = as_tap_table(tap_indices)
         RMS = nan_ft_array_base(tap_indices)
 
-        for n, tap in enumerate(tap_indices):
-
-            tap = tap.astype(int)  # np.nan as int is -999999...
-
-            if unit_to_assess == 'taps':
-                sel1 = int(tap[0])
-                sel2 = int(tap[-1])
-                if np.isnan(sel2): sel2 = int(tap[-2])
+        if unit_to_assess == 'taps':
+            sel1s, sel2s = tap_indices.col(0), tap_indices.col(-1)
 
-            elif unit_to_assess == 'impacts':
-                sel1 = int(tap[-2] - int(fs * impact_window / 2))
-                sel2 = int(tap[-2] + int(fs * impact_window / 2))
+        elif unit_to_assess == 'impacts':
+            half_win = int(fs * impact_window / 2)
+            sel1s = tap_indices.col(-2) - half_win
+            sel2s = tap_indices.col(-2) + half_win
 
-            if np.logical_or(sel1 == np.nan, sel2 == np.nan):
-                print('tap skipped, missing indices')
-                continue
+        for n, (sel1, sel2) in enumerate(zip(sel1s.tolist(), sel2s.tolist())):
             
             tap_sig = sig[sel1:sel2]
             
@@ -191,6 +186,7 @@ def RMS_extraction(
         return RMS
 
 
+@profiled()
 def velocity_raising(tap_indices, triax_arr, ax):
     """
     Calculates velocity approximation via
@@ -222,32 +218,35 @@ def velo_calc_auc(tap_indices, accSig,):
     in one tap until the acceleration drops below 0
 
     Input:
-        - tap_indices: dict with lists resulting
+        - tap_indices: tapTable or lists resulting
             [startUP, fastestUp, stopUP, startDown,
             fastestDown, impact, stopDown]
             (result of updrsTapDetector())
         - accSig (array): uniax acc-array (one ax or svm)
     
     Returns:
-        - out (array): one value or nan per tap in tap_indices
+        - out (array): one value per tap with known
+            fastestUp in tap_indices
     """
+    tap_indices = as_tap_table(tap_indices)
     out = []
 
-    for n, tap in enumerate(tap_indices):
-
-        if ~np.isnan(tap[1]):  # crossing 0 has to be known
-            # take acc-signal [start : fastest point] of rise
-            line = accSig[int(tap[0]):int(tap[1])]
-            areas = []
-            for s, y in enumerate(line[1:]):
-                areas.append(np.mean([y, line[s]]))
-            if sum(areas) == 0:
-                print('\nSUM 0',n, line[:30], tap[0], tap[1])
-            out.append(sum(areas))
+    # crossing 0 (fastestUp) has to be known
+    for n in np.where(tap_indices.valid[:, 1])[0]:
+        i_start, i_fast = tap_indices.idx[n, :2].tolist()
+        # take acc-signal [start : fastest point] of rise
+        line = accSig[i_start:i_fast]
+        # mean of consecutive samples, summed in order of samples
+        areas = (line[1:] + line[:-1]) / 2
+        auc = np.cumsum(areas)[-1] if len(areas) > 0 else 0
+        if auc == 0:
+            print('\nSUM 0',n, line[:30], i_start, i_fast)
+        out.append(auc)
     
     return np.array(out)
 
 
+@profiled()
 def jerkiness(
     accsig,
     fs: int,
@@ -293,9 +292,8 @@ def jerkiness(
         for ax in np.arange(accsig.shape[0]):
 
             axdiff = np.diff(accsig[ax])
-            for i in np.arange(axdiff.shape[0] - n_hop):
-                if (axdiff[i + n_hop] * axdiff[i]) < 0:  # removed if -1 < axdiff...
-                    trace_count += 1
+            # count consecutive diff-values with opposite signs
+            trace_count += count_sign_changes(axdiff, n_hop)
         # normalise for duration of trace
         duration_trace = accsig.shape[1] / fs
         trace_count = trace_count / duration_trace
@@ -309,57 +307,52 @@ def jerkiness(
             accsig = uniform_filter1d(accsig, smooth_samples) 
 
         trace_count = []
+        tap_indices = as_tap_table(tap_indices)
+        # taps with start and end
+        sel = tap_indices.valid[:, 0] & tap_indices.valid[:, -1]
 
-        for tap in tap_indices:
+        for i_start, i_end in tap_indices.idx[sel][:, [0, -1]].tolist():
 
-            if np.logical_or(
-                np.isnan(tap[0]),
-                np.isnan(tap[-1])
-            ):
-                continue
+            tap_acc = accsig[:, i_start:i_end]
+            tap_duration = (i_end - i_start) / fs  # in seconds
+            count = 0
 
-            elif len(tap) == 0:
-                continue
+            for ax in np.arange(accsig.shape[0]):
+                axdiff = np.diff(tap_acc[ax])
+                # count if consecutive diff-values are pos and neg
+                count += count_sign_changes(axdiff, n_hop)
             
-            else:
-                tap_acc = accsig[:, int(tap[0]):int(tap[-1])]
-                tap_duration = (tap[-1] - tap[0]) / fs  # in seconds
-                count = 0
-
-                for ax in np.arange(accsig.shape[0]):
-                    axdiff = np.diff(tap_acc[ax])
-
-                    for i in np.arange(axdiff.shape[0] - n_hop):
-                        # count if consecutive diff-values are pos and neg
-                        if (axdiff[i + n_hop] * axdiff[i]) < 0:  # removed if -1 < axdiff...
-                            count += 1
-                
-                count = count / tap_duration  # normalise to n jerks per sec
-                trace_count.append(count)
+            count = count / tap_duration  # normalise to n jerks per sec
+            trace_count.append(count)
 
     return np.array(trace_count)  # return as array for later calculations
 
 
+def count_sign_changes(axdiff, n_hop: int = 1):
+    """
+    Counts pairs of diff-values (n_hop apart) with
+    opposite signs, equal to the former sample-wise loop
+    """
+    if axdiff.shape[0] <= n_hop: return 0
+
+    return int(np.count_nonzero(axdiff[n_hop:] * axdiff[:-n_hop] < 0))
+
+
+@profiled()
 def entropy_per_tap(
     accsig, tap_indices: list,
 ):
     entr_list = []
     svm = signalvectormagn(accsig)
-    for tap in tap_indices:
+    tap_indices = as_tap_table(tap_indices)
+    # taps with start and end
+    sel = tap_indices.valid[:, 0] & tap_indices.valid[:, -1]
 
-        if np.logical_or(
-            np.isnan(tap[0]),
-            np.isnan(tap[-1])
-        ):
-            continue
+    for i_start, i_end in tap_indices.idx[sel][:, [0, -1]].tolist():
 
-        elif len(tap) == 0:
-            continue
-        
-        else:
-            tap_svm = svm[int(tap[0]):int(tap[-1])]
-            ent = calc_entropy(tap_svm)
-            entr_list.append(ent)
+        tap_svm = svm[i_start:i_end]
+        ent = calc_entropy(tap_svm)
+        entr_list.append(ent)
 
     return np.array(entr_list)
 
@@ -6,8 +6,11 @@ Feature calculations functions
 import numpy as np
 from scipy.stats import linregress, variation
 
+from retap_utils.utils_profiling import profiled
 
 
+
+@profiled()
 def ft_decrement(
     ft_array: list,
     method: str,
@@ -76,6 +79,7 @@ def ft_decrement(
 
 
 
+@profiled()
 def aggregate_arr_fts(
     method, ft_array
 ):
@@ -150,6 +154,94 @@ def aggregate_arr_fts(
         return IQR
 
 
+@profiled()
+def summarize_ft_arrays(
+    ft_arrays: dict,
+    n_taps_mean: int = 3,
+    min_n_decr: int = 8,
+):
+    """
+    Aggregates several per-tap feature arrays in one
+    batched pass. Arrays are stacked (padded with nan)
+    and mean, coefVar, IQR, decrement (diff_in_mean) and
+    regression slope are calculated for all arrays at
+    once. Results equal aggregate_arr_fts() and
+    ft_decrement(), the slope is the closed-form OLS
+    slope (equal to np.polyfit within float precision).
+
+    Input:
+        - ft_arrays: dict with feature names as keys and
+            feature values (one per tap, nan allowed) as
+            values, other types than arrays give nan
+            aggregates (and zero decrement and slope)
+        - n_taps_mean: number of taps averaged at start
+            and end for decrement
+        - min_n_decr: minimal array length for decrement
+            and slope, zeroes below (as ft_decrement())
+    
+    Returns:
+        - summary: dict with keys as tapFeatures attributes,
+            e.g. mean_tapRMS, coefVar_tapRMS, IQR_tapRMS,
+            decr_tapRMS, slope_tapRMS
+    """
+    fts = list(ft_arrays.keys())
+    values, lengths, _ = ragged_to_padded(
+        [a if isinstance(a, np.ndarray) else [] for a in ft_arrays.values()],
+        return_offsets=True,
+    )
+    if values.shape[1] == 0: values = np.full((len(fts), 1), np.nan)
+
+    valid = ~np.isnan(values)
+    n_valid = valid.sum(axis=1)
+    zeros = np.where(valid, values, 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # mean and coefVar (std with ddof=0, as np.nanstd)
+        means = zeros.sum(axis=1) / n_valid
+        sq_dev = np.where(valid, (values - means[:, None]) ** 2, 0)
+        stds = np.sqrt(sq_dev.sum(axis=1) / n_valid)
+        coefVars = stds / means
+
+        # IQR, linear interpolation as np.percentile, nans sorted last
+        sorted_vals = np.sort(values, axis=1)
+        rows = np.arange(len(fts))
+        quartiles = []
+        for q in [.25, .75]:
+            pos = np.maximum(n_valid - 1, 0) * q
+            lo = np.floor(pos).astype(int)
+            hi = np.ceil(pos).astype(int)
+            v_lo, v_hi = sorted_vals[rows, lo], sorted_vals[rows, hi]
+            quartiles.append(v_lo + (v_hi - v_lo) * (pos - lo))
+        IQRs = np.where(n_valid >= 4, quartiles[1] - quartiles[0], np.nan)
+
+        # decrement between mean of first and last taps
+        idx = np.arange(values.shape[1])
+        start_sel = valid & (idx < n_taps_mean)
+        end_sel = valid & (idx >= (lengths - n_taps_mean)[:, None])
+        start_means = np.where(start_sel, values, 0).sum(axis=1) / start_sel.sum(axis=1)
+        end_means = np.where(end_sel, values, 0).sum(axis=1) / end_sel.sum(axis=1)
+        decrs = (end_means - start_means) / start_means
+        decrs = np.where(
+            (lengths < min_n_decr) | np.isnan(start_means), 0, decrs
+        )
+
+        # OLS slope against number of (non-nan) tap
+        x = np.cumsum(valid, axis=1) - 1.
+        x_dev = np.where(valid, x - ((n_valid - 1) / 2)[:, None], 0)
+        y_dev = np.where(valid, values - means[:, None], 0)
+        slopes = (x_dev * y_dev).sum(axis=1) / (x_dev ** 2).sum(axis=1)
+        slopes = np.where((lengths < min_n_decr) | (n_valid < 2), 0, slopes)
+
+    summary = {}
+    for stat, arr in zip(
+        ['mean', 'coefVar', 'IQR', 'decr', 'slope'],
+        [means, coefVars, IQRs, decrs, slopes],
+    ):
+        for i, ft in enumerate(fts): summary[f'{stat}_{ft}'] = arr[i]
+
+    return summary
+
+
 def normalize_var_fts(values):
 
     ft_max = np.nanmax(values)
@@ -182,39 +274,89 @@ def z_score_array(
 
 def nan_array(dim: list):
     """Create 2 or 3d np array with nan's"""
-    if len(dim) == 2:
-        arr = np.array(
-            [[np.nan] * dim[1]] * dim[0]
+    assert len(dim) in [2, 3], 'dim should have 2 or 3 dimensions'
+
+    return np.full(dim, np.nan)
+
+
+def ragged_to_padded(
+    arrays, fill_value=np.nan, return_offsets: bool = False,
+):
+    """
+    Stacks arrays (or lists) of different lengths into
+    one padded 2d-array (n_arrays x max_length), all
+    values are concatenated once and placed via their
+    offsets, no python loop over arrays.
+
+    Input:
+        - arrays: list with 1d-arrays or lists
+        - fill_value: value for padded positions
+        - return_offsets: also return lengths and start
+            offsets of every array in the concatenated values
+    
+    Returns:
+        - padded: float array (n_arrays x max_length)
+        - lengths, offsets (if return_offsets)
+    """
+    arrays = [np.asarray(a, dtype=float).ravel() for a in arrays]
+    lengths = np.array([len(a) for a in arrays], dtype=int)
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(int)
+
+    padded = np.full((len(arrays), lengths.max(initial=0)), fill_value,
+                     dtype=float)
+    if lengths.sum() > 0:
+        rows = np.repeat(np.arange(len(arrays)), lengths)
+        cols = np.arange(lengths.sum()) - np.repeat(offsets, lengths)
+        padded[rows, cols] = np.concatenate(arrays)
+
+    if return_offsets: return padded, lengths, offsets
+
+    return padded
+
+
+def nan_mean_sem(values, axis: int = 0):
+    """
+    Mean and standard error of the mean ignoring
+    nan's, std-dev with ddof=0 (as np.nanstd), sem
+    is zero for positions with only one value, and
+    nan for positions without values.
+    
+    Returns:
+        - mean, sem, n_obs (arrays)
+    """
+    valid = ~np.isnan(values)
+    n_obs = valid.sum(axis=axis)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(valid, values, 0).sum(axis=axis) / n_obs
+        sq_dev = np.where(
+            valid, (values - np.expand_dims(mean, axis)) ** 2, 0
         )
-    else:
-        arr = np.array(
-            [[[np.nan] * dim[2]] * dim[1]] * dim[0]
-        ) 
+        sd = np.sqrt(sq_dev.sum(axis=axis) / n_obs)
+        sem = sd / np.sqrt(n_obs)  # std-err = std-dev / sqrt(data-size)
 
-    return arr
+    return mean, sem, n_obs
 
 
 def get_means_std_errs(score_lists):
     """
     used to plot feature course over time (figure 3)
+
+    Input:
+        - score_lists: dict with per score a list of
+            feature arrays (one value per tap) per trace
+    
+    Returns:
+        - mean_dict, err_dict: mean and std-error per
+            tap position (1st, 2nd, 3rd, etc) per score
     """
     mean_dict, err_dict = {}, {}
 
     for score in score_lists.keys():
-        # get maximum array length for score and create empty nan array
-        max_len = max([len(l) for l in score_lists[score]])
-        values = np.array([[np.nan] * max_len] * len(score_lists[score]))
-        # fill array with value scores per trace (list)
-        for i, l in enumerate(score_lists[score]):
-            values[i, :len(l)] = l
-        # calculate mean value per observations (1st, 2nd, 3rd, etc)
-        mean = np.nanmean(values, axis=0)
-        mean_dict[score] = mean
-        # calculate std-error (defaults to zero if no std dev/err (only 1 value))
-        sd = np.nanstd(values, axis=0)
-        n_obs = np.array([sum(~np.isnan(values[:, i])) for i in range(values.shape[1])])
-        errs = sd / np.sqrt(n_obs)  # std-err = std-dev / sqrt(data-size)
-        err_dict[score] = errs
+        # nan-padded array with value scores per trace
+        values = ragged_to_padded(score_lists[score])
+        # mean and std-err per observations (1st, 2nd, 3rd, etc)
+        mean_dict[score], err_dict[score], _ = nan_mean_sem(values, axis=0)
     
     return mean_dict, err_dict
 
@@ -0,0 +1,169 @@
+"""
+Cache for extracted single traces, used to
+rebuild FeatureSets incrementally.
+
+Every extracted singleTrace is stored as pickle,
+under a key based on the content of the acc-file
+and the extraction parameters. Only new or changed
+traces have to be extracted again.
+
+part of (updrsTapping-repo)
+ReTap-Toolbox
+"""
+
+# import public packages and functions
+import os
+import hashlib
+import json
+import pickle
+from dataclasses import dataclass, field
+
+from tapping_run import DETECTOR_VERSION
+
+
+def get_file_hash(filepath: str, blocksize: int = 2 ** 20):
+    """
+    Returns sha1-hash of the file content, file
+    is read in blocks to limit memory usage
+    """
+    file_hash = hashlib.sha1()
+
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            file_hash.update(block)
+
+    return file_hash.hexdigest()
+
+
+@dataclass(init=True, repr=True,)
+class traceCache:
+    """
+    Stores extracted traces per key in cache_dir,
+    one pickle per trace.
+
+    Input:
+        - cache_dir: directory to store cached traces
+        - max_size_mb: maximum total size of the cache,
+            least recently used traces are removed if
+            the cache exceeds this size
+        - verbose: print hits and misses per trace
+
+    Keeps track of the hits, misses, and evicted traces
+    during the current run, see report()
+    """
+    cache_dir: str
+    max_size_mb: float = 2000
+    verbose: bool = False
+    hits: list = field(default_factory=list)
+    misses: list = field(default_factory=list)
+    evicted: list = field(default_factory=list)
+
+    def __post_init__(self,):
+
+        if not os.path.exists(self.cache_dir): os.makedirs(self.cache_dir)
+
+        # current size of cache, updated while storing and evicting
+        self.size_bytes = sum([
+            os.path.getsize(os.path.join(self.cache_dir, f))
+            for f in os.listdir(self.cache_dir) if f.endswith('.P')
+        ])
+        # max_size_mb can be smaller than in previous runs
+        if self.size_bytes > self.max_size_mb * 1e6: self.evict()
+
+    def get_key(self, filepath: str, extract_params: dict):
+        """
+        Creates key from file-content and extraction
+        parameters (e.g. center, goal_Fs, max_n_taps_incl).
+        The detector version is always included.
+        """
+        params = dict(extract_params)
+        params['detector_version'] = DETECTOR_VERSION
+        # the sample freq is taken from the filename
+        params['fs_code'] = os.path.basename(filepath).split('_')[-1]
+        params_str = json.dumps(params, sort_keys=True, default=str)
+
+        key = hashlib.sha1(
+            (get_file_hash(filepath) + params_str).encode()
+        ).hexdigest()
+
+        return key
+
+    def load(self, key: str, trace_id: str = ''):
+        """
+        Returns cached trace, or None if key is
+        not present in cache
+        """
+        pickle_path = os.path.join(self.cache_dir, f'{key}.P')
+
+        if not os.path.exists(pickle_path):
+            self.misses.append(trace_id)
+            if self.verbose: print(f'\tcache miss: {trace_id}')
+            return None
+
+        try:
+            with open(pickle_path, 'rb') as f:
+                trace = pickle.load(f)
+        except (pickle.UnpicklingError, EOFError, AttributeError):
+            # corrupt or outdated pickle, extract again
+            self.misses.append(trace_id)
+            return None
+
+        os.utime(pickle_path)  # update time for least-recently-used order
+        self.hits.append(trace_id)
+        if self.verbose: print(f'\tcache hit: {trace_id}')
+
+        return trace
+
+    def store(self, key: str, trace):
+
+        pickle_path = os.path.join(self.cache_dir, f'{key}.P')
+        # write to temporary file first, prevents corrupt pickles
+        temp_path = pickle_path + '.tmp'
+
+        with open(temp_path, 'wb') as f:
+            pickle.dump(trace, f)
+        os.replace(temp_path, pickle_path)
+
+        self.size_bytes += os.path.getsize(pickle_path)
+
+        if self.size_bytes > self.max_size_mb * 1e6: self.evict()
+
+    def evict(self,):
+        """
+        Removes least recently used traces until the
+        cache is smaller than max_size_mb
+        """
+        cached = [
+            os.path.join(self.cache_dir, f)
+            for f in os.listdir(self.cache_dir) if f.endswith('.P')
+        ]
+        cached = sorted(cached, key=os.path.getmtime)  # oldest first
+
+        for pickle_path in cached:
+            if self.size_bytes <= self.max_size_mb * 1e6: break
+
+            self.size_bytes -= os.path.getsize(pickle_path)
+            os.remove(pickle_path)
+            self.evicted.append(os.path.basename(pickle_path)[:-2])
+
+    def report(self,):
+        """
+        Returns and prints the hits, misses and
+        evictions of the current run
+        """
+        n_total = len(self.hits) + len(self.misses)
+        report = {
+            'n_hits': len(self.hits),
+            'n_misses': len(self.misses),
+            'n_evicted': len(self.evicted),
+            'hit_rate': len(self.hits) / n_total if n_total > 0 else 0,
+            'size_mb': round(self.size_bytes / 1e6, 2),
+            'missed_traces': list(self.misses),
+        }
+        print(
+            f'trace cache: {report["n_hits"]} hits, {report["n_misses"]}'
+            f' misses, {report["n_evicted"]} evicted '
+            f'({report["size_mb"]} MB in {self.cache_dir})'
+        )
+
+        return report
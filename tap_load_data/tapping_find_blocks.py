@@ -9,17 +9,21 @@ import matplotlib.pyplot as plt
 from os.path import join, exists
 from os import makedirs
 from pandas import DataFrame
+from joblib import Parallel, delayed
 
 # Import own functions
 from tap_extract_fts.tapping_featureset import signalvectormagn
 from tap_load_data.tapping_preprocess import find_main_axis
+from retap_utils.utils_profiling import profiled
 
+@profiled()
 def find_active_blocks(
     acc_arr, fs, buff=5, buff_thr=.3, blocks_p_sec=8,
     act_wins_for_block=2, to_plot=True, verbose=True,
     to_store_csv=False, csv_dir: str='', csv_fname: str='',
     figsave_dir: str='', figsave_name: str='',
     plot_orig_fname: str = '',
+    chunk_s: float = None, n_jobs: int = 1,
 ):
     """
     Detects tapping blocks in triaxial acc array.
@@ -41,6 +45,11 @@ def find_active_blocks(
         - blocks_p_sec (int): divide one second by n blocks
         - act_wins_for_block: number of windows that have to
             be active to set a block as active
+        - chunk_s: if given, window activity is computed in
+            overlapping segments of chunk_s seconds (for
+            multi-hour recordings), results are equal to the
+            single-pass run
+        - n_jobs: number of segments processed in parallel
     
     Returns:
         - acc_blocks (list): list containing one
@@ -58,14 +67,17 @@ def find_active_blocks(
 
     winl = int(fs / blocks_p_sec)
 
-    # activity per window (acc > std.dev)
-    act = np.array([sum(sig[i_start:i_start + winl] > thresh) / winl for
-        i_start in np.arange(0, sig.shape[0], winl)])
-    
-    # blocks of windows with sufficient activity
-    blocks = [sum(
-        act[i_start - buff:i_start + buff] > buff_thr
-    ) > act_wins_for_block for i_start in np.arange(buff, len(act) - buff)]
+    # blocks of windows with sufficient activity (acc > std.dev)
+    block_kwargs = {'thresh': thresh, 'winl': winl, 'buff': buff,
+                    'buff_thr': buff_thr,
+                    'act_wins_for_block': act_wins_for_block}
+    if chunk_s is None:
+        blocks = find_window_blocks(sig, **block_kwargs)
+    else:
+        blocks = find_window_blocks_chunked(
+            sig, chunk_wins=int(chunk_s * fs / winl), n_jobs=n_jobs,
+            **block_kwargs,
+        )
     
     # finding start and end indices of blocks
     block_indices = {'start': [], 'end': []}
@@ -119,6 +131,68 @@ def find_active_blocks(
     return acc_blocks, block_indices
 
 
+def find_window_blocks(
+    sig, thresh, winl, buff, buff_thr, act_wins_for_block,
+):
+    """
+    Determines activity per window (part of samples
+    above thresh), and whether the surrounding 2 * buff
+    windows contain enough active windows.
+
+    Returns:
+        - blocks: bool-array, one value per window position
+            from window buff until n_windows - buff
+    """
+    n_wins = int(np.ceil(sig.shape[0] / winl))
+    above = np.zeros(n_wins * winl, dtype=bool)
+    above[:sig.shape[0]] = sig > thresh
+
+    # activity per window (last window can be incomplete)
+    act = above.reshape(n_wins, winl).sum(axis=1) / winl
+
+    # number of active windows within every 2 * buff windows
+    cum_active = np.concatenate([[0], np.cumsum(act > buff_thr)])
+    n_blocks = max(n_wins - 2 * buff, 0)
+    win_sums = cum_active[2 * buff:2 * buff + n_blocks] - cum_active[:n_blocks]
+
+    return win_sums > act_wins_for_block
+
+
+def find_window_blocks_chunked(
+    sig, thresh, winl, buff, buff_thr, act_wins_for_block,
+    chunk_wins: int, n_jobs: int = 1,
+):
+    """
+    Runs find_window_blocks() on segments of chunk_wins
+    window positions, every segment overlaps 2 * buff
+    windows with the next one. Segments start at window
+    borders, and the threshold is based on the full
+    recording, therefore the stitched blocks are equal
+    to the single-pass result.
+    """
+    assert chunk_wins > 0, 'chunk_s should be at least one window'
+
+    n_wins = int(np.ceil(sig.shape[0] / winl))
+    n_blocks = max(n_wins - 2 * buff, 0)
+    segments = [
+        sig[b0 * winl:(min(b0 + chunk_wins, n_blocks) + 2 * buff) * winl]
+        for b0 in np.arange(0, n_blocks, chunk_wins)
+    ]
+    kwargs = {'thresh': thresh, 'winl': winl, 'buff': buff,
+              'buff_thr': buff_thr, 'act_wins_for_block': act_wins_for_block}
+
+    if n_jobs == 1:
+        results = [find_window_blocks(seg, **kwargs) for seg in segments]
+    else:
+        results = Parallel(n_jobs=n_jobs)(
+            delayed(find_window_blocks)(seg, **kwargs) for seg in segments
+        )
+
+    if len(results) == 0: return np.zeros(0, dtype=bool)
+
+    return np.concatenate(results)
+
+
 def merge_close_blocks(
     block_indices, min_distance, verbose
 ):
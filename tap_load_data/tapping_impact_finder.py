@@ -5,7 +5,10 @@ Finding impact-moments in ACC-traces
 import numpy as np
 from scipy.signal import find_peaks, peak_widths
 
-def find_impacts(uni_arr, fs):
+from retap_utils.utils_profiling import profiled
+
+@profiled()
+def find_impacts(uni_arr, fs, arr_max=None, diff_max=None):
     """
     Function to detect the impact moments in
     (updrs) finger (or hand) tapping tasks.
@@ -25,15 +28,20 @@ def find_impacts(uni_arr, fs):
             which recorded most variation /
             has the largest amplitude range.
         - fs (int): sample freq in Hz
+        - arr_max, diff_max: maximum of signal and of its
+            diff to base thresholds on, default maximum of
+            uni_arr (e.g. running maxima in streaming)
     
     Returns:
         - impacts1: impact-positions of method v1
         - impacts2: impact-positions of method v2
         (USE METHOD v2 FOR NOW)
     """
-    thresh = np.nanmax(uni_arr) * .2
+    if arr_max is None: arr_max = np.nanmax(uni_arr)
+    thresh = arr_max * .2
     arr_diff = np.diff(uni_arr)
-    df_thresh = np.nanmax(arr_diff) * .2  # was .35 (14.12)
+    if diff_max is None: diff_max = np.nanmax(arr_diff)
+    df_thresh = diff_max * .2  # was .35 (14.12)
     
     # ### METHOD v1
     # impacts1 = find_peaks(
@@ -49,7 +57,7 @@ def find_impacts(uni_arr, fs):
     # METHOD v2
     pos_peaks = find_peaks(
         uni_arr,
-        height=(thresh, np.nanmax(uni_arr)),
+        height=(thresh, arr_max),
         distance=fs / 6,  # was not defined (14.12)
     )[0]
 
@@ -0,0 +1,364 @@
+"""
+Streaming tap detection and feature updates
+
+StreamingTapAnalyzer takes fixed-size chunks of a
+(preprocessed) tri-axial acc-recording, continues the
+sample-wise tap detection of updrsTapDetector() over
+chunk boundaries, emits taps as soon as they are
+completed, and keeps running aggregates (mean, coefVar,
+slope) of the per-tap features.
+
+Differences with the offline detection on a full trace:
+thresholds are based on the running mean and running
+maxima of the samples received so far, and peaks on a
+buffer of recent samples (buffer_s), instead of the full
+trace. Detection starts after warmup_s seconds, and the
+last lag_s seconds are processed after the next chunk
+has arrived, or by finish() at the end of the recording.
+
+Streamed taps therefore can differ from updrsTapDetector()
+on the full trace:
+    - tap moments other than impacts can differ by some
+      samples (peaks found on the buffer), measured on the
+      synthetic corpus (tap_benchmarks.golden_outputs):
+      equal number of taps, and equal total_nTaps and freq
+      as tapFeatures (these include the impact of the
+      dropped first tap), 0 - 3 rows with differing moments
+      per 10-s trace (chunk sizes 1, 25, and 250 samples)
+    - before the first tapping, the running maxima only
+      contain rest-signal, and noise is detected as taps
+      (synthetic 2-min recording starting with rest: 43 - 46
+      extra taps before the first tap, depending on chunk
+      size, all 145 offline taps equal). Rest between tapping blocks does not give
+      taps. Start streaming at the first tapping, or filter
+      taps with find_active_blocks() afterwards
+"""
+
+# Import public packages and functions
+import numpy as np
+from scipy.signal import find_peaks
+
+# Import own functions
+from tap_load_data.tapping_impact_finder import find_impacts
+from tap_load_data.tapping_time_detect import (
+    tapDetectorState, detect_tap_states
+)
+from tap_load_data.tapping_tap_table import tapTable
+import tap_extract_fts.tapping_featureset as tap_feats
+
+
+STREAM_FEATS = [
+    'intraTapInt', 'tapRMS', 'tapRMSnrm', 'impactRMS',
+    'raise_velocity', 'jerkiness_taps', 'tap_entropy',
+]
+# slopes given as absolute values (as in tapFeatures)
+ABS_SLOPE_FEATS = ['intraTapInt', 'tap_entropy']
+
+
+class runningAggregate:
+    """
+    Running mean, std-dev (Welford) and slope of the
+    ordinary least squares regression against value
+    number, updated in O(1) per value. NaN values are
+    skipped, equal to the nan-handling in
+    aggregate_arr_fts() and ft_decrement().
+    """
+    __slots__ = ('n', 'mean', 'm2', 'mean_x', 'm2_x', 'c_xy')
+
+    def __init__(self,):
+
+        self.n = 0
+        self.mean, self.m2 = 0., 0.
+        self.mean_x, self.m2_x, self.c_xy = 0., 0., 0.
+
+    def update(self, value):
+
+        if np.isnan(value): return
+
+        x = self.n  # value number (without nans)
+        self.n += 1
+        dx = x - self.mean_x
+        dy = value - self.mean
+        self.mean_x += dx / self.n
+        self.mean += dy / self.n
+        self.m2 += dy * (value - self.mean)
+        self.m2_x += dx * (x - self.mean_x)
+        self.c_xy += dx * (value - self.mean)
+
+    @property
+    def std(self,):
+
+        if self.n == 0: return np.nan
+
+        return np.sqrt(self.m2 / self.n)  # ddof=0 as np.nanstd
+
+    @property
+    def coefVar(self,):
+
+        if self.n == 0: return np.nan
+
+        return self.std / self.mean
+
+    @property
+    def slope(self,):
+
+        if self.n < 2: return 0
+
+        return self.c_xy / self.m2_x
+
+
+class StreamingTapAnalyzer:
+    """
+    Incremental tap detection and feature aggregation
+
+    Input:
+        - fs (int): sample freq in Hz
+        - main_ax_i (int): index of main tapping axis
+        - chunk_size (int): n samples per chunk, every
+            chunk given to update() has to have this size
+        - buffer_s (float): seconds of recent signal kept
+            for peak finding and per-tap features, has to
+            be longer than the longest tap
+        - lag_s (float): seconds at the end of the buffer
+            which are processed after the next chunk, peaks
+            close to the end are not reliable yet
+        - warmup_s (float): seconds received before detection
+            starts, to base thresholds on several taps
+        - min_n_slope (int): minimal number of taps for
+            slopes, zero below (as ft_decrement())
+
+    Usage:
+        analyzer = StreamingTapAnalyzer(fs=250, main_ax_i=0)
+        for chunk in chunks:
+            new_taps = analyzer.update(chunk)
+            fts = analyzer.get_features()
+        new_taps = analyzer.finish(remaining_samples)
+    """
+    def __init__(
+        self, fs: int, main_ax_i: int, chunk_size: int = 25,
+        buffer_s: float = 3., lag_s: float = .3, warmup_s: float = 2.,
+        min_n_slope: int = 8,
+    ):
+        assert lag_s < buffer_s, 'lag_s has to be smaller than buffer_s'
+        assert warmup_s <= buffer_s - lag_s, ('warmup_s can not be longer'
+                                              ' than buffer_s - lag_s')
+        assert chunk_size > 0, 'chunk_size has to be positive'
+
+        self.fs = fs
+        self.main_ax_i = main_ax_i
+        self.chunk_size = chunk_size
+        self.buffer_len = int(buffer_s * fs)
+        self.lag = int(lag_s * fs)
+        self.warmup = int(warmup_s * fs)
+        self.min_n_slope = min_n_slope
+        self.post_impact_blank = int(fs / 1000 * 15)  # as updrsTapDetector
+
+        self.buffer = np.zeros((3, 0))
+        self.buffer_start = 0  # index of first buffer sample in recording
+        self.n_received = 0
+        self.n_processed = 0  # samples passed through detection
+        self.sig_sum = 0.  # running sum of main axis, for thresholds
+        self.svm_max, self.svm_df_max = -np.inf, -np.inf  # for impacts
+        self.finished = False
+        self.det_state = tapDetectorState()
+        self.n_closed = 0  # completed taps, including dropped first tap
+
+        self.taps = []
+        self.impacts = []
+        self.tap_values = {ft: [] for ft in STREAM_FEATS}
+        self.aggregates = {ft: runningAggregate() for ft in STREAM_FEATS}
+
+    def update(self, chunk):
+        """
+        Adds a chunk (3 x chunk_size) and processes all
+        samples older than lag_s
+
+        Returns:
+            - new_taps: tapTable with taps completed in this
+                update, indices relative to recording start
+        """
+        chunk = np.asarray(chunk)
+        if chunk.shape[0] != 3: chunk = chunk.T
+        if chunk.shape != (3, self.chunk_size):
+            raise ValueError(
+                f'chunk should have shape (3, {self.chunk_size}),'
+                f' got {chunk.shape}, use finish() for last samples'
+            )
+        self._add_samples(chunk)
+
+        if self.n_received < self.warmup: return tapTable()
+
+        n_stop = self.n_received - self.lag - 1  # sigdf available
+        if n_stop <= self.n_processed: return tapTable()
+
+        new_taps = self._detect(n_stop)
+        self._trim_buffer()
+
+        return new_taps
+
+    def finish(self, remaining=None):
+        """
+        Adds the remaining samples (3 x n, n can be smaller
+        than chunk_size, or None) and processes all samples
+        until the end of the recording, without lag
+
+        Returns:
+            - new_taps: tapTable with taps completed
+        """
+        if self.finished: raise ValueError('analyzer is already finished')
+
+        if remaining is not None:
+            remaining = np.asarray(remaining)
+            if remaining.shape[0] != 3: remaining = remaining.T
+            if remaining.shape[1] > 0: self._add_samples(remaining)
+        self.finished = True
+
+        n_stop = self.n_received - 1  # as updrsTapDetector, last sample has no diff
+        if n_stop <= self.n_processed: return tapTable()
+
+        return self._detect(n_stop)
+
+    def _add_samples(self, samples):
+
+        if self.finished: raise ValueError('analyzer is already finished')
+
+        self.buffer = np.concatenate([self.buffer, samples], axis=1)
+        self.n_received += samples.shape[1]
+        self.sig_sum += samples[self.main_ax_i].sum()
+
+    def _detect(self, n_stop):
+
+        sig = self.buffer[self.main_ax_i]
+        sigdf = np.diff(sig)
+        svm = tap_feats.signalvectormagn(self.buffer)
+
+        # thresholds and peaks as in updrsTapDetector, thresholds on
+        # all samples so far, peaks on recent signal
+        posThr = self.sig_sum / self.n_received
+        self.svm_max = max(self.svm_max, np.nanmax(svm))
+        self.svm_df_max = max(self.svm_df_max, np.nanmax(np.diff(svm)))
+        impacts = find_impacts(svm, self.fs, arr_max=self.svm_max,
+                               diff_max=self.svm_df_max)
+        posPeaks = find_peaks(
+            sig, height=(posThr, np.nanmax(sig)), distance=self.fs * .05,
+        )[0]
+        posPeaks = np.setdiff1d(posPeaks, impacts)
+        negPeak = find_peaks(
+            -1 * sig, height=-.5e-7, distance=self.fs * .1 * .5,
+            prominence=abs(np.nanmin(sig)) * .05,
+        )[0]
+
+        closed = detect_tap_states(
+            sig=sig, sigdf=sigdf, impacts=impacts, posPeaks=posPeaks,
+            negPeak=negPeak, posThr=posThr, negThr=-posThr,
+            sigdf_thr=np.percentile(sigdf, 50),
+            post_impact_blank=self.post_impact_blank,
+            det_state=self.det_state,
+            n_start=self.n_processed - self.buffer_start,
+            n_stop=n_stop - self.buffer_start,
+            n_offset=self.buffer_start,
+        )
+        self.n_processed = n_stop
+
+        new_taps = []
+        for tap in closed:
+            self.n_closed += 1
+            if self.n_closed == 1:
+                # drop first tap due to starting time, its impact is
+                # counted (as total_nTaps and freq in tapFeatures)
+                if not np.isnan(tap[5]): self.impacts.append(int(tap[5]))
+                continue
+            new_taps.append(tap)
+            self._add_tap_features(tap)
+
+        return tapTable.from_lists(new_taps)
+
+    def _add_tap_features(self, tap):
+        """
+        Calculates the per-tap features of one completed
+        tap on the buffer and updates running aggregates
+        """
+        values = {}
+        if len(self.taps) > 0:
+            values['intraTapInt'] = (tap[-2] - self.taps[-1][-2]) / self.fs
+        else:
+            values['intraTapInt'] = np.nan  # no interval for first tap
+
+        self.taps.append(tap)
+        if not np.isnan(tap[5]): self.impacts.append(int(tap[5]))
+
+        if tap[0] < self.buffer_start:
+            print(f'tap starting at {tap[0]} not in buffer anymore, '
+                  'signal features skipped (increase buffer_s)')
+            values = {'intraTapInt': values['intraTapInt']}
+
+        else:
+            local_tap = tapTable.from_lists([tap - self.buffer_start])
+            values.update(self._get_signal_features(local_tap))
+
+        for ft, value in values.items():
+            # per-tap functions return an empty array for skipped taps
+            if np.size(value) == 0: continue
+            value = float(np.ravel(value)[0])
+            # intraTapInt of first tap is skipped (n_taps - 1 values)
+            if ft == 'intraTapInt' and np.isnan(value): continue
+            self.tap_values[ft].append(value)
+            self.aggregates[ft].update(value)
+
+    def _get_signal_features(self, local_tap):
+        """
+        Returns dict with per-tap features of one tap,
+        local_tap with indices relative to buffer start
+        """
+        values = {}
+
+        rms_kwargs = {'triax_arr': self.buffer, 'acc_select': 'svm',
+                      'ax': self.main_ax_i, 'fs': self.fs}
+        values['tapRMS'] = tap_feats.RMS_extraction(
+            local_tap, unit_to_assess='taps', **rms_kwargs)
+        values['tapRMSnrm'] = tap_feats.RMS_extraction(
+            local_tap, unit_to_assess='taps', to_norm=True, **rms_kwargs)
+        values['impactRMS'] = tap_feats.RMS_extraction(
+            local_tap, unit_to_assess='impacts', **rms_kwargs)
+        values['raise_velocity'] = tap_feats.velocity_raising(
+            local_tap, self.buffer, ax=self.main_ax_i)
+        values['jerkiness_taps'] = tap_feats.jerkiness(
+            accsig=self.buffer, fs=self.fs, tap_indices=local_tap,
+            unit_to_assess='taps',)
+        values['tap_entropy'] = tap_feats.entropy_per_tap(
+            accsig=self.buffer, tap_indices=local_tap)
+
+        return values
+
+    def _trim_buffer(self,):
+
+        n_drop = self.buffer.shape[1] - self.buffer_len
+        if n_drop <= 0: return
+
+        self.buffer = self.buffer[:, n_drop:]
+        self.buffer_start += n_drop
+
+    def get_tap_table(self,):
+        """
+        Returns tapTable with all completed taps
+        """
+        return tapTable.from_lists(self.taps)
+
+    def get_features(self,):
+        """
+        Returns dict with current running features,
+        named as the tapFeatures attributes
+        """
+        duration = self.n_received / self.fs
+        fts = {
+            'total_nTaps': len(self.impacts),
+            'freq': len(self.impacts) / duration if duration > 0 else np.nan,
+        }
+        for ft, agg in self.aggregates.items():
+            fts[f'mean_{ft}'] = agg.mean if agg.n > 0 else np.nan
+            fts[f'coefVar_{ft}'] = agg.coefVar
+            slope = agg.slope if agg.n >= self.min_n_slope else 0
+            if ft in ABS_SLOPE_FEATS: slope = abs(slope)
+            fts[f'slope_{ft}'] = slope
+
+        return fts
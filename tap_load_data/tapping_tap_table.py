@@ -0,0 +1,127 @@
+"""
+Compact storage of detected taps
+
+Every tap has 7 time points (sample indices):
+[startUP, fastestUp, stopUP, startDown,
+fastestDown, impact, stopDown]. Instead of a list
+with one float-array (NaN for missing points) per
+tap, all taps are stored in one int32-array
+(n_taps x 7) with a validity mask. Iterating and
+indexing returns the former float-arrays, existing
+code using lists of taps keeps working.
+"""
+
+# import public packages and functions
+import numpy as np
+
+
+TAP_COLUMNS = ['startUP', 'fastestUp', 'stopUP', 'startDown',
+               'fastestDown', 'impact', 'stopDown']
+
+
+class tapTable:
+    """
+    Tap time points of one trace
+
+    Input:
+        - idx: int32-array (n_taps x 7) with sample
+            indices, -1 where time point is missing
+        - valid: bool-array (n_taps x 7), False for
+            missing time points
+    """
+    __slots__ = ('idx', 'valid')
+
+    def __init__(self, idx=None, valid=None):
+
+        if idx is None: idx = np.zeros((0, 7), dtype=np.int32)
+        self.idx = np.asarray(idx, dtype=np.int32).reshape(-1, 7)
+        if valid is None: valid = self.idx >= 0
+        self.valid = np.asarray(valid, dtype=bool).reshape(-1, 7)
+
+    @classmethod
+    def from_lists(cls, tap_lists):
+        """
+        Creates tapTable from list with float-array
+        per tap (NaN for missing time points)
+        """
+        if isinstance(tap_lists, cls): return tap_lists
+        if len(tap_lists) == 0: return cls()
+
+        arr = np.array(tap_lists, dtype=float).reshape(len(tap_lists), 7)
+        valid = ~np.isnan(arr)
+
+        return cls(np.where(valid, arr, -1), valid)
+
+    def __len__(self,):
+
+        return self.idx.shape[0]
+
+    def __getitem__(self, key):
+        """
+        Integer returns float-array of one tap (NaN for
+        missing time points), slices return a tapTable
+        """
+        if isinstance(key, (int, np.integer)):
+            row = self.idx[key].astype(float)
+            row[~self.valid[key]] = np.nan
+            return row
+
+        return tapTable(self.idx[key], self.valid[key])
+
+    def __iter__(self,):
+
+        for i in range(len(self)): yield self[i]
+
+    def __array__(self, dtype=None):
+
+        arr = self.as_float()
+        return arr if dtype is None else arr.astype(dtype)
+
+    def __repr__(self,):
+
+        return f'tapTable(n_taps={len(self)})'
+
+    def as_float(self,):
+        """
+        Returns float-array (n_taps x 7), NaN for
+        missing time points
+        """
+        arr = self.idx.astype(float)
+        arr[~self.valid] = np.nan
+
+        return arr
+
+    def to_list(self,):
+        """
+        Returns list with float-array per tap, as
+        previously returned by updrsTapDetector()
+        """
+        return list(self)
+
+    def col(self, moment):
+        """
+        Returns column (int-array) of one time point,
+        moment as name (see TAP_COLUMNS) or index
+        (negative indices allowed), -1 for missing
+        """
+        if isinstance(moment, str): moment = TAP_COLUMNS.index(moment)
+
+        return self.idx[:, moment]
+
+    def float_col(self, moment):
+        """
+        Returns column as float-array, NaN for missing
+        """
+        if isinstance(moment, str): moment = TAP_COLUMNS.index(moment)
+        col = self.idx[:, moment].astype(float)
+        col[~self.valid[:, moment]] = np.nan
+
+        return col
+
+
+def as_tap_table(taps):
+    """
+    Returns taps as tapTable, accepts tapTable and
+    lists of tap-arrays (e.g. from older pickles)
+    """
+    return tapTable.from_lists(taps)
@@ -1,6 +1,8 @@
 '''Feature Extraction Preparation Functions'''
 
 # Import public packages and functions
+from typing import Any
+from dataclasses import dataclass, field
 import numpy as np
 from scipy.signal import find_peaks
 
@@ -9,8 +11,11 @@ from scipy.signal import find_peaks
 from tap_load_data.tapping_impact_finder import find_impacts
 from tap_extract_fts.tapping_featureset import signalvectormagn
 from tap_load_data.tapping_preprocess import remove_acc_nans
+from retap_utils.utils_profiling import profiled
+from tap_load_data.tapping_tap_table import tapTable
    
 
+@profiled()
 def updrsTapDetector(
     acc_triax, main_ax_i: int, fs: int,
 ):
@@ -32,10 +37,11 @@ def updrsTapDetector(
         - fs (int): sample frequency in Hz
     
     Return:
-        - tapi (list of lists): list with full-recognized taps,
-            every list is one tap. Every list contains 6 moments
-            of the tap: [startUP, fastestUp, stopUP, startDown, 
-            fastestDown, impact, stopDown]
+        - tapi (tapTable): full-recognized taps, every row
+            is one tap, containing 7 moments of the tap:
+            [startUP, fastestUp, stopUP, startDown, 
+            fastestDown, impact, stopDown]. Iterating gives
+            one array per tap (NaN for missing moments)
         - tapTimes (list of lists): lists per tap corresponding
             with tapi, expressed in seconds after start data array
         - endPeaks (array): indices of impact-peak which correspond
@@ -85,23 +91,93 @@ def updrsTapDetector(
         prominence=abs(np.nanmin(sig)) * .05,
     )[0]
 
-    # Lists to store collected indices and timestamps
+    # detector state, carried over chunks in streaming detection
+    det_state = tapDetectorState()
+    post_impact_blank = int(fs / 1000 * 15)  # last int defines n ms
+
+    # Sample-wise movement detection
+    tapi = detect_tap_states(
+        sig=sig, sigdf=sigdf, impacts=impacts, posPeaks=posPeaks,
+        negPeak=negPeak, posThr=posThr, negThr=negThr,
+        sigdf_thr=np.percentile(sigdf, 50),
+        post_impact_blank=post_impact_blank, det_state=det_state,
+    )
+
+    tapi = tapi[1:]  # drop first tap due to starting time
+    tapi = tapTable.from_lists(tapi)
+
+    return tapi, impacts, acc_triax
+
+
+@dataclass(init=True, repr=True)
+class tapDetectorState:
+    """
+    State of the sample-wise tap detection, kept
+    between calls of detect_tap_states() to continue
+    detection over consecutive chunks of a recording.
+
+    Input:
+        - state: current movement phase
+        - tempi: indices of the tap in progress [startUP,
+            fastestUp, stopUP, startDown, fastestDown,
+            impact, stopDown], NaN if not reached yet
+        - blank_count: samples passed after impact
+        - end_last_tap_n: index of end of last tap, used
+            as backup for the start-index of next tap
+    """
+    state: str = 'lowRest'
+    tempi: Any = field(default_factory=lambda: np.array([np.nan] * 7))
+    blank_count: int = 0
+    end_last_tap_n: int = 0
+
+
+def detect_tap_states(
+    sig, sigdf, impacts, posPeaks, negPeak, posThr, negThr,
+    sigdf_thr, post_impact_blank, det_state,
+    n_start: int = 0, n_stop: int = None, n_offset: int = 0,
+):
+    """
+    Determines sample-wise in which part of a tap the
+    main-axis signal is, and collects the moments per
+    tap (see updrsTapDetector()).
+
+    Input:
+        - sig, sigdf: main-axis signal and its diff
+        - impacts, posPeaks, negPeak: indices (in sig)
+            of impacts and positive and negative peaks
+        - posThr, negThr: thresholds for start of raising
+            and lowering of finger
+        - sigdf_thr: diff-threshold for start of raising
+        - post_impact_blank: n samples blanked after impact
+        - det_state: tapDetectorState, updated in place
+        - n_start, n_stop: range of samples in sig to process,
+            defaults to all samples except the last
+        - n_offset: added to stored indices, to express
+            them relative to start of the full recording
+    
+    Returns:
+        - tapi: list with array of 7 moments per tap
+            completed within the processed samples
+    """
+    if n_stop is None: n_stop = len(sig) - 1
+    impacts, posPeaks, negPeak = set(impacts), set(posPeaks), set(negPeak)
+    
     tapi = []  # list to store indices of tap
     empty_timelist = np.array([np.nan] * 7)
     # [startUP, fastestUp, stopUP, startDown, fastestDown, impact, stopDown]
-    tempi = empty_timelist.copy()
-    state = 'lowRest'
-    post_impact_blank = int(fs / 1000 * 15)  # last int defines n ms
-    blank_count = 0
-    end_last_tap_n = 0  # needed for backup filling of tap-start-index
+    tempi = det_state.tempi
+    state = det_state.state
+    blank_count = det_state.blank_count
+    end_last_tap_n = det_state.end_last_tap_n
+
+    for n in range(n_start, n_stop):
 
-    # Sample-wise movement detection        
-    for n, y in enumerate(sig[:-1]):
+        y = sig[n]
 
         if n in impacts:
 
             state = 'impact'
-            tempi[5] = n
+            tempi[5] = n + n_offset
         
         elif state == 'impact':
             if blank_count < post_impact_blank:
@@ -111,7 +187,7 @@ def updrsTapDetector(
             else:
                 if sigdf[n] > 0:
                     blank_count = 0
-                    tempi[6] = n
+                    tempi[6] = n + n_offset
                     # always set first index of tap
                     if np.isnan(tempi[0]):
                         # if not detected, than use end of last tap
@@ -128,10 +204,10 @@ def updrsTapDetector(
             # debugging to get start of tap every time in
             if np.logical_and(
                 y > posThr,  # try with half the threshold to detect start-index
-                sigdf[n] > np.percentile(sigdf, 50)  # was 75th percentile 
+                sigdf[n] > sigdf_thr  # was 75th percentile 
             ):                
                 state='upAcc1'
-                tempi[0] = n  # START OF NEW TAP, FIRST INDEX
+                tempi[0] = n + n_offset  # START OF NEW TAP, FIRST INDEX
                 
         elif state == 'upAcc1':
             if n in posPeaks:
@@ -139,7 +215,7 @@ def updrsTapDetector(
 
         elif state == 'upAcc2':
             if y < 0:  # crossing zero-line, start of decelleration
-                tempi[1] = n  # save n as FASTEST MOMENT UP
+                tempi[1] = n + n_offset  # save n as FASTEST MOMENT UP
                 state='upDec1'
 
         elif state=='upDec1':
@@ -153,7 +229,7 @@ def updrsTapDetector(
                 # if acc is pos, or goes into acceleration
                 # phase of down movement
                 state='highRest'  # end of UP-decell
-                tempi[2]= n  # END OF UP !!!
+                tempi[2]= n + n_offset  # END OF UP !!!
 
         elif state == 'highRest':
             if np.logical_and(
@@ -161,7 +237,7 @@ def updrsTapDetector(
                 sigdf[n] < 0
             ):
                 state='downAcc1'
-                tempi[3] = n  # START OF LOWERING            
+                tempi[3] = n + n_offset  # START OF LOWERING            
 
         elif state == 'downAcc1':
             if np.logical_and(
@@ -169,9 +245,11 @@ def updrsTapDetector(
                 sigdf[n] > 0
             ):
                 state='downDec1'
-                tempi[4] = n  # fastest down movement
-
+                tempi[4] = n + n_offset  # fastest down movement
     
-    tapi = tapi[1:]  # drop first tap due to starting time
+    det_state.tempi = tempi
+    det_state.state = state
+    det_state.blank_count = blank_count
+    det_state.end_last_tap_n = end_last_tap_n
 
-    return tapi, impacts, acc_triax
+    return tapi
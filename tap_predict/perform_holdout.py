@@ -12,22 +12,23 @@ from sklearn.discriminant_analysis import LinearDiscriminantAnalysis as LDA
 from sklearn.svm import SVC
 from sklearn.ensemble import RandomForestClassifier
 
-from joblib import dump, load
-
 from retap_utils.utils_dataManagement import get_local_proj_dir
+from tap_predict.retap_model_registry import get_model_registry
 
 
 def perform_holdout(
     full_X=None, slow_X=None, fast_X=None,
     full_y=None, slow_y=None, fast_y=None,
     full_modelname=None, slow_modelname=None, fast_modelname=None,
-    PATH_ADD=None,
+    PATH_ADD=None, mmap_mode=None,
 ):
     """
     Performs HOLDOUT validation
 
     Input:
         requires either full X, y, and modelname; OR fast + slow
+        - mmap_mode: joblib mmap_mode for loading models,
+            models are loaded once per session (model registry)
     
     Returns:
         - y_pred_dict: containing holdout key, OR fast and slow keys
@@ -46,22 +47,27 @@ def perform_holdout(
     else:
         raise ValueError('NO COMPLETE DATA AND MODEL VARIABLES GIVEN')
     
-    MODEL_PATH = join(get_local_proj_dir(), 'results', 'models')
-    if PATH_ADD: MODEL_PATH = join(MODEL_PATH, PATH_ADD)
+    # loaded models are kept in memory by registry
+    registry = get_model_registry(
+        join(get_local_proj_dir(), 'results', 'models'),
+    )
 
     y_pred_dict, y_true_dict = {}, {}
 
     if split == 'UNCLUSTERED':
         # predict and add to dict
-        clf = load(join(MODEL_PATH, full_modelname))
+        clf = registry.get_model(full_modelname, subfolder=PATH_ADD,
+                                 mmap_mode=mmap_mode)
         y_pred_dict['holdout'] = clf.predict(full_X)
         # add true labels to dict
         y_true_dict['holdout'] = full_y
 
     elif split == 'CLUSTERED':
         # predict and add to dict
-        slow_clf = load(join(MODEL_PATH, slow_modelname))
-        fast_clf = load(join(MODEL_PATH, fast_modelname))
+        slow_clf = registry.get_model(slow_modelname, subfolder=PATH_ADD,
+                                      mmap_mode=mmap_mode)
+        fast_clf = registry.get_model(fast_modelname, subfolder=PATH_ADD,
+                                      mmap_mode=mmap_mode)
         y_pred_dict['slow'] = slow_clf.predict(slow_X)
         y_pred_dict['fast'] = fast_clf.predict(fast_X)
         # add true labels to dict
@@ -0,0 +1,288 @@
+"""
+ReTap Prediction Config Sweep
+
+Runs a grid of prediction configurations (as defined
+by the variables in retap_main_prediction_script.py)
+in cross-validation (defaults, exclusions and
+features from retap_pred_settings.py). Feature classes, data splits
+and feature matrices are loaded and prepared once,
+and shared between all configs. Configs are run in
+parallel, results are stored in one table.
+
+cmnd line, from repo path (WIN):
+    python -m tap_predict.retap_config_sweep Cfg_prediction_sweep.json
+"""
+
+# Importing public packages
+import sys
+import json
+from os.path import join
+from itertools import product
+from time import perf_counter
+import datetime as dt
+import numpy as np
+from pandas import DataFrame
+from joblib import Parallel, delayed
+from sklearn.model_selection import StratifiedKFold
+from sklearn.metrics import cohen_kappa_score as kappa
+
+# own functions
+from tap_extract_fts.main_featExtractionClass import FeatureSet, singleTrace  # mandatory for pickle import
+from retap_utils import utils_dataManagement
+import retap_utils.get_datasplit as get_split
+import tap_predict.tap_pred_prepare as pred_prep
+import tap_predict.tap_pred_help as pred_help
+from tap_predict import retap_cv_models as cv_models
+from tap_predict.retap_pred_settings import (
+    DEFAULT_CONFIG, SUBS_EXCL, TRACES_EXCL, RECLASS_SETTINGS,
+    CLASS_FEATS, CLUSTER_FEATS, RECLASS_FEATS,
+)
+
+
+
+def expand_config_grid(grid: dict):
+    """
+    Creates list of configs from grid. Variables given
+    as list are varied, all combinations are created,
+    not given variables use DEFAULT_CONFIG.
+
+    Example: {'CLF_CHOICE': ['RF', 'LOGREG'],
+              'MAX_TAPS_PER_TRACE': [10, 15, None]}
+    """
+    for key in grid.keys():
+        if key not in DEFAULT_CONFIG:
+            raise ValueError(f'unknown config variable {key} in grid')
+
+    keys = list(grid.keys())
+    values = [v if isinstance(v, list) else [v] for v in grid.values()]
+
+    configs = []
+    for combi in product(*values):
+        config = dict(DEFAULT_CONFIG)
+        config.update(dict(zip(keys, combi)))
+        configs.append(config)
+
+    return configs
+
+
+def get_ftClass_name(config):
+
+    if config['MAX_TAPS_PER_TRACE']:
+        return (f'ftClass_max{config["MAX_TAPS_PER_TRACE"]}_'
+                f'{config["FT_CLASS_DATE"]}.P')
+    else:
+        return f'ftClass_ALL_{config["FT_CLASS_DATE"]}.P'  # include all taps per trace
+
+
+def prepare_shared_data(configs, deriv_path=None):
+    """
+    Loads every feature class only once, and calculates
+    data splits, few-tap classifications, and the feature
+    matrix only once per feature class (and split settings).
+
+    Returns:
+        - shared (dict): with keys 'matrices', 'splits', and
+            'fewTaps', only contains arrays and lists (no
+            FeatureSet), to be send to parallel workers
+    """
+    if not deriv_path:
+        deriv_path = join(utils_dataManagement.get_local_proj_dir(),
+                          'data', 'derivatives')
+    shared = {'matrices': {}, 'splits': {}, 'fewTaps': {}}
+
+    for ftClass_name in sorted(set([get_ftClass_name(c) for c in configs])):
+        print(f'loading {ftClass_name}')
+        FT_CLASS = utils_dataManagement.load_class_pickle(
+            join(deriv_path, ftClass_name)
+        )
+        ft_configs = [c for c in configs if get_ftClass_name(c) == ftClass_name]
+
+        # all features of all traces in one matrix
+        shared['matrices'][ftClass_name] = pred_prep.get_feature_matrix(
+            FT_CLASS, feats=list(dict.fromkeys(CLASS_FEATS + CLUSTER_FEATS)),
+        )
+
+        for split_key in set([
+            (c['N_RANDOM_SPLIT'], c['EXCL_4']) for c in ft_configs
+        ]):
+            datasplit_subs = get_split.find_dev_holdout_split(
+                feats=FT_CLASS,
+                subs_excl=list(SUBS_EXCL),
+                traces_excl=list(TRACES_EXCL),
+                choose_random_split=split_key[0],
+                EXCL_4s=split_key[1],
+            )
+            # in case fours are excluded, the excluded traces are returned
+            if isinstance(datasplit_subs, tuple):
+                datasplit_subs, excl_fours = datasplit_subs
+            else:
+                excl_fours = []
+            shared['splits'][(ftClass_name,) + split_key] = {
+                'dev': list(datasplit_subs['dev']),
+                'hout': list(datasplit_subs['hout']),
+                'excl_fours': list(excl_fours),
+            }
+
+        for cutoff in set([c['CUTOFF_TAPS_3'] for c in ft_configs
+                           if c['SCORE_FEW_TAPS_3']]):
+            shared['fewTaps'][(ftClass_name, cutoff)] = pred_help.classify_based_on_nTaps(
+                max_n_taps=cutoff, ftClass=FT_CLASS,
+            )
+
+        del(FT_CLASS)
+
+    return shared
+
+
+def run_single_config(config, shared, n_jobs_folds=1):
+    """
+    Runs cross-validation for one config, on the prepared
+    shared data (see prepare_shared_data())
+
+    Returns:
+        - result (dict): config and resulting metrics
+    """
+    t_start = perf_counter()
+    ftClass_name = get_ftClass_name(config)
+    ft_matrix = shared['matrices'][ftClass_name]
+    split = shared['splits'][
+        (ftClass_name, config['N_RANDOM_SPLIT'], config['EXCL_4'])
+    ]
+    # only use development data in cross-validation
+    subs_excl = SUBS_EXCL + split['excl_fours'] + split['hout']
+    traces_excl = list(TRACES_EXCL)
+
+    y_true_all, y_pred_all = [], []
+
+    ### EXCLUDE TRACES with SMALL NUMBER of TAPS, CLASSIFY them AS "3"
+    if config['SCORE_FEW_TAPS_3']:
+        classf_taps_3, y_pred_fewTaps, y_true_fewTaps = shared['fewTaps'][
+            (ftClass_name, config['CUTOFF_TAPS_3'])
+        ]
+        # select traces from subs present in current datasplit
+        for t, pred, true in zip(classf_taps_3, y_pred_fewTaps, y_true_fewTaps):
+            if not any([t.startswith(s) for s in split['dev']]): continue
+            traces_excl.append(t)
+            y_pred_all.append(pred)
+            y_true_all.append(true)
+
+    X, y, ids, _ = pred_prep.build_X_y(
+        ft_matrix, incl_feats=CLASS_FEATS,
+        excl_traces=traces_excl, excl_subs=subs_excl,
+        to_norm=config['TO_NORM'], to_zscore=config['TO_ZSCORE'],
+        to_mask_4=config['TO_MASK_4'], to_mask_0=config['TO_MASK_0'],
+        verbose=False,
+    )
+    pred_data = pred_prep.predictionData(X=X, y=y, ids=ids)
+
+    if config['CLUSTER_ON_FREQ']:
+        # imported here, only needed for clustering
+        import tap_plotting.retap_plot_clusters as plot_cluster
+
+        cluster_X, _, _, _ = pred_prep.build_X_y(
+            ft_matrix, incl_feats=CLUSTER_FEATS,
+            excl_traces=traces_excl, excl_subs=subs_excl,
+            to_zscore=config['TO_ZSCORE'], to_mask_4=config['TO_MASK_4'],
+            verbose=False,
+        )
+        y_clusters, _, _ = plot_cluster.get_kMeans_clusters(
+            X=cluster_X, n_clusters=config['N_CLUSTERS_FREQ'],
+        )
+        cv_datasets = pred_help.split_data_in_clusters(
+            pred_data, y_clusters, cluster_X, CLUSTER_FEATS
+        )
+    else:
+        cv_datasets = [pred_data]
+
+    for cv_data in cv_datasets:
+        (y_pred_dict, _, y_true_dict, og_pred_idx
+        ) = cv_models.get_cvFold_predictions_dicts(
+            X_cv=cv_data.X, y_cv=cv_data.y,
+            cv_method=StratifiedKFold,
+            n_folds=config['N_FOLDS'] if not config['CLUSTER_ON_FREQ'] else 3,
+            clf=config['CLF_CHOICE'],
+            n_jobs=n_jobs_folds,
+            verbose=False,
+        )
+        if isinstance(config['RECLASS_AFTER_RF'], str) and not config['CLUSTER_ON_FREQ']:
+            for scores_to_recl in RECLASS_SETTINGS['scores']:
+                (y_true_dict, y_pred_dict, og_pred_idx, _
+                ) = pred_help.perform_reclassification(
+                    RECLASS_AFTER_RF=config['RECLASS_AFTER_RF'],
+                    scores_to_reclass=scores_to_recl,
+                    og_pred_idx=og_pred_idx,
+                    y_pred_dict=y_pred_dict, y_true_dict=y_true_dict,
+                    RECLASS_FEATS=RECLASS_FEATS,
+                    CLASS_FEATS=CLASS_FEATS,
+                    pred_data=cv_data,
+                )
+        for key in y_true_dict.keys():
+            y_true_all.extend(y_true_dict[key])
+            y_pred_all.extend(y_pred_dict[key])
+
+    y_true_all, y_pred_all = np.array(y_true_all), np.array(y_pred_all)
+    penalties = abs(y_true_all - y_pred_all)
+    icc = pred_help.calculate_ICC(y_true=y_true_all, y_pred=y_pred_all)
+
+    result = dict(config)
+    result.update({
+        'n_traces': len(y_true_all),
+        'kappa': kappa(y_true_all, y_pred_all, weights='linear'),
+        'icc': icc.iloc[5]['ICC'],  # 5 row is two-way, mixed effect, k-raters
+        'mean_penalty': np.mean(penalties),
+        'std_penalty': np.std(penalties),
+        'runtime_s': perf_counter() - t_start,
+    })
+
+    return result
+
+
+def run_config_sweep(
+    grid: dict, n_jobs: int = -1, results_path=None,
+    results_fname=None, deriv_path=None,
+):
+    """
+    Runs all configs of grid in cross-validation,
+    configs run in parallel (n_jobs).
+
+    Input:
+        - grid: dict with config variables, see
+            expand_config_grid()
+        - n_jobs: number of configs ran in parallel
+        - results_path: directory to save results table,
+            defaults to onedrive results folder
+        - results_fname: name of csv-file
+
+    Returns:
+        - results: DataFrame with one row per config
+    """
+    configs = expand_config_grid(grid)
+    print(f'running {len(configs)} prediction configs')
+
+    shared = prepare_shared_data(configs, deriv_path=deriv_path)
+
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(run_single_config)(config, shared) for config in configs
+    )
+    results = DataFrame(results)
+
+    if not results_path:
+        results_path = utils_dataManagement.find_onedrive_path('results')
+    if not results_fname:
+        results_fname = f'config_sweep_{dt.date.today().strftime("%Y%m%d")}.csv'
+    results.to_csv(join(results_path, results_fname), index=False)
+    print(f'sweep results saved as {join(results_path, results_fname)}')
+
+    return results
+
+
+if __name__ == '__main__':
+
+    # check for given Cfg-file
+    if len(sys.argv) == 2: json_filename = sys.argv[1]
+    elif len(sys.argv) == 1: json_filename = 'Cfg_prediction_sweep.json'
+
+    with open(json_filename, 'r') as json_data:
+        cfg = json.load(json_data)
+
+    run_config_sweep(grid=cfg['grid'], n_jobs=cfg.get('n_jobs', -1))
@@ -5,15 +5,20 @@ development phase.
 
 # import public packages
 import numpy as np
-from pandas import crosstab
-from itertools import product
+from pandas import DataFrame, Index
 
+from joblib import Parallel, delayed
+
+from sklearn.base import clone
 from sklearn.model_selection import StratifiedKFold
 from sklearn.linear_model import LogisticRegression
 from sklearn.discriminant_analysis import LinearDiscriminantAnalysis as LDA
 from sklearn.svm import SVC
 from sklearn.ensemble import RandomForestClassifier
 
+from tap_predict import retap_metrics
+from retap_utils.utils_profiling import profile_stage
+
 
 def get_cvFold_predictions_dicts(
     X_cv,
@@ -24,6 +29,8 @@ def get_cvFold_predictions_dicts(
     sv_kernel='linear',
     lr_solver='lbfgs',
     random_state=27,
+    n_jobs: int=1,
+    clf_n_jobs=None,
     verbose=True,
 ):
     """
@@ -39,6 +46,12 @@ def get_cvFold_predictions_dicts(
         - clf: must be imported classifier function,
             needs to be inserted with parameter definition
             within parenthesis
+        - n_jobs: number of folds fitted in parallel (joblib),
+            every fold fits a clone of clf, results are equal
+            to the sequential run (n_jobs=1) for classifiers
+            with a fixed random_state
+        - clf_n_jobs: n_jobs within the classifier (e.g. trees
+            of RandomForest), only for classifiers with n_jobs
     
     Returns:
         - dict with predicted scores,
@@ -77,9 +90,13 @@ def get_cvFold_predictions_dicts(
                 max_features='sqrt',
                 random_state=random_state,
                 class_weight='balanced',
+                n_jobs=clf_n_jobs,
             )
         else:
             raise ValueError('Unknown requested string for Clf')
+    # set parallel jobs within classifier if given
+    elif clf_n_jobs is not None and 'n_jobs' in clf.get_params():
+        clf = clone(clf).set_params(n_jobs=clf_n_jobs)
     # set random state    
     np.random.seed(random_state)
     # set cross-validation method with number of folds
@@ -92,31 +109,52 @@ def get_cvFold_predictions_dicts(
 
     if verbose: print(clf)
 
-    # iterate over loops
-    for F, (train_index, test_index) in enumerate(
-        cv.split(X_cv, y_cv)
-    ):
+    folds = list(cv.split(X_cv, y_cv))
 
+    for F, (train_index, test_index) in enumerate(folds):
         og_sample_indices[F] = test_index
+        y_true_dict[F] = y_cv[test_index]
+
+        if verbose: print(f'Fold {F}: # of samples: train '
+                          f'{len(train_index)}, test {len(test_index)}')
+
+    # fit a clone of the model per fold, sequential or parallel
+    fold_jobs = [
+        delayed(fit_predict_fold)(
+            clone(clf), X_cv[train_index], y_cv[train_index],
+            X_cv[test_index],
+        ) for train_index, test_index in folds
+    ]
+    if n_jobs == 1:
+        fold_results = [func(*args, **kwargs) for func, args, kwargs in fold_jobs]
+    else:
+        fold_results = Parallel(n_jobs=n_jobs)(fold_jobs)
+
+    # save predictions for posthoc analysis and conf matrix
+    for F, (y_proba, y_pred) in enumerate(fold_results):
+        y_proba_dict[F] = y_proba
+        y_pred_dict[F] = y_pred
 
-        # define training and test data per fold
-        X_train, X_test = X_cv[train_index], X_cv[test_index]
-        y_train, y_test = y_cv[train_index], y_cv[test_index]
+    return y_pred_dict, y_proba_dict, y_true_dict, og_sample_indices
 
-        if verbose: print(f'Fold {F}: # of samples: train {len(X_train)}, test {len(X_test)}')
-        
-        # fit model
-        clf.fit(X=X_train, y=y_train)        
-        # save predictions for posthoc analysis and conf matrix
-        y_proba_dict[F] = clf.predict_proba(X=X_test)
-        y_pred_dict[F] = clf.predict(X=X_test)
-        y_true_dict[F] = y_test
 
-    return y_pred_dict, y_proba_dict, y_true_dict, og_sample_indices
+def fit_predict_fold(clf, X_train, y_train, X_test):
+    """
+    Fits classifier on training data of one fold,
+    returns predicted probabilities and labels of
+    the test data
+    """
+    with profile_stage('cv_fit'):
+        clf.fit(X=X_train, y=y_train)
+
+    with profile_stage('cv_predict'):
+        y_proba, y_pred = clf.predict_proba(X=X_test), clf.predict(X=X_test)
+
+    return y_proba, y_pred
 
 
 def multiclass_conf_matrix(
-    y_true, y_pred, labels: list = [],
+    y_true, y_pred, labels: list = [], as_frame: bool = True,
 ):
     """
     Create Confusion-Matrix for multi-class
@@ -129,9 +167,13 @@ def multiclass_conf_matrix(
             or list, or dict with values per fold
         - labels: list with string definitions of
             numerical labels, default: use of numericals
+        - as_frame: return labelled DataFrame (for
+            display), otherwise only the count array
     
     Returns:
-        - conf_matr: confusion matrix as pd.crosstab
+        - conf_matr: confusion matrix, all labels are
+            present as rows (true) and columns (predicted),
+            as DataFrame or as 2d-array (as_frame False)
     """
     # merge cv-folds into single array
     if type(y_true) == dict and type(y_pred) == dict:
@@ -143,26 +185,24 @@ def multiclass_conf_matrix(
         y_true = y_true_all
         y_pred = y_pred_all
 
-    # num_labels = np.unique(y_true)
-    num_labels = [0, 1, 2, 3]
+    # numerical labels correspond to positions of given labels
+    if len(labels) == 0: num_labels = np.arange(4)
+    else: num_labels = np.arange(len(labels))
+
+    # counts per true (rows) and predicted (columns) label
+    cm, _ = retap_metrics.get_conf_matrix_counts(
+        y_true, y_pred, labels=num_labels,
+    )
+
+    if not as_frame: return cm
 
     # if no labels given, use numerical labels
     if len(labels) == 0: labels = num_labels.astype(str)
-    # transform numerical predictions into labels
-    reversefactor = dict(zip(num_labels, labels))
-    y_pred = np.vectorize(reversefactor.get)(y_pred)
-    y_true = np.vectorize(reversefactor.get)(y_true)
-
-    cm = crosstab(
-            y_true, y_pred,
-            rownames=['True Scores'],
-            colnames=['Predicted Scores'])
-    
-    # check and correct if all true labels are present in predicted labels
-    if cm.shape[0] != cm.shape[1]:
-        for i, row_lab in enumerate(cm.index):
-            if row_lab not in cm.keys():
-                cm.insert(i, row_lab, [0] * cm.shape[0])
+    cm = DataFrame(
+        cm,
+        index=Index(labels, name='True Scores'),
+        columns=Index(labels, name='Predicted Scores'),
+    )
 
     return cm
 
@@ -173,21 +213,29 @@ def get_penalties_from_conf_matr(cm):
     predicted labels in confusion matrix
 
     Input:
-        - cm: confusion matrix, can be multiclass
+        - cm: confusion matrix, can be multiclass,
+            as DataFrame or 2d-array
 
     Returns:
         - mean_pen: mean penalty
         - std_pen: std dev penalty
-        - score_penalties: list with all penalties,
-            corresponding to n samples
+        - score_penalties: array with all penalties,
+            corresponding to n samples (empty and nan
+            mean and std if cm contains no samples)
     """
-    score_penalties = []
-    row_col_combis = list(product(range(len(cm)), range(len(cm))))
-    for row, col in row_col_combis:
-        penalty = abs(row - col)
-        score_penalties.extend([penalty] * cm.values[row, col])
-
-    mean_pen = np.mean(score_penalties)
-    std_pen = np.std(score_penalties)
+    counts = np.asarray(cm)
+    if counts.sum() == 0:
+        return np.nan, np.nan, np.array([], dtype=int)
+    n_labels = counts.shape[0]
+    # penalty per cell is the distance between true and predicted label
+    cell_penalties = np.abs(
+        np.arange(n_labels)[:, None] - np.arange(n_labels)[None, :]
+    )
+
+    # weighted by number of samples per cell
+    mean_pen = np.average(cell_penalties, weights=counts)
+    std_pen = np.sqrt(np.average((cell_penalties - mean_pen) ** 2,
+                                 weights=counts))
+    score_penalties = np.repeat(cell_penalties.ravel(), counts.ravel())
     
-    return mean_pen, std_pen, score_penalties
\ No newline at end of file
+    return mean_pen, std_pen, score_penalties
@@ -10,7 +10,7 @@ cmnd line, from repo path (WIN):
 from os.path import join
 import pickle
 from numpy import array, arange
-from pandas import DataFrame, read_csv
+from pandas import DataFrame
 from itertools import compress
 from sklearn.model_selection import StratifiedKFold
 import datetime as dt
@@ -27,23 +27,25 @@ import tap_plotting.retap_plot_clusters as plot_cluster
 from tap_predict import retap_cv_models as cv_models
 from tap_predict import save_load_pred_models as saveload_models
 from tap_predict.perform_holdout import perform_holdout, holdout_reclassification
+from tap_predict.retap_model_registry import get_model_registry
 
 import tap_plotting.plot_pred_results as plot_results
+import tap_predict.retap_pred_settings as pred_settings
 
 
-### SET VARIABLES (load later from json) ###
+### SET VARIABLES (defaults in retap_pred_settings.py) ###
+cfg = pred_settings.DEFAULT_CONFIG
 # define features to use
-FT_CLASS_DATE = '20230228'  # validated features
-MAX_TAPS_PER_TRACE = 15  # should be None, 10, 15
+FT_CLASS_DATE = cfg['FT_CLASS_DATE']
+MAX_TAPS_PER_TRACE = cfg['MAX_TAPS_PER_TRACE']
 # define modeling
 DATASPLIT = 'HOLDOUT'  # should be CROSSVAL or HOLDOUT
-CLF_CHOICE = 'RF'
-CLUSTER_ON_FREQ = False
-N_CLUSTERS_FREQ = 2
-RECLASS_AFTER_RF = None   # RF, LOGREG, SVC or None
-RECLASS_SETTINGS = {'scores': [[1,], [2,]],
-                    'labels': ['1', '2']}
-N_RANDOM_SPLIT = 125  # (v1: 41, after discard of corrupt axes: 125, None: find)
+CLF_CHOICE = cfg['CLF_CHOICE']
+CLUSTER_ON_FREQ = cfg['CLUSTER_ON_FREQ']
+N_CLUSTERS_FREQ = cfg['N_CLUSTERS_FREQ']
+RECLASS_AFTER_RF = cfg['RECLASS_AFTER_RF']
+RECLASS_SETTINGS = pred_settings.RECLASS_SETTINGS
+N_RANDOM_SPLIT = cfg['N_RANDOM_SPLIT']
 
 # USE_MODEL_DATE = '20230321' # changed clustering feats and reclassifying
 USE_MODEL_DATE = '20230328' # test leaving out 4 trace, abs slopes (ITI, entropy)
@@ -57,22 +59,18 @@ TO_PERFORM_PERM = False
 ADD_FIG_PATH = 'v2'  # None saves figs in figures/prediction
 # v2: excl FOURS; v3: EXCL-FOURS and without fewTaps
 
-# std settings and exclusions
-SUBS_EXCL = ['BER028', ]  # too many missing acc-data
-TRACES_EXCL = [
-    'DUS006_M0S0_L_1',  # no score/video
-    'DUS017_M1S0_L_1', 'DUS017_M1S1_L_1',  # corrupt acc-axis
-    # 'BER023_M1S0_R_2',  # tap score 4
-]
+# std settings and exclusions (copied, lists are extended below)
+SUBS_EXCL = list(pred_settings.SUBS_EXCL)
+TRACES_EXCL = list(pred_settings.TRACES_EXCL)
 
-SCORE_FEW_TAPS_3 = True
-CUTOFF_TAPS_3 = 9
+SCORE_FEW_TAPS_3 = cfg['SCORE_FEW_TAPS_3']
+CUTOFF_TAPS_3 = cfg['CUTOFF_TAPS_3']
 
-TO_ZSCORE = True
-TO_NORM = False
-EXCL_4 = True
-TO_MASK_4 = False
-TO_MASK_0 = False
+TO_ZSCORE = cfg['TO_ZSCORE']
+TO_NORM = cfg['TO_NORM']
+EXCL_4 = cfg['EXCL_4']
+TO_MASK_4 = cfg['TO_MASK_4']
+TO_MASK_0 = cfg['TO_MASK_0']
 
 TESTING = False
 
@@ -85,41 +83,9 @@ naming_dict = pred_help.get_model_param_fig_names(
     testDev=TESTING, MASK_0=TO_MASK_0,
 )
 
-CLASS_FEATS = [
-    'trace_RMSn',
-    'trace_entropy',
-    'jerkiness_trace',
-    'coefVar_intraTapInt',
-    'slope_intraTapInt',
-    'mean_tapRMS',
-    'coefVar_tapRMS',
-    'mean_impactRMS',
-    'coefVar_impactRMS',
-    'slope_impactRMS',
-    'mean_raise_velocity',
-    'coefVar_raise_velocity',
-    'coefVar_tap_entropy',
-    'slope_tap_entropy',
-]
-
-CLUSTER_FEATS = [
-    'mean_intraTapInt',
-    # 'coefVar_intraTapInt',
-    # 'freq',
-    'mean_tapRMS',
-    'trace_RMSn',
-]
-
-RECLASS_FEATS = [
-    'coefVar_tapRMS',
-    'coefVar_impactRMS',
-    'coefVar_intraTapInt',
-    'slope_intraTapInt',
-    'mean_raise_velocity',
-    # 'slope_impactRMS',
-    'coefVar_tap_entropy',
-    'slope_tap_entropy'
-]
+CLASS_FEATS = pred_settings.CLASS_FEATS
+CLUSTER_FEATS = pred_settings.CLUSTER_FEATS
+RECLASS_FEATS = pred_settings.RECLASS_FEATS
 
 
 dd = str(dt.date.today().day).zfill(2)
@@ -168,15 +134,14 @@ if DATASPLIT == 'CROSSVAL':
 elif DATASPLIT == 'HOLDOUT':
     datasplit_subs_incl = datasplit_subs['hout']
     datasplit_subs_excl = datasplit_subs['dev']
-    params_path = join(utils_dataManagement.get_local_proj_dir(),
-                       'results', 'models',)
-    if ADD_FIG_PATH: params_path = join(params_path, ADD_FIG_PATH)
-    params_df = read_csv(join(params_path, naming_dict["STD_PARAMS"]),
-                         header=0, index_col=0,)
+    model_registry = get_model_registry()
+    params_df = model_registry.get_std_params(
+        naming_dict["STD_PARAMS"], subfolder=ADD_FIG_PATH,
+    )
     if CLUSTER_ON_FREQ:
-        cluster_params_df = read_csv(
-            join(params_path, naming_dict["CLUSTER_STD_PARAMS"]),
-            header=0, index_col=0,)
+        cluster_params_df = model_registry.get_std_params(
+            naming_dict["CLUSTER_STD_PARAMS"], subfolder=ADD_FIG_PATH,
+        )
 else:
     raise ValueError('DATASPLIT has to be CROSSVAL or HOLDOUT')
 
@@ -293,6 +258,7 @@ if DATASPLIT == 'CROSSVAL':
             cv_method=StratifiedKFold,
             n_folds=nFolds,
             clf=CLF_CHOICE,
+            n_jobs=-1,  # fit folds parallel on all cores
             verbose=False,
         )
 
@@ -335,6 +301,7 @@ if DATASPLIT == 'CROSSVAL':
                 cv_method=StratifiedKFold,
                 n_folds=nFolds,
                 clf=CLF_CHOICE,
+                n_jobs=-1,  # fit folds parallel on all cores
                 verbose=False,
             )
             # add every fold from cluster to general dict
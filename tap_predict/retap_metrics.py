@@ -0,0 +1,308 @@
+"""
+ReTap predictive analysis
+
+Agreement metrics calculated with NumPy in closed
+form: intraclass correlations (all six variants as
+in pingouin.intraclass_corr) via ANOVA sums of squares,
+weighted Cohen's kappa from the confusion matrix, and
+their 95% confidence intervals.
+"""
+
+# import public packages and functions
+import numpy as np
+import pandas as pd
+from scipy.stats import f, norm
+
+
+ICC_TYPES = ['ICC1', 'ICC2', 'ICC3', 'ICC1k', 'ICC2k', 'ICC3k']
+ICC_DESCRIPTIONS = [
+    'Single raters absolute', 'Single random raters',
+    'Single fixed raters', 'Average raters absolute',
+    'Average random raters', 'Average fixed raters',
+]
+
+
+def get_score_matrix(y_true, y_pred):
+    """
+    Returns two-rater score matrix (n_traces x 2 raters)
+    """
+    return np.stack([np.asarray(y_true, dtype=float),
+                     np.asarray(y_pred, dtype=float)], axis=-1)
+
+
+def get_icc_mean_squares(scores):
+    """
+    Two-way ANOVA mean squares of score matrix
+
+    Input:
+        - scores: array (n_targets x k_raters), or with
+            leading batch dimensions (... x n x k)
+
+    Returns:
+        - msb: between targets mean square
+        - msw: within targets mean square
+        - msj: between raters (judges) mean square
+        - mse: residual mean square
+    """
+    scores = np.asarray(scores, dtype=float)
+    n, k = scores.shape[-2:]
+
+    grand_mean = scores.mean(axis=(-2, -1), keepdims=True)
+    ss_total = ((scores - grand_mean) ** 2).sum(axis=(-2, -1))
+    ss_rows = k * ((scores.mean(axis=-1, keepdims=True)
+                    - grand_mean) ** 2).sum(axis=(-2, -1))
+    ss_cols = n * ((scores.mean(axis=-2, keepdims=True)
+                    - grand_mean) ** 2).sum(axis=(-2, -1))
+    ss_error = ss_total - ss_rows - ss_cols
+
+    msb = ss_rows / (n - 1)
+    msw = (ss_cols + ss_error) / (n * (k - 1))
+    msj = ss_cols / (k - 1)
+    mse = ss_error / ((n - 1) * (k - 1))
+
+    return msb, msw, msj, mse
+
+
+def calc_icc(scores, alpha: float = .05):
+    """
+    Calculates the six ICC variants, with F-tests and
+    confidence intervals (Shrout & Fleiss, 1979; McGraw
+    & Wong, 1996), equal to pingouin.intraclass_corr
+
+    Input:
+        - scores: array (n_targets x k_raters)
+        - alpha: for (1 - alpha) confidence intervals
+
+    Returns:
+        - icc_dict: with arrays (in order of ICC_TYPES)
+            for ICC, F, df1, df2, pval, CI_low, CI_high
+    """
+    scores = np.asarray(scores, dtype=float)
+    n, k = scores.shape
+    msb, msw, msj, mse = get_icc_mean_squares(scores)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        icc1 = (msb - msw) / (msb + (k - 1) * msw)
+        icc2 = (msb - mse) / (msb + (k - 1) * mse + k * (msj - mse) / n)
+        icc3 = (msb - mse) / (msb + (k - 1) * mse)
+        icc1k = (msb - msw) / msb
+        icc2k = (msb - mse) / (msb + (msj - mse) / n)
+        icc3k = (msb - mse) / msb
+
+        # F-tests
+        f1k = msb / msw
+        df1, df1kd = n - 1, n * (k - 1)
+        p1k = f.sf(f1k, df1, df1kd)
+        f3k = msb / mse
+        df2kd = (n - 1) * (k - 1)
+        p3k = f.sf(f3k, df1, df2kd)
+
+        # confidence intervals, case 1 and 3
+        f1l = f1k / f.ppf(1 - alpha / 2, df1, df1kd)
+        f1u = f1k * f.ppf(1 - alpha / 2, df1kd, df1)
+        f3l = f3k / f.ppf(1 - alpha / 2, df1, df2kd)
+        f3u = f3k * f.ppf(1 - alpha / 2, df2kd, df1)
+        # case 2
+        fj = msj / mse
+        vn = df2kd * (k * icc2 * fj + n * (1 + (k - 1) * icc2) - k * icc2) ** 2
+        vd = (df1 * k ** 2 * icc2 ** 2 * fj ** 2
+              + (n * (1 + (k - 1) * icc2) - k * icc2) ** 2)
+        v = vn / vd
+        f2u = f.ppf(1 - alpha / 2, n - 1, v)
+        f2l = f.ppf(1 - alpha / 2, v, n - 1)
+        l2 = n * (msb - f2u * mse) / (
+            f2u * (k * msj + (k * n - k - n) * mse) + n * msb)
+        u2 = n * (f2l * msb - mse) / (
+            k * msj + (k * n - k - n) * mse + n * f2l * msb)
+
+        icc_dict = {
+            'ICC': np.array([icc1, icc2, icc3, icc1k, icc2k, icc3k]),
+            'F': np.array([f1k, f3k, f3k, f1k, f3k, f3k]),
+            'df1': np.array([df1] * 6),
+            'df2': np.array([df1kd, df2kd, df2kd, df1kd, df2kd, df2kd]),
+            'pval': np.array([p1k, p3k, p3k, p1k, p3k, p3k]),
+            'CI_low': np.array([
+                (f1l - 1) / (f1l + (k - 1)), l2, (f3l - 1) / (f3l + (k - 1)),
+                1 - 1 / f1l, l2 * k / (1 + l2 * (k - 1)), 1 - 1 / f3l,
+            ]),
+            'CI_high': np.array([
+                (f1u - 1) / (f1u + (k - 1)), u2, (f3u - 1) / (f3u + (k - 1)),
+                1 - 1 / f1u, u2 * k / (1 + u2 * (k - 1)), 1 - 1 / f3u,
+            ]),
+        }
+
+    return icc_dict
+
+
+def get_icc_table(y_true, y_pred, alpha: float = .05):
+    """
+    Returns ICC DataFrame in the layout of pingouin's
+    intraclass_corr (row 5 is ICC3k), for printing and
+    storing results
+    """
+    icc_dict = calc_icc(get_score_matrix(y_true, y_pred), alpha=alpha)
+
+    icc_table = pd.DataFrame({
+        'Type': ICC_TYPES,
+        'Description': ICC_DESCRIPTIONS,
+        'ICC': icc_dict['ICC'],
+        'F': icc_dict['F'],
+        'df1': icc_dict['df1'],
+        'df2': icc_dict['df2'],
+        'pval': icc_dict['pval'],
+        f'CI{int(100 * (1 - alpha))}%': [
+            np.array([l, h]) for l, h in zip(icc_dict['CI_low'],
+                                             icc_dict['CI_high'])
+        ],
+    })
+
+    return icc_table
+
+
+def get_conf_matrix_counts(y_true, y_pred, labels=None):
+    """
+    Confusion matrix of integer labels via bincount
+
+    Input:
+        - y_true, y_pred: label arrays
+        - labels: labels to include (any order), defaults
+            to all labels present in y_true or y_pred. Pairs
+            with a true or predicted label not in labels are
+            not counted (as sklearn's confusion_matrix)
+
+    Returns:
+        - counts: 2d-array (true labels x predicted
+            labels), rows and columns ordered as labels
+        - labels: array of labels
+    """
+    y_true, y_pred = np.asarray(y_true), np.asarray(y_pred)
+    if labels is None:
+        labels = np.union1d(y_true, y_pred)
+    labels = np.asarray(labels)
+    K = len(labels)
+
+    # code labels as their position in labels, via sorted copy
+    order = np.argsort(labels, kind='stable')
+    sorted_labels = labels[order]
+    true_sort = np.clip(np.searchsorted(sorted_labels, y_true), 0, K - 1)
+    pred_sort = np.clip(np.searchsorted(sorted_labels, y_pred), 0, K - 1)
+    # pairs with labels not in labels are dropped
+    sel = ((sorted_labels[true_sort] == y_true)
+           & (sorted_labels[pred_sort] == y_pred))
+    true_idx, pred_idx = order[true_sort], order[pred_sort]
+
+    counts = np.bincount(
+        true_idx[sel] * K + pred_idx[sel], minlength=K * K
+    ).reshape(K, K)
+
+    return counts, labels
+
+
+def get_kappa_weights(K: int, weights=None):
+    """
+    Disagreement weights between label positions
+    (None: unweighted, 'linear', or 'quadratic')
+    """
+    diff = np.abs(np.arange(K)[:, None] - np.arange(K)[None, :])
+
+    if weights is None: return (diff > 0).astype(float)
+    elif weights == 'linear': return diff.astype(float)
+    elif weights == 'quadratic': return diff.astype(float) ** 2
+    else: raise ValueError(f'unknown kappa weights: {weights}')
+
+
+def calc_weighted_kappa(
+    y_true=None, y_pred=None, conf_matrix=None,
+    weights='linear', alpha: float = .05,
+):
+    """
+    Weighted Cohen's kappa from the confusion matrix, equal
+    to sklearn's cohen_kappa_score. The confidence interval
+    is based on the large sample standard error (Fleiss,
+    Cohen & Everitt, 1969).
+
+    Input:
+        - y_true, y_pred: label arrays, or
+        - conf_matrix: confusion matrix (counts)
+        - weights: None, 'linear', or 'quadratic'
+        - alpha: for (1 - alpha) confidence interval
+
+    Returns:
+        - kappa
+        - ci: array with lower and upper bound
+    """
+    if conf_matrix is None:
+        conf_matrix, _ = get_conf_matrix_counts(y_true, y_pred)
+    conf_matrix = np.asarray(conf_matrix, dtype=float)
+    K = conf_matrix.shape[0]
+    n = conf_matrix.sum()
+
+    p = conf_matrix / n
+    p_true, p_pred = p.sum(axis=1), p.sum(axis=0)
+    w_dis = get_kappa_weights(K, weights)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kappa = 1 - (w_dis * p).sum() / (w_dis * np.outer(p_true, p_pred)).sum()
+
+        # standard error on agreement weights (1 at diagonal)
+        w_agr = 1 - w_dis / w_dis.max() if w_dis.max() > 0 else np.ones((K, K))
+        p_exp = (w_agr * np.outer(p_true, p_pred)).sum()
+        w_rows = w_agr @ p_pred  # mean weight per true label
+        w_cols = p_true @ w_agr  # mean weight per predicted label
+        var = (
+            (p * (w_agr - (w_rows[:, None] + w_cols[None, :])
+                  * (1 - kappa)) ** 2).sum()
+            - (kappa - p_exp * (1 - kappa)) ** 2
+        ) / (n * (1 - p_exp) ** 2)
+
+    z = norm.ppf(1 - alpha / 2)
+    ci = np.array([kappa - z * np.sqrt(var), kappa + z * np.sqrt(var)])
+
+    return kappa, ci
+
+
+def get_pingouin_icc(y_true, y_pred):
+    """
+    Reference ICC table from pingouin, used for validation
+    """
+    from pingouin import intraclass_corr
+
+    n = len(y_true)
+    long_data = pd.DataFrame({
+        'IDs': np.tile(np.arange(n), 2),
+        'Judges': ['clin'] * n + ['model'] * n,
+        'Scores': np.concatenate([y_true, y_pred]).astype(float),
+    })
+    ref_icc = intraclass_corr(data=long_data, targets='IDs',
+                              raters='Judges', ratings='Scores')
+
+    return ref_icc
+
+
+def validate_metrics(y_true, y_pred):
+    """
+    Compares ICCs with pingouin and kappa with sklearn,
+    raises AssertionError on differences
+    """
+    from sklearn.metrics import cohen_kappa_score
+
+    ref_icc = get_pingouin_icc(y_true, y_pred)
+    icc_table = get_icc_table(y_true, y_pred)
+
+    for col in ['ICC', 'F', 'pval']:
+        assert np.allclose(icc_table[col], ref_icc[col], equal_nan=True), (
+            f'{col} differs from pingouin'
+        )
+    assert np.allclose(np.stack(icc_table['CI95%']),
+                       np.stack(ref_icc['CI95%']), atol=.01), (
+        'CI95% differs from pingouin'
+    )
+    for weights in [None, 'linear', 'quadratic']:
+        kappa, _ = calc_weighted_kappa(y_true, y_pred, weights=weights)
+        assert np.isclose(
+            kappa, cohen_kappa_score(y_true, y_pred, weights=weights)
+        ), f'kappa ({weights}) differs from sklearn'
+
+    print('metrics equal to pingouin/sklearn')
+
+    return True
@@ -0,0 +1,238 @@
+"""
+Registry of saved prediction models and their
+standardisation parameters, for HOLD OUT VALIDATION.
+
+Saved model-files (.P) and STD-param files (.csv) are
+indexed by their config (date, classifier, clustering,
+mask0, max taps, reclassification). Loaded estimators
+are kept in memory (least recently used are dropped),
+repeated holdout evaluations do not load the same
+models again. Large RF models can be memory-mapped.
+"""
+
+# import public packages
+import os
+from os.path import join, exists
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+from joblib import load
+from pandas import read_csv
+
+from retap_utils.utils_dataManagement import get_local_proj_dir
+
+
+def parse_model_fname(fname: str):
+    """
+    Parses filename of saved model or STD-params, e.g.
+    20230301_RF_UNCLUSTERED_mask0_15taps.P,
+    20230301_RF_CLUSTERED_FAST_alltaps.P,
+    20230301_RF_UNCLUSTERED_15taps_reclassLOGREG1.P,
+    20230301_STD_params_cluster_15taps.csv
+
+    Returns:
+        - record (dict): with fname, kind ('model',
+            'std_params', 'std_params_cluster'), date, clf,
+            cluster ('UNCLUSTERED', 'FAST', 'SLOW'), mask0,
+            max_taps (None for all taps), reclass_clf,
+            reclass_label. None if not present in fname
+    """
+    stem, ext = os.path.splitext(fname)
+    parts = stem.split('_')
+
+    record = {
+        'fname': fname, 'kind': None, 'date': parts[0], 'clf': None,
+        'cluster': None, 'mask0': '_mask0' in stem, 'max_taps': None,
+        'reclass_clf': None, 'reclass_label': None,
+    }
+
+    if ext == '.csv' and '_STD_params' in stem:
+        if '_STD_params_cluster' in stem: record['kind'] = 'std_params_cluster'
+        else: record['kind'] = 'std_params'
+
+    elif ext == '.P' and len(parts) > 2:
+        record['kind'] = 'model'
+        record['clf'] = parts[1]
+        if parts[2] == 'CLUSTERED': record['cluster'] = parts[3]
+        else: record['cluster'] = parts[2]
+
+        reclass_match = re.search(r'_reclass(RF|LOGREG|SVC)(.*)$', stem)
+        if reclass_match:
+            record['reclass_clf'] = reclass_match.group(1)
+            record['reclass_label'] = reclass_match.group(2)
+
+    taps_match = re.search(r'_(\d+|all)taps', stem)
+    if taps_match and taps_match.group(1) != 'all':
+        record['max_taps'] = int(taps_match.group(1))
+
+    return record
+
+
+@dataclass(init=True, repr=True,)
+class modelRegistry:
+    """
+    Index of saved models and STD-params in model_path
+    and its direct subfolders (e.g. ADD_FIG_PATH).
+
+    Input:
+        - model_path: defaults to results/models in
+            local project folder
+        - max_loaded: number of estimators kept in memory
+        - mmap_mode: default joblib mmap_mode (e.g. 'r') to
+            load the arrays of large models memory-mapped,
+            can be overruled per get_model() call
+        - verbose: print loading of models
+    """
+    model_path: Any = None
+    max_loaded: int = 4
+    mmap_mode: Any = None
+    verbose: bool = False
+    records: list = field(default_factory=list)
+
+    def __post_init__(self,):
+
+        if not self.model_path:
+            self.model_path = join(get_local_proj_dir(), 'results', 'models')
+
+        self.loaded = OrderedDict()  # least recently used first
+        self.std_params = {}
+        self.n_loads, self.n_hits = 0, 0
+
+        self.scan()
+
+    def scan(self,):
+        """
+        Indexes all models and STD-params, can be called
+        again after new models are saved
+        """
+        self.records = []
+        if not exists(self.model_path): return
+
+        folders = [None] + [
+            d for d in sorted(os.listdir(self.model_path))
+            if os.path.isdir(join(self.model_path, d))
+        ]
+        for subfolder in folders:
+            folder = self.model_path
+            if subfolder: folder = join(folder, subfolder)
+
+            for fname in sorted(os.listdir(folder)):
+                record = parse_model_fname(fname)
+                if not record['kind']: continue
+                record['subfolder'] = subfolder
+                record['path'] = join(folder, fname)
+                self.records.append(record)
+
+    def find(self, **criteria):
+        """
+        Returns records matching all criteria, e.g.
+        find(kind='model', clf='RF', max_taps=15)
+        """
+        return [
+            r for r in self.records
+            if all([r[key] == value for key, value in criteria.items()])
+        ]
+
+    def get_config(
+        self, date, clf, max_taps, cluster='UNCLUSTERED',
+        mask0=False, subfolder=None,
+    ):
+        """
+        Returns dict with records of model(s), STD-params,
+        and reclassification models of one config
+        """
+        crit = {'date': date, 'max_taps': max_taps,
+                'mask0': mask0, 'subfolder': subfolder}
+        config = {
+            'models': self.find(kind='model', clf=clf, cluster=cluster,
+                                reclass_clf=None, **crit),
+            'reclass_models': self.find(kind='model', clf=clf,
+                                        cluster=cluster, **crit),
+            'std_params': self.find(kind='std_params', **crit),
+        }
+        config['reclass_models'] = [r for r in config['reclass_models']
+                                    if r['reclass_clf']]
+        if cluster != 'UNCLUSTERED':
+            config['std_params_cluster'] = self.find(
+                kind='std_params_cluster', **crit
+            )
+
+        return config
+
+    def get_path(self, fname, subfolder=None):
+
+        path = self.model_path
+        if subfolder: path = join(path, subfolder)
+        path = join(path, fname)
+
+        if not exists(path):
+            raise FileNotFoundError(f'{fname} not found in registry ({path})')
+
+        return path
+
+    def get_model(self, fname, subfolder=None, mmap_mode='default'):
+        """
+        Returns fitted estimator, loaded only once per
+        file-version (changed files are loaded again) and
+        mmap_mode ('default' uses the registry's mmap_mode)
+        """
+        if mmap_mode == 'default': mmap_mode = self.mmap_mode
+        path = self.get_path(fname, subfolder)
+        key = (path, os.path.getmtime(path), mmap_mode)
+
+        if key in self.loaded:
+            self.loaded.move_to_end(key)
+            self.n_hits += 1
+            return self.loaded[key]
+
+        if self.verbose: print(f'\tloading model {path}')
+        clf = load(path, mmap_mode=mmap_mode)
+        self.n_loads += 1
+
+        self.loaded[key] = clf
+        # remove least recently used estimators
+        while len(self.loaded) > self.max_loaded:
+            self.loaded.popitem(last=False)
+
+        return clf
+
+    def get_std_params(self, fname, subfolder=None):
+        """
+        Returns DataFrame with mean and std per feature
+        """
+        path = self.get_path(fname, subfolder)
+        key = (path, os.path.getmtime(path))
+
+        if key not in self.std_params:
+            self.std_params[key] = read_csv(path, header=0, index_col=0,)
+
+        return self.std_params[key]
+
+    def cache_info(self,):
+
+        return {'n_loads': self.n_loads, 'n_hits': self.n_hits,
+                'n_in_memory': len(self.loaded),
+                'max_loaded': self.max_loaded}
+
+
+# registries are kept per model path during the python session
+REGISTRIES = {}
+
+
+def get_model_registry(model_path=None, **kwargs):
+    """
+    Returns the registry of model_path, created once
+    per session, kwargs see modelRegistry (only used when
+    the registry is created, give mmap_mode per model
+    in get_model())
+    """
+    if not model_path:
+        model_path = join(get_local_proj_dir(), 'results', 'models')
+
+    if model_path not in REGISTRIES:
+        REGISTRIES[model_path] = modelRegistry(model_path=model_path,
+                                               **kwargs)
+
+    return REGISTRIES[model_path]
@@ -0,0 +1,236 @@
+"""
+ReTap predictive analysis
+
+Permutation testing of prediction performance.
+All permuted label vectors are generated as one
+matrix (n_permutations x n_traces), ICC(3,k), linear
+weighted Cohen's kappa, and mean absolute penalty
+are calculated in closed form for all permutations
+at once. Large permutation sets are calculated in
+chunks, optionally in parallel.
+"""
+
+# import public packages and functions
+import numpy as np
+from joblib import Parallel, delayed
+
+from tap_predict.retap_metrics import get_icc_mean_squares
+
+
+def get_random_label_matrix(
+    y_true, r_states, max_score: int = 3,
+    keep_distribution: bool = False,
+):
+    """
+    Creates permuted labels, one row per random state
+
+    Input:
+        - y_true: true scores
+        - r_states: random states, one per permutation
+        - max_score: highest possible score, random labels
+            are drawn from 0 - max_score
+        - keep_distribution: if True, y_true is shuffled
+            (same score distribution), otherwise scores are
+            randomly drawn (chance without distribution)
+
+    Returns:
+        - y_random: 2d-array (n_permutations x n_traces)
+    """
+    y_true = np.asarray(y_true)
+    y_random = np.zeros((len(r_states), len(y_true)), dtype=int)
+
+    for i_perm, r_seed in enumerate(r_states):
+        rng = np.random.RandomState(r_seed)
+        if keep_distribution:
+            y_random[i_perm] = rng.permutation(y_true)
+        else:
+            y_random[i_perm] = rng.randint(0, max_score + 1, size=len(y_true))
+
+    return y_random
+
+
+def batch_mean_penalty(y_true, y_perm):
+    """
+    Mean absolute prediction error per permutation
+    """
+    return np.abs(y_perm - np.asarray(y_true)[None, :]).mean(axis=1)
+
+
+def batch_icc3k(y_true, y_perm):
+    """
+    ICC(3,k) (two-way mixed, consistency, average of k raters)
+    for two raters, calculated via ANOVA sums of squares for
+    every permutation (row of y_perm)
+
+    Returns:
+        - icc: 1d-array, one ICC(3,k) per permutation
+    """
+    y_perm = np.asarray(y_perm, dtype=float)
+
+    # scores per permutation, shape: n_perm x n_traces x k_raters
+    scores = np.stack([
+        np.broadcast_to(np.asarray(y_true, dtype=float), y_perm.shape),
+        y_perm
+    ], axis=2)
+    msb, _, _, mse = get_icc_mean_squares(scores)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        icc = (msb - mse) / msb
+
+    return icc
+
+
+def batch_linear_kappa(y_true, y_perm):
+    """
+    Linear weighted Cohen's kappa for every permutation,
+    calculated from confusion matrices. Equal to sklearn's
+    cohen_kappa_score(weights='linear'): weights are based
+    on the positions of the labels present per permutation.
+
+    Returns:
+        - kappa: 1d-array, one kappa per permutation
+    """
+    y_true = np.asarray(y_true)
+    y_perm = np.asarray(y_perm)
+    n_perm, n = y_perm.shape
+
+    # code all labels as 0 - (K - 1)
+    labels, coded = np.unique(
+        np.concatenate([y_true, y_perm.ravel()]), return_inverse=True
+    )
+    K = len(labels)
+    coded_true = coded[:n]
+    coded_perm = coded[n:].reshape(n_perm, n)
+
+    # confusion matrix per permutation (n_perm x K x K)
+    flat_idx = (
+        np.arange(n_perm)[:, None] * K * K
+        + coded_true[None, :] * K + coded_perm
+    )
+    conf = np.bincount(
+        flat_idx.ravel(), minlength=n_perm * K * K
+    ).reshape(n_perm, K, K).astype(float)
+
+    # label positions, only counting labels present per permutation
+    present = (conf.sum(axis=2) + conf.sum(axis=1)) > 0
+    positions = np.cumsum(present, axis=1) - 1
+    weights = np.abs(positions[:, :, None] - positions[:, None, :])
+
+    expected = (
+        conf.sum(axis=2)[:, :, None] * conf.sum(axis=1)[:, None, :] / n
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kappa = 1 - ((weights * conf).sum(axis=(1, 2))
+                     / (weights * expected).sum(axis=(1, 2)))
+
+    return kappa
+
+
+def calc_permutation_chunk(
+    y_true, r_states, max_score=3, keep_distribution=False,
+):
+    """
+    Generates labels and calculates metrics for one
+    chunk of random states
+
+    Returns:
+        - penalties, iccs, kappas: arrays per permutation
+    """
+    y_perm = get_random_label_matrix(
+        y_true, r_states, max_score=max_score,
+        keep_distribution=keep_distribution,
+    )
+    penalties = batch_mean_penalty(y_true, y_perm)
+    iccs = batch_icc3k(y_true, y_perm)
+    kappas = batch_linear_kappa(y_true, y_perm)
+
+    return penalties, iccs, kappas
+
+
+def run_permutations(
+    y_true, n_permutations: int = 1000, max_score: int = 3,
+    keep_distribution: bool = False, r_states=None,
+    chunk_size: int = 500, n_jobs: int = 1,
+):
+    """
+    Calculates chance-level metrics for n_permutations
+
+    Input:
+        - y_true: true scores
+        - n_permutations: number of permutations
+        - max_score: highest score for random labels
+        - keep_distribution: shuffle y_true (True) or
+            draw random scores (False)
+        - r_states: random states, defaults to the
+            states used in perform_permutations()
+        - chunk_size: number of permutations calculated
+            at once, limits memory usage for large n
+        - n_jobs: number of chunks calculated in parallel
+
+    Returns:
+        - penalties, iccs, kappas: arrays per permutation
+    """
+    y_true = np.asarray(y_true)
+    if r_states is None:
+        r_states = np.linspace(0, n_permutations * 3,
+                               n_permutations).astype(int)
+
+    chunks = [r_states[i:i + chunk_size]
+              for i in np.arange(0, len(r_states), chunk_size)]
+
+    if n_jobs == 1:
+        results = [
+            calc_permutation_chunk(y_true, chunk, max_score, keep_distribution)
+            for chunk in chunks
+        ]
+    else:
+        results = Parallel(n_jobs=n_jobs)(
+            delayed(calc_permutation_chunk)(
+                y_true, chunk, max_score, keep_distribution
+            ) for chunk in chunks
+        )
+
+    penalties = np.concatenate([r[0] for r in results])
+    iccs = np.concatenate([r[1] for r in results])
+    kappas = np.concatenate([r[2] for r in results])
+
+    return penalties, iccs, kappas
+
+
+def validate_permutation_metrics(
+    y_true, n_permutations: int = 25, keep_distribution: bool = False,
+):
+    """
+    Compares vectorized metrics with pingouin (ICC) and
+    sklearn (kappa) for a number of permutations, raises
+    AssertionError on differences
+    """
+    from sklearn.metrics import cohen_kappa_score
+    from tap_predict.retap_metrics import get_pingouin_icc
+
+    r_states = np.linspace(0, n_permutations * 3, n_permutations).astype(int)
+    y_perm = get_random_label_matrix(
+        y_true, r_states, keep_distribution=keep_distribution,
+    )
+    penalties, iccs, kappas = calc_permutation_chunk(
+        y_true, r_states, keep_distribution=keep_distribution,
+    )
+
+    for i_perm, y_random in enumerate(y_perm):
+        ref_icc = get_pingouin_icc(y_true, y_random).iloc[5]['ICC']
+        ref_kappa = cohen_kappa_score(y_true, y_random, weights='linear')
+        ref_pen = np.mean(abs(np.asarray(y_true) - y_random))
+
+        assert np.isclose(iccs[i_perm], ref_icc, equal_nan=True), (
+            f'ICC differs in permutation {i_perm}: {iccs[i_perm]} vs {ref_icc}'
+        )
+        assert np.isclose(kappas[i_perm], ref_kappa, equal_nan=True), (
+            f'kappa differs in permutation {i_perm}: {kappas[i_perm]} vs {ref_kappa}'
+        )
+        assert np.isclose(penalties[i_perm], ref_pen), (
+            f'penalty differs in permutation {i_perm}'
+        )
+
+    print(f'vectorized metrics equal to pingouin/sklearn (n={n_permutations})')
+
+    return True
@@ -0,0 +1,74 @@
+"""
+ReTap prediction settings
+
+Default prediction variables, exclusions and feature
+selections, shared by retap_main_prediction_script.py
+and retap_config_sweep.py. Change settings here, not in
+the scripts.
+"""
+
+# default prediction variables (varied in config sweep grids)
+DEFAULT_CONFIG = {
+    'FT_CLASS_DATE': '20230228',  # validated features
+    'MAX_TAPS_PER_TRACE': 15,  # should be None, 10, 15
+    'CLF_CHOICE': 'RF',
+    'N_FOLDS': 6,
+    'CLUSTER_ON_FREQ': False,
+    'N_CLUSTERS_FREQ': 2,
+    'RECLASS_AFTER_RF': None,  # RF, LOGREG, SVC or None
+    'N_RANDOM_SPLIT': 125,  # (v1: 41, after discard of corrupt axes: 125, None: find)
+    'SCORE_FEW_TAPS_3': True,
+    'CUTOFF_TAPS_3': 9,
+    'TO_ZSCORE': True,
+    'TO_NORM': False,
+    'EXCL_4': True,
+    'TO_MASK_4': False,
+    'TO_MASK_0': False,
+}
+
+# std settings and exclusions (copy lists before extending them)
+SUBS_EXCL = ['BER028', ]  # too many missing acc-data
+TRACES_EXCL = [
+    'DUS006_M0S0_L_1',  # no score/video
+    'DUS017_M1S0_L_1', 'DUS017_M1S1_L_1',  # corrupt acc-axis
+    # 'BER023_M1S0_R_2',  # tap score 4
+]
+
+RECLASS_SETTINGS = {'scores': [[1,], [2,]],
+                    'labels': ['1', '2']}
+
+CLASS_FEATS = [
+    'trace_RMSn',
+    'trace_entropy',
+    'jerkiness_trace',
+    'coefVar_intraTapInt',
+    'slope_intraTapInt',
+    'mean_tapRMS',
+    'coefVar_tapRMS',
+    'mean_impactRMS',
+    'coefVar_impactRMS',
+    'slope_impactRMS',
+    'mean_raise_velocity',
+    'coefVar_raise_velocity',
+    'coefVar_tap_entropy',
+    'slope_tap_entropy',
+]
+
+CLUSTER_FEATS = [
+    'mean_intraTapInt',
+    # 'coefVar_intraTapInt',
+    # 'freq',
+    'mean_tapRMS',
+    'trace_RMSn',
+]
+
+RECLASS_FEATS = [
+    'coefVar_tapRMS',
+    'coefVar_impactRMS',
+    'coefVar_intraTapInt',
+    'slope_intraTapInt',
+    'mean_raise_velocity',
+    # 'slope_impactRMS',
+    'coefVar_tap_entropy',
+    'slope_tap_entropy'
+]
@@ -0,0 +1,387 @@
+"""
+ReTap Scoring Service
+
+Scores new tapping recordings with a saved prediction
+model. The model and STD-params are loaded once and kept
+in memory. Raw tri-axial acc-arrays (or Poly5 recordings,
+cut into 10-sec blocks) are run through tap detection,
+feature extraction, standardisation and prediction in
+batches, returning UPDRS tap-scores and latencies.
+
+Usable as python API (tapScorer), as local HTTP-server,
+or from command line, from repo path (WIN):
+    python -m tap_predict.retap_scoring_service Cfg_scoring_service.json
+    python -m tap_predict.retap_scoring_service Cfg_scoring_service.json trace1.csv rec.Poly5
+
+HTTP (POST, json body):
+    /score: {"acc": [3 x n_samples] or list of those,
+             "fs": 250, "already_preprocd": false}
+    /score_poly5: {"filepath": "...", "side": "left"}
+GET /health returns loaded model and latency metrics.
+"""
+
+# Importing public packages
+import sys
+import os
+import json
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any
+import numpy as np
+
+# own functions
+import tapping_run as tap_finder
+from tap_extract_fts import tapping_extract_features as ftExtr
+from tap_load_data import tapping_preprocess as preproc
+from tap_load_data import tapping_find_blocks as find_blocks
+from retap_utils import utils_dataManagement, utils_preprocessing
+import tap_predict.tap_pred_prepare as pred_prep
+from tap_predict.retap_model_registry import get_model_registry
+
+
+def extract_trace_features(
+    acc_arr, fs, feats, goal_fs=250, already_preprocd=False,
+    max_n_taps_incl=0,
+):
+    """
+    Runs tap detection and feature extraction for one
+    trace, defined on module level to be picklable for
+    multiprocessing
+
+    Returns:
+        - ft_values: list with feature values (in order of
+            feats), NaN for not extracted features
+        - n_taps: number of detected taps
+        - raise_velo_sum: sum of raise velocities (used for
+            classification of traces with few taps)
+    """
+    tap_idx, impact_idx, acc_arr, fs = tap_finder.run_updrs_tap_finder(
+        acc_arr=np.asarray(acc_arr, dtype=float),
+        fs=fs,
+        goal_fs=goal_fs,
+        already_preprocd=already_preprocd,
+    )
+    fts = ftExtr.tapFeatures(
+        triax_arr=acc_arr,
+        fs=fs,
+        impacts=impact_idx,
+        tap_lists=tap_idx,
+        updrsSubScore=np.nan,  # unknown for new recordings
+        max_n_taps_incl=max_n_taps_incl,
+    )
+    ft_values = [getattr(fts, ft, np.nan) for ft in feats]
+    raise_velo_sum = np.sum(getattr(fts, 'raise_velocity', []))
+
+    return ft_values, len(impact_idx), raise_velo_sum
+
+
+@dataclass(init=True, repr=True,)
+class tapScorer:
+    """
+    Keeps model and STD-params in memory, and scores
+    batches of tapping traces.
+
+    Input:
+        - model_name: filename of saved model
+        - std_params_name: filename of STD-params csv,
+            its index defines the features (and order)
+        - subfolder: subfolder in model path (ADD_FIG_PATH)
+        - model_path: defaults to results/models
+        - max_n_taps_incl: as used for the model features
+        - score_few_taps_3: traces with less than
+            cutoff_taps_3 taps are scored 3 (as in
+            retap_main_prediction_script.py)
+        - goal_fs: sample freq used for extraction
+        - n_jobs: number of processes for extraction of
+            traces in one batch
+        - mmap_mode: joblib mmap_mode for model loading
+    """
+    model_name: str
+    std_params_name: str
+    subfolder: Any = None
+    model_path: Any = None
+    max_n_taps_incl: int = 15
+    score_few_taps_3: bool = True
+    cutoff_taps_3: int = 9
+    goal_fs: int = 250
+    n_jobs: int = 1
+    mmap_mode: Any = None
+    metrics: dict = field(default_factory=dict)
+
+    def __post_init__(self,):
+
+        t_start = perf_counter()
+        registry = get_model_registry(self.model_path)
+        self.clf = registry.get_model(self.model_name,
+                                      subfolder=self.subfolder,
+                                      mmap_mode=self.mmap_mode)
+        std_params_df = registry.get_std_params(self.std_params_name,
+                                                subfolder=self.subfolder)
+        self.feats = list(std_params_df.index)
+        self.std_params = std_params_df.values
+
+        self.metrics = {
+            'load_time_s': perf_counter() - t_start,
+            'n_batches': 0, 'n_traces': 0,
+            'total_latency_s': 0., 'max_latency_s': 0.,
+        }
+        if self.n_jobs == -1: self.n_jobs = os.cpu_count()
+
+        print(f'scoring service ready: {self.model_name}, '
+              f'{len(self.feats)} features')
+
+    def score_arrays(
+        self, acc_arrays: list, fs: int, already_preprocd: bool = False,
+        trace_ids=None,
+    ):
+        """
+        Scores a batch of traces
+
+        Input:
+            - acc_arrays: list of tri-axial acc-arrays
+                (3 x n_samples, or n_samples x 3)
+            - fs: sample freq of arrays
+            - already_preprocd: False for raw acc-data,
+                preprocessing and resampling are performed
+            - trace_ids: optional names for traces
+
+        Returns:
+            - results: dict with list of scores, trace-ids,
+                n_taps, probabilities, and latencies
+        """
+        t_start = perf_counter()
+        if trace_ids is None: trace_ids = [f'trace{i}' for i in range(len(acc_arrays))]
+
+        if len(acc_arrays) == 0:  # e.g. recording without tapping blocks
+            return {
+                'trace_ids': [], 'scores': [], 'n_taps': [], 'probas': [],
+                'latency_ms': {'extraction': 0., 'prediction': 0.,
+                               'total': 0., 'per_trace': 0.},
+            }
+
+        extr_args = [
+            (acc, fs, self.feats, self.goal_fs, already_preprocd,
+             self.max_n_taps_incl) for acc in acc_arrays
+        ]
+        if self.n_jobs == 1 or len(acc_arrays) == 1:
+            extracted = [extract_trace_features(*args) for args in extr_args]
+        else:
+            with ProcessPoolExecutor(max_workers=self.n_jobs) as executor:
+                extracted = list(executor.map(extract_trace_features,
+                                              *zip(*extr_args)))
+        t_extract = perf_counter()
+
+        # standardise with the STD-params of the model's training data
+        ft_matrix = pred_prep.featureMatrix(
+            X=np.array([e[0] for e in extracted], dtype=float).reshape(
+                len(extracted), len(self.feats)
+            ),
+            y=np.full(len(extracted), np.nan),
+            ids=np.array(trace_ids),
+            feats=self.feats,
+        )
+        X, _, _, _ = pred_prep.build_X_y(
+            ft_matrix, to_zscore=True, std_params=self.std_params,
+            verbose=False,
+        )
+        scores = self.clf.predict(X).astype(float)
+        if hasattr(self.clf, 'predict_proba'):
+            probas = self.clf.predict_proba(X).round(3).tolist()
+        else:
+            probas = [None] * len(scores)
+
+        n_taps = [e[1] for e in extracted]
+        if self.score_few_taps_3:
+            # traces with few taps, but large amplitudes are not scored 3
+            few_taps = [
+                n < self.cutoff_taps_3 and velo_sum <= 100
+                for _, n, velo_sum in extracted
+            ]
+            scores[few_taps] = 3
+        t_end = perf_counter()
+
+        latency = t_end - t_start
+        self.metrics['n_batches'] += 1
+        self.metrics['n_traces'] += len(acc_arrays)
+        self.metrics['total_latency_s'] += latency
+        self.metrics['max_latency_s'] = max(self.metrics['max_latency_s'],
+                                            latency)
+
+        return {
+            'trace_ids': list(trace_ids),
+            'scores': scores.tolist(),
+            'n_taps': n_taps,
+            'probas': probas,
+            'latency_ms': {
+                'extraction': round((t_extract - t_start) * 1e3, 2),
+                'prediction': round((t_end - t_extract) * 1e3, 2),
+                'total': round(latency * 1e3, 2),
+                'per_trace': round(latency * 1e3 / max(len(acc_arrays), 1), 2),
+            },
+        }
+
+    def score_poly5(self, filepath: str, side: str = 'left'):
+        """
+        Scores all 10-sec tapping blocks of one side
+        in an uncut Poly5 recording
+
+        Input:
+            - filepath: Poly5 file
+            - side: 'left' or 'right'
+        """
+        # imported here, Poly5 reader requires mne
+        from retap_utils import tmsi_poly5reader
+
+        raw = tmsi_poly5reader.Poly5Reader(filepath)
+        key_ind_dict, _ = utils_dataManagement.get_arr_key_indices(
+            raw.ch_names, 'bilat'
+        )
+        acc_arr = getattr(utils_dataManagement.triAxial(
+            data=raw.samples, key_indices=key_ind_dict,
+        ), side)
+        # preprocessing as in run_finding_10sec_blocks.py
+        if raw.sample_rate > self.goal_fs:
+            acc_arr = utils_preprocessing.resample(
+                acc_arr, Fs_orig=raw.sample_rate, Fs_new=self.goal_fs,
+            )
+        acc_arr, _ = preproc.run_preproc_acc(
+            dat_arr=acc_arr, fs=self.goal_fs, to_detrend=True,
+            to_check_magnOrder=True, to_check_polarity=True,
+            to_remove_outlier=True,
+        )
+        acc_blocks, _ = find_blocks.find_active_blocks(
+            acc_arr=acc_arr, fs=self.goal_fs,
+            verbose=False, to_plot=False,
+        )
+        fname = os.path.basename(filepath)
+
+        return self.score_arrays(
+            acc_blocks, fs=self.goal_fs, already_preprocd=True,
+            trace_ids=[f'{fname}_{side[0].upper()}_block{i + 1}'
+                       for i in range(len(acc_blocks))],
+        )
+
+    def score_files(self, filepaths: list):
+        """
+        Scores csv-files (one trace per file, sample freq
+        in filename, as block csv's) and Poly5 files
+        """
+        results = []
+        for f in filepaths:
+            if f.lower().endswith('.poly5'):
+                for side in ['left', 'right']:
+                    results.append(self.score_poly5(f, side=side))
+            else:
+                fs = int(f.split('_')[-1].lower().split('hz')[0])
+                results.append(self.score_arrays(
+                    [utils_dataManagement.load_acc_csv(f)], fs=fs,
+                    already_preprocd=True,
+                    trace_ids=[os.path.basename(f)],
+                ))
+
+        return results
+
+    def get_health(self,):
+
+        health = {'model': self.model_name, 'feats': self.feats}
+        health.update(self.metrics)
+        if self.metrics['n_batches'] > 0:
+            health['mean_latency_s'] = (self.metrics['total_latency_s']
+                                        / self.metrics['n_batches'])
+
+        return health
+
+
+def get_request_handler(scorer: tapScorer):
+    """
+    Creates http request handler using the loaded scorer
+    """
+    class scoringRequestHandler(BaseHTTPRequestHandler):
+
+        def send_json(self, content, status=200):
+            body = json.dumps(content).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self,):
+            if self.path == '/health': self.send_json(scorer.get_health())
+            else: self.send_json({'error': f'unknown path {self.path}'}, 404)
+
+        def do_POST(self,):
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(length))
+                if not isinstance(request, dict):
+                    raise ValueError('request body should be a JSON object')
+
+                if self.path == '/score':
+                    acc = np.asarray(request['acc'], dtype=float)
+                    # single trace given as 2d array
+                    acc_arrays = [acc] if acc.ndim == 2 else list(acc)
+                    result = scorer.score_arrays(
+                        acc_arrays, fs=int(request['fs']),
+                        already_preprocd=request.get('already_preprocd', False),
+                        trace_ids=request.get('trace_ids', None),
+                    )
+                elif self.path == '/score_poly5':
+                    result = scorer.score_poly5(
+                        request['filepath'], side=request.get('side', 'left'),
+                    )
+                else:
+                    return self.send_json(
+                        {'error': f'unknown path {self.path}'}, 404
+                    )
+                self.send_json(result)
+
+            except (KeyError, ValueError, FileNotFoundError) as e:
+                self.send_json({'error': repr(e)}, 400)
+
+            except Exception as e:  # always answer, also on unexpected errors
+                self.send_json({'error': repr(e)}, 500)
+
+    return scoringRequestHandler
+
+
+def run_server(scorer: tapScorer, host: str = '127.0.0.1', port: int = 8765):
+    """
+    Starts local HTTP-server, runs until interrupted
+    """
+    server = HTTPServer((host, port), get_request_handler(scorer))
+    print(f'scoring service running on http://{host}:{port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print('scoring service stopped')
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+
+    # check for given Cfg-file
+    if len(sys.argv) >= 2: json_filename = sys.argv[1]
+    else: json_filename = 'Cfg_scoring_service.json'
+
+    with open(json_filename, 'r') as json_data:
+        cfg = json.load(json_data)
+
+    scorer = tapScorer(
+        model_name=cfg['model_name'],
+        std_params_name=cfg['std_params_name'],
+        subfolder=cfg.get('subfolder', None),
+        max_n_taps_incl=cfg.get('max_n_taps_incl', 15),
+        n_jobs=cfg.get('n_jobs', 1),
+    )
+
+    # score given files, otherwise start server
+    if len(sys.argv) > 2:
+        for result in scorer.score_files(sys.argv[2:]):
+            print(json.dumps(result))
+    else:
+        run_server(scorer, host=cfg.get('host', '127.0.0.1'),
+                   port=cfg.get('port', 8765))
@@ -1,6 +1,10 @@
 """
 Save and Load Cross-Validation prediction models
 for HOLD OUT VALIDATION.
+
+Random forests can additionally be exported as flat
+node arrays (compact forest, .npz), which load and
+predict faster than the joblib model.
 """
 
 # import public packages
@@ -23,6 +27,7 @@ def save_model_in_cv(
     path=None, random_state=27,
     to_plot_ft_importances=False,
     ft_names=None, ADD_FIG_PATH=None,
+    to_export_compact=False,
 ):
     if not path: path = join(get_local_proj_dir(), 'results', 'models')
     # create path if not existing
@@ -62,11 +67,190 @@ def save_model_in_cv(
                                 model_name=model_fname[:-2],
                                 ADD_FIG_PATH=ADD_FIG_PATH)
 
-    # save the model as pickle
+    # save the model as pickle (uncompressed, allows mmap loading)
     dump(CLF, join(path, model_fname))
 
-    check_load = load(join(path, model_fname))
+    print(f'model succesfully saved as {join(path, model_fname)}')
+
+    # flat node arrays for fast loading and prediction
+    if to_export_compact and clf.upper() == 'RF':
+        export_compact_forest(
+            CLF, fpath=join(path, model_fname[:-2] + '_compact.npz')
+        )
+
+
+
+def export_compact_forest(clf, fpath=None):
+    """
+    Converts a fitted RandomForestClassifier into flat
+    NumPy node arrays of all trees, for fast loading and
+    vectorized prediction (see compact_forest_predict_proba)
+
+    Input:
+        - clf: fitted RandomForestClassifier
+        - fpath: optional path to save arrays as .npz
+
+    Returns:
+        - forest: dict with node arrays (feature, threshold,
+            children_left, children_right, leaf_index,
+            missing_left),
+            leaf_values (class distribution per leaf),
+            roots (first node per tree), and classes
+    """
+    trees = [est.tree_ for est in clf.estimators_]
+    roots = np.cumsum([0] + [t.node_count for t in trees[:-1]])
+
+    # child indices refer to the nodes of all trees together, -1 for leaves
+    children_left = np.concatenate([
+        np.where(t.children_left >= 0, t.children_left + root, -1)
+        for t, root in zip(trees, roots)
+    ]).astype(np.int32)
+    children_right = np.concatenate([
+        np.where(t.children_right >= 0, t.children_right + root, -1)
+        for t, root in zip(trees, roots)
+    ]).astype(np.int32)
+    is_leaf = children_left == -1
+
+    # class distributions are only needed for leaves
+    leaf_values = np.concatenate([t.value[:, 0, :] for t in trees])[is_leaf]
+    # older sklearn versions store weighted counts instead of fractions
+    if not np.allclose(leaf_values.sum(axis=1), 1):
+        normalizer = leaf_values.sum(axis=1)[:, None]
+        normalizer[normalizer == 0.] = 1.
+        leaf_values = leaf_values / normalizer
+    leaf_index = np.full(len(is_leaf), -1, dtype=np.int32)
+    leaf_index[is_leaf] = np.arange(is_leaf.sum())
+    # nan-routing per node (sklearn >= 1.3), nan went right before
+    missing_left = np.concatenate([
+        np.asarray(getattr(t, 'missing_go_to_left',
+                           np.zeros(t.node_count)), dtype=bool)
+        for t in trees
+    ])
+
+    forest = {
+        'feature': np.concatenate([t.feature for t in trees]).astype(np.int32),
+        'threshold': np.concatenate([t.threshold for t in trees]),
+        'children_left': children_left,
+        'children_right': children_right,
+        'leaf_index': leaf_index,
+        'missing_left': missing_left,
+        'leaf_values': leaf_values,
+        'roots': roots.astype(np.int32),
+        'classes': clf.classes_,
+    }
+
+    if fpath:
+        np.savez(fpath, **forest)
+        print(f'compact forest saved as {fpath}')
+
+    return forest
+
+
+def load_compact_forest(fpath):
+
+    with np.load(fpath) as f:
+        forest = {key: f[key] for key in f.files}
+
+    return forest
+
+
+def compact_forest_predict_proba(forest, X):
+    """
+    Predicts class probabilities of all samples in all
+    trees at once, equal to RandomForestClassifier's
+    predict_proba
+
+    Input:
+        - forest: dict from export_compact_forest()
+        - X: 2d-array (n_samples x n_features), nan
+            values are routed per node as in sklearn,
+            forests exported without missing_left
+            send nan to the right child
+
+    Returns:
+        - proba: 2d-array (n_samples x n_classes)
+    """
+    # trees compare float32 features with float64 thresholds
+    X = np.asarray(X, dtype=np.float32)
+    missing_left = forest.get(
+        'missing_left', np.zeros(len(forest['feature']), dtype=bool)
+    )
+    n_samples, n_trees = X.shape[0], len(forest['roots'])
+
+    # current node per sample and tree, all start in root nodes
+    nodes = np.tile(forest['roots'], (n_samples, 1))
+    rows = np.repeat(np.arange(n_samples), n_trees).reshape(n_samples, n_trees)
+
+    active = forest['leaf_index'][nodes] == -1
+    while active.any():
+        act_nodes = nodes[active]
+        x_node = X[rows[active], forest['feature'][act_nodes]]
+        go_left = np.where(np.isnan(x_node), missing_left[act_nodes],
+                           x_node <= forest['threshold'][act_nodes])
+        nodes[active] = np.where(go_left,
+                                 forest['children_left'][act_nodes],
+                                 forest['children_right'][act_nodes])
+        active = forest['leaf_index'][nodes] == -1
+
+    leaf_probas = forest['leaf_values'][forest['leaf_index'][nodes]]
+
+    # sum over trees in order of trees, as sklearn
+    proba = np.zeros((n_samples, leaf_probas.shape[2]))
+    for i_tree in range(n_trees):
+        proba += leaf_probas[:, i_tree]
+    proba /= n_trees
+
+    return proba
+
+
+def compact_forest_predict(forest, X):
+
+    proba = compact_forest_predict_proba(forest, X)
+
+    return forest['classes'].take(np.argmax(proba, axis=1), axis=0)
+
+
+def report_compact_forest(model_path, compact_path, X, n_repeats=10):
+    """
+    Compares file size, loading and prediction time of
+    the joblib model and the compact forest, and checks
+    that predictions are equal
+
+    Returns:
+        - report: dict with sizes (MB) and times (ms)
+    """
+    from time import perf_counter
+    from os.path import getsize
+
+    timings = {}
+    for name, load_fn, predict_fn in [
+        ('joblib', load, lambda m, x: m.predict_proba(x)),
+        ('compact', load_compact_forest, compact_forest_predict_proba),
+    ]:
+        fpath = model_path if name == 'joblib' else compact_path
+        t = perf_counter()
+        for _ in range(n_repeats): model = load_fn(fpath)
+        timings[f'{name}_load_ms'] = (perf_counter() - t) / n_repeats * 1e3
+
+        t = perf_counter()
+        for _ in range(n_repeats): predict_fn(model, X[:1])
+        timings[f'{name}_single_ms'] = (perf_counter() - t) / n_repeats * 1e3
+
+        t = perf_counter()
+        for _ in range(n_repeats): proba = predict_fn(model, X)
+        timings[f'{name}_batch_ms'] = (perf_counter() - t) / n_repeats * 1e3
+        if name == 'joblib': ref_proba, clf = proba, model
+        else: forest = model
+
+    assert np.array_equal(ref_proba, proba), 'predict_proba differs'
+    assert np.array_equal(clf.predict(X), compact_forest_predict(forest, X)), (
+        'predict differs'
+    )
 
-    print(f'model succesfully saved as {join(path, model_fname)}'
-            '; loading succesfully tested')
+    report = {'joblib_size_mb': getsize(model_path) / 1e6,
+              'compact_size_mb': getsize(compact_path) / 1e6,
+              'n_samples_batch': len(X)}
+    report.update({k: round(v, 2) for k, v in timings.items()})
+    for key, value in report.items(): print(f'\t{key}: {value}')
 
+    return report
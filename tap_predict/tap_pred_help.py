@@ -6,11 +6,12 @@ Helpers functions in classification workflow
 
 # import public pacakges and functions
 import numpy as np
-import pandas as pd
 from itertools import compress
 from os.path import join
 
 import tap_predict.tap_pred_prepare as pred_prep
+import tap_predict.retap_permutations as retap_perms
+import tap_predict.retap_metrics as retap_metrics
 from retap_utils.utils_dataManagement import find_onedrive_path
 
 from numpy.random import seed
@@ -275,27 +276,13 @@ def perform_reclassification(
     return new_y_true_dict, new_y_pred_dict, new_idx_dict, new_idx_dict['reclass']
 
 
-from pingouin import intraclass_corr
-from sklearn.metrics import cohen_kappa_score as kappa
-
 def calculate_ICC(y_true, y_pred):
-    # convert scores to lists
-    if not isinstance(y_true, list): y_true = list(y_true)
-    if not isinstance(y_pred, list): y_pred = list(y_pred)
-    
-    icc_scores = y_true + y_pred
-    icc_judges = ['clin'] * len(y_true) + ['model'] * len(y_pred)
-    icc_ids = [str(i) for i in range(len(y_true))] * 2
-    try:
-        icc_dat = pd.DataFrame(np.array([icc_ids, icc_judges, icc_scores]),
-                        columns=['IDs', 'Judges', 'Scores'])
-    except:
-        # transpose ICC data
-        icc_dat = pd.DataFrame(np.array([icc_ids, icc_judges, icc_scores]).T,
-                        columns=['IDs', 'Judges', 'Scores'])
-        
-    icc = intraclass_corr(data=icc_dat, targets='IDs', raters='Judges',
-                            ratings='Scores')
+    """
+    Returns DataFrame with all ICC variants, in the layout
+    of pingouin.intraclass_corr (row 5 is ICC3k),
+    calculated in closed form (see retap_metrics)
+    """
+    icc = retap_metrics.get_icc_table(y_true=y_true, y_pred=y_pred)
     
     return icc
 
@@ -303,32 +290,26 @@ def calculate_ICC(y_true, y_pred):
 def perform_permutations(
     y_true, icc_value, pred_error_value, k_value,
     file_name, model_name, n_permutations = 1000,
+    n_jobs: int = 1,
 ):
+    """
+    Compares ICC-3k, kappa and prediction error with
+    chance level, with random scores (without distribution
+    knowledge), and with shuffled true scores (with
+    distribution knowledge). Metrics of all permutations
+    are calculated vectorized (see retap_permutations).
+    """
     print(f'\tstart permutations for {model_name}, n={n_permutations}')
     perm_file = join(find_onedrive_path('results'), file_name + '_chance.txt')
 
     y_true = np.array(y_true)
 
-    penalties_full_chance = []
-    icc_full_chance = []
-    k_chance = []
-
     r_states = np.linspace(0, n_permutations*3, n_permutations).astype(int)
 
-    for r_seed in r_states:
-        # create random predicted labels
-        np.random.seed(r_seed)
-        y_random = np.random.randint(0, 3 + 1, size=len(y_true))
-        # calculate mean prediction error
-        diffs = abs(y_true - y_random)
-        penalties_full_chance.append(diffs.mean())
-        # calculate ICC-3k
-        icc = calculate_ICC(y_true, y_random)
-        icc = icc.iloc[5]['ICC']
-        icc_full_chance.append(icc)
-        # calculate kappa Cohen's
-        k = kappa(y_true, y_random, weights='linear')
-        k_chance.append(k)
+    (penalties_full_chance, icc_full_chance, k_chance
+    ) = retap_perms.run_permutations(
+        y_true, r_states=r_states, keep_distribution=False, n_jobs=n_jobs,
+    )
 
     icc_p = sum(np.array(icc_full_chance) > icc_value) / len(icc_full_chance)
     pred_error_p = sum(np.array(penalties_full_chance) < pred_error_value) / len(penalties_full_chance)
@@ -358,26 +339,11 @@ def perform_permutations(
     ### WITH same distribution
     perm_file = join(find_onedrive_path('results'), file_name + '_chanceAndDistr.txt')
 
-    penalties_full_chance = []
-    icc_full_chance = []
-    k_chance = []
-
-    r_states = np.linspace(0, n_permutations*3, n_permutations).astype(int)
-
-    for r_seed in r_states:
-        y_random = y_true.copy()
-        # create random predicted labels
-        np.random.shuffle(y_random)
-        # calculate mean prediction error
-        diffs = abs(y_true - y_random)
-        penalties_full_chance.append(diffs.mean())
-        # calculate ICC-3k
-        icc = calculate_ICC(y_true, y_random)
-        icc = icc.iloc[5]['ICC']
-        icc_full_chance.append(icc)
-        # calculate kappa Cohen's
-        k = kappa(y_true, y_random, weights='linear')
-        k_chance.append(k)
+    # shuffle true labels, seeded per permutation
+    (penalties_full_chance, icc_full_chance, k_chance
+    ) = retap_perms.run_permutations(
+        y_true, r_states=r_states, keep_distribution=True, n_jobs=n_jobs,
+    )
 
     icc_p = sum(np.array(icc_full_chance) > icc_value) / len(icc_full_chance)
     pred_error_p = sum(np.array(penalties_full_chance) < pred_error_value) / len(penalties_full_chance)
@@ -10,8 +10,6 @@ import numpy as np
 import pandas as pd
 from dataclasses import dataclass, field
 
-# own functions
-from tap_extract_fts.tapping_postFeatExtr_calc import z_score_array
 
 def select_traces_and_feats(
     ftClass,
@@ -77,6 +75,164 @@ class predictionData:
     ids: np.ndarray=field(default_factory=np.array([]))
 
 
+@dataclass(init=True, repr=True,)
+class featureMatrix:
+    """
+    All features of all traces in one matrix,
+    gathered once from the FeatureSet class.
+    Rows correspond to ids, columns to feats.
+    """
+    X: np.ndarray
+    y: np.ndarray
+    ids: np.ndarray
+    feats: list
+
+
+def get_feature_matrix(ftClass, feats, traces=None):
+    """
+    Gathers features and tap-scores of traces in
+    one pass over the FeatureSet class
+
+    Input:
+        - ftClass: class with features (FeatureSet)
+        - feats: list of feature names
+        - traces: traces to include, defaults to
+            ftClass.incl_traces
+    
+    Returns:
+        - featureMatrix
+    """
+    if traces is None: traces = ftClass.incl_traces
+
+    X = np.array([
+        [getattr(getattr(ftClass, t).fts, ft) for ft in feats]
+        for t in traces
+    ], dtype=float).reshape(len(traces), len(feats))
+    y = np.array([getattr(ftClass, t).tap_score for t in traces])
+
+    return featureMatrix(X=X, y=y, ids=np.array(traces), feats=list(feats))
+
+
+def select_trace_rows(ids, incl_traces=None, excl_traces=[], excl_subs=[]):
+    """
+    Returns row-indices of included traces (in order of
+    incl_traces) after exclusion of traces and subs.
+    Exclusions are done with sets; excl_subs can contain
+    sub-codes (e.g. BER028) or complete trace-ids, other
+    strings are excluded if they are part of the trace-id.
+    """
+    row_of_id = {t: i for i, t in enumerate(ids)}
+    if incl_traces is None: incl_traces = ids
+
+    excl_traces = set(excl_traces)
+    excl_subs = set(excl_subs)
+    # strings which are no sub-code or trace-id, are matched as substring
+    known_codes = set(row_of_id.keys()) | set(
+        [t.split('_')[0] for t in row_of_id.keys()]
+    )
+    substr_excl = [s for s in excl_subs if s not in known_codes]
+
+    rows = [
+        row_of_id[t] for t in incl_traces
+        if t not in excl_traces
+        and t not in excl_subs
+        and t.split('_')[0] not in excl_subs
+        and not any([s in t for s in substr_excl])
+    ]
+
+    return np.array(rows, dtype=int)
+
+
+def build_X_y(
+    ft_matrix: featureMatrix,
+    incl_feats=None,
+    incl_traces=None,
+    excl_traces=[],
+    excl_subs=[],
+    to_norm: bool = False,
+    to_zscore: bool = False,
+    std_params=None,
+    to_mask_4: bool=False,
+    to_mask_0: bool=False,
+    mask_nans=True,
+    verbose=True,
+):
+    """
+    Creates X, y, and ids from a preassembled featureMatrix,
+    with one vectorized selection of rows and columns, and
+    broadcasted normalisation or standardisation.
+
+    Arguments:
+        - ft_matrix: featureMatrix (see get_feature_matrix())
+        - incl_feats: features to include (default: all in
+            ft_matrix), incl/excl traces and subs
+        - to_norm: divide features by their max
+        - to_zscore: standardise features
+        - std_params: array (n_feats x 2) with mean and sd per
+            feature to use for standardising (HOLDOUT), if
+            None, parameters are calculated on X
+        - mask_nans: mask all NaNs with 0
+
+    Returns:
+        - X: input matrix
+        - y: vector with true labels
+        - ids: vector with trace ids
+        - std_params: array (n_feats x 2) with used mean and
+            sd per feature, None if not standardised
+    """
+    assert to_norm == False or to_zscore == False, (
+        'to_norm AND to_zscore can NOT both be True'
+    )
+    if incl_feats is None: incl_feats = ft_matrix.feats
+    col_of_ft = {ft: i for i, ft in enumerate(ft_matrix.feats)}
+    cols = np.array([col_of_ft[ft] for ft in incl_feats], dtype=int)
+
+    rows = select_trace_rows(
+        ft_matrix.ids, incl_traces=incl_traces,
+        excl_traces=excl_traces, excl_subs=excl_subs,
+    )
+    # one gather for all included traces and features (creates copies)
+    X = ft_matrix.X[np.ix_(rows, cols)]
+    y = ft_matrix.y[rows]
+    ids = ft_matrix.ids[rows]
+
+    if to_norm:
+        X = X / np.nanmax(X, axis=0)
+
+    elif to_zscore:
+        if std_params is None:
+            std_params = np.array([
+                np.nanmean(X, axis=0), np.nanstd(X, axis=0)
+            ]).T
+        else:
+            std_params = np.asarray(std_params, dtype=float)[:, :2]
+        X = (X - std_params[:, 0]) / std_params[:, 1]
+
+    # convert slopes of entropy and intraTap-intervals in absolute values
+    for ft_i, f in enumerate(incl_feats):
+        if np.logical_and(f.startswith('slope'),
+                          'entr' in f or 'intraTap' in f):
+            if any(X[:, ft_i] < 0):
+                X[:, ft_i] = abs(X[:, ft_i])
+                if verbose: print(f'transformed {f} into absolute values')
+
+    # deal with missings
+    # for now set all to zero, ideally: avoid zeros in extraction
+    if mask_nans:
+        nan_mask = np.isnan(X)
+        if verbose:
+            print(X.shape)
+            print(f'# of NaNs per feat: {sum(nan_mask)}')
+        X[nan_mask] = 0
+
+    if to_mask_4: y[y == 4] = 3  # Mask UPDRS 4 -> 3 merge (too low number)
+    if to_mask_0: y[y == 0] = 1  # Mask UPDRS 0 -> 1 merge (too low number)
+
+    if not to_zscore: std_params = None
+
+    return X, y, ids, std_params
+
+
 def create_X_y_vectors(
     ftClass,
     incl_feats,
@@ -99,7 +255,8 @@ def create_X_y_vectors(
     define to in or exclude specific traces or subjects
 
     Arguments:
-        - ftClass: class with features (FeatureSet)
+        - ftClass: class with features (FeatureSet), or
+            featureMatrix (see get_feature_matrix())
         - in / excl feats, traces, subs
         - to_norm
         - to_yscore
@@ -112,108 +269,36 @@ def create_X_y_vectors(
         - y: vector with true labels
         - ids: vector with trace ids to identify later results
     """
-    assert to_norm == False or to_zscore == False, (
-        'to_norm AND to_zscore can NOT both be True'
-    )
-    # filter out traces if defined
-    if len(excl_traces) > 0:
-        incl_traces = [
-            t for t in incl_traces
-            if t not in excl_traces
-        ]
-    # filter out traces of subs to excl (if defined)
-    if len(excl_subs) > 0:
-        for sub_ex in excl_subs:
-            incl_traces = [
-                t for t in incl_traces
-                if sub_ex not in t
-            ]
-
-    # fill outcome array y with updrs subscores
-    y = [getattr(ftClass, t).tap_score for t in incl_traces]
-    y = np.array(y)
-    # create corresponding vector with trace ids for later identifying
-    ids_vector = np.array(incl_traces)
-
-    # create X matrixc with input features
-    X = []
-    ft_dict = {}  # fill a preversion dict of X with ft-values
-
-    for ft in incl_feats: ft_dict[ft] = []
+    # gather only included traces and features from class
+    if isinstance(ftClass, featureMatrix): ft_matrix = ftClass
+    else: ft_matrix = get_feature_matrix(ftClass, incl_feats, incl_traces)
 
-    for trace in incl_traces:
-        trace_fts = getattr(ftClass, trace).fts
-
-        for ft in incl_feats:
-            ft_dict[ft].append(getattr(trace_fts, ft))
-    # transform all feats x traces in array with correct shape
-    for ft in incl_feats:
-        X.append(ft_dict[ft])
-    X = np.array(X).T
+    # use inserted params dataframe only for HOLD-OUT VALIDATION
+    if isinstance(use_STD_params_df, pd.DataFrame) and not save_STD_params:
+        std_params = use_STD_params_df.values
+    else:
+        std_params = None
+
+    X, y, ids_vector, std_params = build_X_y(
+        ft_matrix,
+        incl_feats=incl_feats,
+        incl_traces=incl_traces,
+        excl_traces=excl_traces,
+        excl_subs=excl_subs,
+        to_norm=to_norm,
+        to_zscore=to_zscore,
+        std_params=std_params,
+        to_mask_4=to_mask_4,
+        to_mask_0=to_mask_0,
+        mask_nans=mask_nans,
+    )
 
     assert X.shape[0] == y.shape[0], ('X and y have '
         'different 1st-dimension')
 
-    # Normalise vector per array-feature over all samples
-    if save_STD_params: params_list = []
-
-    if to_norm:
-        for ft_i in range(X.shape[1]):
-            vec_max = np.nanmax(X[:, ft_i])
-            X[:, ft_i] = X[:, ft_i] / vec_max
-    # Standardise vector per array-feature over all samples
-    elif to_zscore:
-        for ft_i in range(X.shape[1]):
-            if save_STD_params:
-                # standardise features (in crossval), WITH saving
-                X[:, ft_i], std_mean, std_sd = z_score_array(X[:, ft_i], save_params=True)
-                params_list.append([std_mean, std_sd])
-            else:
-                # use inserted params dataframe (for HOLD-OUT VALIDATION)
-                if isinstance(use_STD_params_df, pd.DataFrame):
-                    X[:, ft_i] = z_score_array(
-                        X[:, ft_i],
-                        use_mean=use_STD_params_df.values[ft_i, 0],
-                        use_sd=use_STD_params_df.values[ft_i, 1]
-                    )
-                # standardise features (in crossval), WITHOUT saving
-                else:   
-                    X[:, ft_i] = z_score_array(X[:, ft_i], save_params=False)
-    
-    # convert slopes of
-    for ft_i, f in enumerate(incl_feats):
-        if np.logical_and(f.startswith('slope'),
-                          'entr' in f or 'intraTap' in f):
-            if any(X[:, ft_i] < 0):
-                X[:, ft_i] = abs(X[:, ft_i])
-                print(f'transformed {f} into absolute values')
-        
-
-
-
-    # deal with missings
-    # for now set all to zero, ideally: avoid zeros in extraction
-    if mask_nans:
-        print(X.shape)
-        nan_mask = np.isnan(X)
-        print(f'# of NaNs per feat: {sum(nan_mask)}')
-        X[nan_mask] = 0
-        # check whether masking worked
-        assert np.isnan(X).any() == False, print(
-            'X array contains missing values:\n',
-            np.isnan(X).any()
-        )
-
-    if to_mask_4:
-        # Mask UPDRS 4 -> 3 merge (too low number)
-        mask = y == 4
-        y[mask] = 3
-    
-    if to_mask_0:
-        # Mask UPDRS 0 -> 1 merge (too low number)
-        mask = y == 0
-        y[mask] = 1
-
+    if save_STD_params:
+        # list with [mean, sd] per feature
+        params_list = std_params.tolist() if to_zscore else []
 
     if as_class:
         if return_ids:
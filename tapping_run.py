@@ -12,8 +12,15 @@ from dataclasses import field
 from tap_load_data.tapping_time_detect import updrsTapDetector
 from tap_load_data.tapping_preprocess import run_preproc_acc, find_main_axis
 from retap_utils.utils_preprocessing import resample
+from retap_utils.utils_profiling import profiled
+from retap_utils.utils_precision import as_signal_dtype
 
+# increase when tap detection or preprocessing changes,
+# invalidates cached extracted traces
+DETECTOR_VERSION = '1.0'
 
+
+@profiled()
 def run_updrs_tap_finder(
     acc_arr: array,
     fs: int,
@@ -46,6 +53,8 @@ def run_updrs_tap_finder(
     """
     # if data is DataFRame convert to np array
     if type(acc_arr) == DataFrame: acc_arr = acc_arr.values()
+    # float precision of signal path (see utils_precision)
+    acc_arr = as_signal_dtype(acc_arr)
     # transpose if needed
     if np.logical_and(
         acc_arr.shape[1] == 3,